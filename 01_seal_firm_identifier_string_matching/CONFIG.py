@@ -29,6 +29,7 @@ GUETESIEGEL_NAME_SUFFIXES = ['/shop', '/de-AT', '/webshop', '/marktplatz', '/onl
 
 # Matching Constants
 INSUFFICIENT_RETAILER_MATCH_SUFFIXES = ['-at', '-uk', '-de', '-com']
+JARO_BLOCKING_THRESHOLD = 0.7  # Only retailers which may reach this Jaro similarity are scored (None scores all)
 
 # Output paths
 ECOMMERCE_MATCHED_FILE_PATH = OUTPUT_FOLDER + "e-commerce_matched.csv"
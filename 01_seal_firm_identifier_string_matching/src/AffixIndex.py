@@ -0,0 +1,40 @@
+from bisect import bisect_left, bisect_right
+
+
+class RetailerAffixIndex:
+    """Retailer names sorted as they are and reversed, to find all names with a given prefix or suffix by bisection.
+
+    A lookup costs O(log n + matches) instead of a startswith/endswith call per retailer. Matches are returned in
+    retailer order, duplicate names included, like a scan over the retailer names.
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.prefix_order = sorted(range(len(self.names)), key=lambda name_index: self.names[name_index])
+        self.prefix_keys = [self.names[name_index] for name_index in self.prefix_order]
+        self.suffix_order = sorted(range(len(self.names)), key=lambda name_index: self.names[name_index][::-1])
+        self.suffix_keys = [self.names[name_index][::-1] for name_index in self.suffix_order]
+
+    @staticmethod
+    def _range(keys, prefix):
+        # Cutting the sorted keys to the length of the prefix keeps them sorted
+        cut = len(prefix)
+        return (bisect_left(keys, prefix, key=lambda key: key[:cut]),
+                bisect_right(keys, prefix, key=lambda key: key[:cut]))
+
+    def with_prefix(self, prefix):
+        """Returns the indices of the names starting with prefix."""
+        start, end = self._range(self.prefix_keys, prefix)
+        return self.prefix_order[start:end]
+
+    def with_suffix(self, suffix):
+        """Returns the indices of the names ending with suffix."""
+        start, end = self._range(self.suffix_keys, suffix[::-1])
+        return self.suffix_order[start:end]
+
+    def matches(self, prefix, suffix=None):
+        """Returns the names starting with prefix or ending with suffix (None for no suffix), in retailer order."""
+        name_indices = set(self.with_prefix(prefix))
+        if suffix is not None:
+            name_indices.update(self.with_suffix(suffix))
+        return [self.names[name_index] for name_index in sorted(name_indices)]
@@ -0,0 +1,46 @@
+from collections import Counter
+
+import numpy as np
+
+
+class QGramBlockingIndex:
+    """Inverted index from characters (1-grams) to the retailer names holding them, with their counts.
+
+    Jaro only counts matching characters: with m matches m <= c, the common characters (multiset) of both names,
+    and (m - t) / m <= 1, so Jaro(a, b) <= (c / |a| + c / |b| + 1) / 3. As c <= min(|a|, |b|) the bound is the
+    length filter too. Retailers whose bound is below a threshold can never reach it and are skipped.
+    Longer q-grams do not bound Jaro, it ignores the order of the characters within the match window.
+    """
+
+    def __init__(self, names):
+        names = list(names)
+        self.lengths = np.array([len(name) for name in names], dtype=np.float64)
+        postings = {}
+        for name_index, name in enumerate(names):
+            for char, count in Counter(name).items():
+                postings.setdefault(char, ([], []))
+                postings[char][0].append(name_index)
+                postings[char][1].append(count)
+        self.postings = {char: (np.array(name_indices, dtype=np.int64), np.array(counts, dtype=np.int64))
+                         for char, (name_indices, counts) in postings.items()}
+
+    def upper_bounds(self, query_name):
+        """Returns the Jaro similarity upper bound of the query name to every indexed name."""
+        common = np.zeros(len(self.lengths), dtype=np.int64)
+        for char, query_count in Counter(query_name).items():
+            if char in self.postings:
+                name_indices, counts = self.postings[char]
+                common[name_indices] += np.minimum(counts, query_count)
+
+        bounds = np.zeros(len(self.lengths), dtype=np.float64)
+        has_common = common > 0
+        bounds[has_common] = (common[has_common] / len(query_name) + common[has_common] / self.lengths[has_common]
+                              + 1) / 3
+        return bounds
+
+    def candidates(self, query_name, threshold):
+        """Returns the indices (ascending) of all names whose Jaro similarity to the query name may reach threshold."""
+        if threshold <= 0:
+            return np.arange(len(self.lengths))
+        # The tolerance keeps names whose bound equals the threshold despite rounding
+        return np.flatnonzero(self.upper_bounds(query_name) >= threshold - 1e-9)
@@ -0,0 +1,105 @@
+import numpy as np
+
+from CONFIG import JARO_BLOCKING_THRESHOLD
+from src.BlockingIndex import QGramBlockingIndex
+from static.StringHelper import StringHelper
+
+try:
+    from rapidfuzz.distance import Jaro
+    from rapidfuzz.process import cdist
+except ImportError:
+    Jaro, cdist = None, None
+
+JARO_TOP_K = 3
+JARO_BATCH_SIZE = 256  # Query names scored at once, a batch holds JARO_BATCH_SIZE x retailers float64 scores
+
+
+class JaroBatchMatcher:
+    """Scores seal provider names against all retailer names with the Jaro similarity, a whole batch per call.
+
+    Uses the compiled, multi-threaded cdist kernel of rapidfuzz (see requirements.txt), whose Jaro scores equal the
+    ones of jellyfish; without rapidfuzz it falls back to jellyfish, name by name. Candidates are
+    ranked by descending similarity, ties in retailer order, like the former per name loops of MatchingCriteria.
+
+    With a blocking threshold only the retailers of the QGramBlockingIndex which may reach it are scored. If fewer
+    than k of them do, all retailers are scored, so the top k are always the ones of a full scan.
+    """
+
+    def __init__(self, retailer_names, top_k=JARO_TOP_K, batch_size=JARO_BATCH_SIZE,
+                 blocking_threshold=JARO_BLOCKING_THRESHOLD):
+        self.retailer_names = np.asarray(list(retailer_names), dtype=object)
+        self.top_k = top_k
+        self.batch_size = batch_size
+        self.blocking_threshold = blocking_threshold
+        self.blocking_index = QGramBlockingIndex(self.retailer_names) if blocking_threshold is not None else None
+        self._top_candidates = {}
+
+    def scores(self, query_names, retailer_indices=None):
+        """Returns the (query names x retailer names) Jaro similarity matrix, optionally of some retailers only."""
+        query_names = list(query_names)
+        retailer_names = self.retailer_names if retailer_indices is None else self.retailer_names[retailer_indices]
+        if cdist is None:
+            return np.array([[StringHelper.jaro_similarity(query_name, retailer_name)
+                              for retailer_name in retailer_names] for query_name in query_names],
+                            dtype=np.float64).reshape(len(query_names), len(retailer_names))
+
+        scores = cdist(query_names, retailer_names, scorer=Jaro.similarity, dtype=np.float64, workers=-1)
+        # jellyfish scores empty strings 0.0, rapidfuzz 1.0
+        scores[[not query_name for query_name in query_names], :] = 0.0
+        scores[:, [not retailer_name for retailer_name in retailer_names]] = 0.0
+        return scores
+
+    def top_k_matrix(self, query_names, k=None):
+        """Returns the (indices, scores) matrices of the k best retailers per query name, best first."""
+        k = min(self.top_k if k is None else k, len(self.retailer_names))
+        query_names = list(query_names)
+        indices = np.empty((len(query_names), k), dtype=np.int64)
+        scores = np.empty((len(query_names), k), dtype=np.float64)
+
+        unblocked = []
+        for position, query_name in enumerate(query_names):
+            blocked = self._blocked_top_k(query_name, k) if self.blocking_index is not None else None
+            if blocked is None:
+                unblocked.append(position)
+            else:
+                indices[position], scores[position] = blocked
+
+        for start in range(0, len(unblocked), self.batch_size):
+            positions = unblocked[start:start + self.batch_size]
+            batch_scores = self.scores([query_names[position] for position in positions])
+            # A stable sort keeps equally similar retailers in retailer order
+            batch_indices = np.argsort(-batch_scores, axis=1, kind='stable')[:, :k]
+            indices[positions] = batch_indices
+            scores[positions] = np.take_along_axis(batch_scores, batch_indices, axis=1)
+        return indices, scores
+
+    def _blocked_top_k(self, query_name, k):
+        """The top k among the blocking candidates, None if fewer than k of them reach the blocking threshold."""
+        candidates = self.blocking_index.candidates(query_name, self.blocking_threshold)
+        if len(candidates) < k:
+            return None
+        candidate_scores = self.scores([query_name], candidates)[0]
+        # Every retailer reaching the threshold is a candidate: with k of them, the top k of all retailers are
+        if np.count_nonzero(candidate_scores >= self.blocking_threshold) < k:
+            return None
+        order = np.argsort(-candidate_scores, kind='stable')[:k]
+        return candidates[order], candidate_scores[order]
+
+    def prefetch(self, query_names):
+        """Scores all not yet scored query names in batches and keeps their top k candidates."""
+        new_names = list(dict.fromkeys(name for name in query_names if name not in self._top_candidates))
+        if not new_names:
+            return
+        indices, scores = self.top_k_matrix(new_names)
+        for query_name, name_indices, name_scores in zip(new_names, indices, scores):
+            self._top_candidates[query_name] = list(zip(self.retailer_names[name_indices].tolist(),
+                                                        name_scores.tolist()))
+
+    def top_candidates(self, query_name, k=None):
+        """Returns the k (default top_k) most similar (retailer name, similarity) pairs of a query name."""
+        k = self.top_k if k is None else k
+        if k > self.top_k:
+            indices, scores = self.top_k_matrix([query_name], k)
+            return list(zip(self.retailer_names[indices[0]].tolist(), scores[0].tolist()))
+        self.prefetch([query_name])
+        return self._top_candidates[query_name][:k]
@@ -1,44 +1,102 @@
+import weakref
+
 from CONFIG import GUETESIEGEL_NAME_SUFFIXES, INSUFFICIENT_RETAILER_MATCH_SUFFIXES, GUETESIEGEL_NAME_PREFIXES
+from src.AffixIndex import RetailerAffixIndex
+from src.JaroMatcher import JaroBatchMatcher
+from src.RetailerNameIndex import RetailerNameIndex
 from static.StringHelper import StringHelper
 
 
 class MatchingCriteria:
+    _indexes = {}
+
+    @staticmethod
+    def _index_of(filtered_retailers_df, index_class):
+        """Returns the index_class index over the retailer names, built once per retailers DataFrame and dropped
+        together with the DataFrame."""
+        df_id = id(filtered_retailers_df)
+        if df_id not in MatchingCriteria._indexes:
+            MatchingCriteria._indexes[df_id] = {}
+            weakref.finalize(filtered_retailers_df, MatchingCriteria._indexes.pop, df_id, None)
+        indexes = MatchingCriteria._indexes[df_id]
+        if index_class not in indexes:
+            indexes[index_class] = index_class(filtered_retailers_df[1].values)
+        return indexes[index_class]
+
+    @staticmethod
+    def jaro_matcher(filtered_retailers_df):
+        """Returns the batch Jaro matcher over the retailer names."""
+        return MatchingCriteria._index_of(filtered_retailers_df, JaroBatchMatcher)
+
+    @staticmethod
+    def affix_index(filtered_retailers_df):
+        """Returns the prefix/suffix index over the retailer names."""
+        return MatchingCriteria._index_of(filtered_retailers_df, RetailerAffixIndex)
+
+    @staticmethod
+    def name_index(filtered_retailers_df):
+        """Returns the hash set index of the retailer names."""
+        return MatchingCriteria._index_of(filtered_retailers_df, RetailerNameIndex)
+
+    @staticmethod
+    def simple_candidate(guetesiegel_retailer_name):
+        """Normalizes a seal provider name to the retailer name it would be (suffixes stripped, dots as dashes)."""
+        stripped_name = StringHelper.strip_prefixes_suffixes(guetesiegel_retailer_name, None, GUETESIEGEL_NAME_SUFFIXES)
+        return stripped_name.replace('.', '-')
+
+    @staticmethod
+    def handelsverband_candidate(guetesiegel_retailer_name):
+        """Normalizes a Handelsverband name, 'www.' names drop the 'www-' after replacing the dots."""
+        if guetesiegel_retailer_name.startswith("www."):
+            return guetesiegel_retailer_name.replace('.', '-').replace("www-", "")
+        return MatchingCriteria.simple_candidate(guetesiegel_retailer_name)
+
+    @staticmethod
+    def resolve_many(guetesiegel_retailer_names, filtered_retailers_df, candidate=None):
+        """Resolves a whole provider column at once: the matching retailer name per name, otherwise None."""
+        candidate = MatchingCriteria.simple_candidate if candidate is None else candidate
+        return MatchingCriteria.name_index(filtered_retailers_df).resolve_many(
+            candidate(name) if isinstance(name, str) else None for name in guetesiegel_retailer_names)
+
+    @staticmethod
+    def match_many(guetesiegel_retailer_names, filtered_retailers_df, matching_criteria):
+        """Applies a matching criteria to a whole provider column, exact lookups and Jaro scores in one batch."""
+        if matching_criteria is MatchingCriteria.matching_criteria_simple:
+            return MatchingCriteria.resolve_many(guetesiegel_retailer_names, filtered_retailers_df)
+        if matching_criteria is MatchingCriteria.matching_criteria_handelsverband:
+            return MatchingCriteria.resolve_many(guetesiegel_retailer_names, filtered_retailers_df,
+                                                 MatchingCriteria.handelsverband_candidate)
+        if matching_criteria in (MatchingCriteria.matching_criteria_top_1_jaro_sim_candidate,
+                                 MatchingCriteria.matching_criteria_closest_3_jaro_sim_candidates):
+            MatchingCriteria.jaro_matcher(filtered_retailers_df).prefetch(
+                name for name in guetesiegel_retailer_names if isinstance(name, str))
+        return [matching_criteria(name, filtered_retailers_df) for name in guetesiegel_retailer_names]
+
     @staticmethod
     def matching_criteria_handelsverband(guetesiegel_retailer_name, filtered_retailers_df):
         """Matching criteria for Handelsverband."""
-        if guetesiegel_retailer_name.startswith("www."):
-            possible_match = guetesiegel_retailer_name.replace('.', '-').replace("www-", "")
-            return possible_match if possible_match in filtered_retailers_df[1].values else None
-        else:
-            return MatchingCriteria.matching_criteria_simple(guetesiegel_retailer_name, filtered_retailers_df)
+        return MatchingCriteria.name_index(filtered_retailers_df).resolve(
+            MatchingCriteria.handelsverband_candidate(guetesiegel_retailer_name))
 
     @staticmethod
     def matching_criteria_simple(guetesiegel_retailer_name, filtered_retailers_df):
         """Simple matching criteria."""
-        stripped_name = StringHelper.strip_prefixes_suffixes(guetesiegel_retailer_name, None, GUETESIEGEL_NAME_SUFFIXES)
-        possible_match = stripped_name.replace('.', '-')
-        return possible_match if possible_match in filtered_retailers_df[1].values else None
+        return MatchingCriteria.name_index(filtered_retailers_df).resolve(
+            MatchingCriteria.simple_candidate(guetesiegel_retailer_name))
 
     @staticmethod
     def _matching_criteria_advanced(guetesiegel_retailer_name, filtered_retailers_df, nchars):
         """Internal method for advanced matching criteria."""
         stripped_name = StringHelper.strip_prefixes_suffixes(guetesiegel_retailer_name, GUETESIEGEL_NAME_PREFIXES,
                                                              GUETESIEGEL_NAME_SUFFIXES)
-        matches = []
-        for retailer in filtered_retailers_df[1].values:
-            substring_front = stripped_name[:nchars]
-            substring_end = stripped_name[-nchars:]
-            if (
-                    retailer.startswith(substring_front)
-                    or (
-                        retailer.endswith(substring_end)
-                        and all(insufficient_suffix not in substring_end for insufficient_suffix in
-                                INSUFFICIENT_RETAILER_MATCH_SUFFIXES)
-                        and substring_end not in INSUFFICIENT_RETAILER_MATCH_SUFFIXES
-                    )
-            ):
-                matches.append(retailer)
-        return matches
+        substring_front = stripped_name[:nchars]
+        substring_end = stripped_name[-nchars:]
+        # Ends holding an insufficient suffix (e.g. '-de') do not qualify for a suffix match at all
+        end_is_sufficient = (all(insufficient_suffix not in substring_end for insufficient_suffix in
+                                 INSUFFICIENT_RETAILER_MATCH_SUFFIXES)
+                             and substring_end not in INSUFFICIENT_RETAILER_MATCH_SUFFIXES)
+        return MatchingCriteria.affix_index(filtered_retailers_df).matches(
+            substring_front, substring_end if end_is_sufficient else None)
 
     @staticmethod
     def matching_criteria_advanced(guetesiegel_retailer_name, filtered_retailers_df):
@@ -55,21 +113,11 @@ class MatchingCriteria:
     @staticmethod
     def matching_criteria_closest_3_jaro_sim_candidates(guetesiegel_retailer_name, filtered_retailers_df):
         """Matching criteria based on the closest 3 candidates using string distance."""
-        distances = [
-            (name, StringHelper.jaro_similarity(guetesiegel_retailer_name, name)) for name in
-            filtered_retailers_df[1].values
-        ]
-        distances.sort(key=lambda x: x[1], reverse=True)
-        return [name for name, _ in distances[:3]] if distances else None
+        candidates = MatchingCriteria.jaro_matcher(filtered_retailers_df).top_candidates(guetesiegel_retailer_name, 3)
+        return [name for name, _ in candidates] if candidates else None
 
     @staticmethod
     def matching_criteria_top_1_jaro_sim_candidate(guetesiegel_retailer_name, filtered_retailers_df):
         """Matching criteria based on the closest candidate using Jaro similarity."""
-        best_similarity = 0.0
-        best_candidate = None
-        for retailer_name in filtered_retailers_df[1].values:
-            similarity = StringHelper.jaro_similarity(guetesiegel_retailer_name, retailer_name)
-            if similarity > best_similarity:
-                best_similarity = similarity
-                best_candidate = retailer_name
-        return best_candidate
+        candidates = MatchingCriteria.jaro_matcher(filtered_retailers_df).top_candidates(guetesiegel_retailer_name, 1)
+        return candidates[0][0] if candidates and candidates[0][1] > 0.0 else None
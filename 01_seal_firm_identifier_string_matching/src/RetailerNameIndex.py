@@ -0,0 +1,13 @@
+class RetailerNameIndex:
+    """Hash set of the retailer names for exact lookups, instead of a scan over the retailer names per lookup."""
+
+    def __init__(self, names):
+        self.names = frozenset(names)
+
+    def resolve(self, candidate):
+        """Returns the candidate if it is a retailer name, otherwise None."""
+        return candidate if candidate in self.names else None
+
+    def resolve_many(self, candidates):
+        """Returns the resolved candidates (see resolve) of a whole column, None for missing candidates."""
+        return [candidate if candidate is not None and candidate in self.names else None for candidate in candidates]
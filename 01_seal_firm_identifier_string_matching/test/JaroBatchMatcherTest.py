@@ -0,0 +1,124 @@
+import random
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+from src.BlockingIndex import QGramBlockingIndex
+from src.JaroMatcher import JaroBatchMatcher, cdist
+from src.MatchingCriteria import MatchingCriteria
+from static.StringHelper import StringHelper
+
+
+def closest_3_per_pair(name, retailer_names):
+    distances = [(retailer_name, StringHelper.jaro_similarity(name, retailer_name)) for retailer_name in retailer_names]
+    distances.sort(key=lambda x: x[1], reverse=True)
+    return [retailer_name for retailer_name, _ in distances[:3]] if distances else None
+
+
+def top_1_per_pair(name, retailer_names):
+    best_similarity = 0.0
+    best_candidate = None
+    for retailer_name in retailer_names:
+        similarity = StringHelper.jaro_similarity(name, retailer_name)
+        if similarity > best_similarity:
+            best_similarity = similarity
+            best_candidate = retailer_name
+    return best_candidate
+
+
+class JaroBatchMatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        generator = random.Random(11)
+        alphabet = 'abcdeß-.'
+        self.retailer_names = ['shop-a', 'shop-b', 'a-shop', 'xyz', 'shop-a'] + [
+            ''.join(generator.choice(alphabet) for _ in range(generator.randint(1, 12))) for _ in range(300)]
+        self.query_names = ['shop.a', 'shop', 'qqq', 'ba', 'ab', ''] + [
+            ''.join(generator.choice(alphabet) for _ in range(generator.randint(1, 12))) for _ in range(100)]
+        self.filtered_retailers_df = pd.DataFrame({0: range(len(self.retailer_names)), 1: self.retailer_names})
+
+    def test_scores_match_jellyfish(self):
+        scores = JaroBatchMatcher(self.retailer_names).scores(self.query_names)
+
+        self.assertEqual((len(self.query_names), len(self.retailer_names)), scores.shape)
+        for query_index, query_name in enumerate(self.query_names):
+            self.assertEqual([StringHelper.jaro_similarity(query_name, retailer_name)
+                              for retailer_name in self.retailer_names], scores[query_index].tolist())
+
+    @unittest.skipUnless(cdist, "rapidfuzz is not installed")
+    def test_rapidfuzz_scores_equal_jellyfish(self):
+        generator = random.Random(23)
+        # Few distinct characters make many equal scores, empty names score 0.0 in jellyfish
+        retailer_names = [''] + [''.join(generator.choice('abß-') for _ in range(generator.randint(1, 9)))
+                                 for _ in range(300)] + ['ab', 'ba', 'ab', 'a', 'ä']
+        query_names = ['', 'ab', 'a', 'ba', 'ä'] + [
+            ''.join(generator.choice('abß-.') for _ in range(generator.randint(1, 12))) for _ in range(100)]
+        matcher = JaroBatchMatcher(retailer_names, blocking_threshold=None)
+
+        scores = matcher.scores(query_names)
+        for query_index, query_name in enumerate(query_names):
+            self.assertEqual([StringHelper.jaro_similarity(query_name, retailer_name)
+                              for retailer_name in retailer_names], scores[query_index].tolist())
+
+        indices, _ = matcher.top_k_matrix(query_names)
+        for query_index, query_name in enumerate(query_names):
+            self.assertEqual(closest_3_per_pair(query_name, retailer_names),
+                             [retailer_names[retailer_index] for retailer_index in indices[query_index]])
+
+    def test_jellyfish_fallback_equals_the_kernel(self):
+        matcher = JaroBatchMatcher(self.retailer_names, blocking_threshold=None)
+        with patch('src.JaroMatcher.cdist', None):
+            fallback_indices, fallback_scores = matcher.top_k_matrix(self.query_names)
+        indices, scores = matcher.top_k_matrix(self.query_names)
+
+        self.assertEqual(indices.tolist(), fallback_indices.tolist())
+        self.assertEqual(scores.tolist(), fallback_scores.tolist())
+
+    def test_top_k_ranks_ties_in_retailer_order(self):
+        indices, scores = JaroBatchMatcher(self.retailer_names, batch_size=7).top_k_matrix(['shop-a', 'qqq'])
+
+        self.assertEqual([0, 4], indices[0, :2].tolist())
+        self.assertEqual([1.0, 1.0], scores[0, :2].tolist())
+        # No retailer shares a character with the query, the first retailers come first
+        self.assertEqual([0, 1, 2], indices[1].tolist())
+        self.assertEqual([0.0, 0.0, 0.0], scores[1].tolist())
+
+    def test_blocking_candidates_hold_every_retailer_above_the_threshold(self):
+        index = QGramBlockingIndex(self.retailer_names)
+        for threshold in (0.5, 0.7, 0.9):
+            for query_name in self.query_names:
+                candidates = set(index.candidates(query_name, threshold).tolist())
+                above = {retailer_index for retailer_index, retailer_name in enumerate(self.retailer_names)
+                         if StringHelper.jaro_similarity(query_name, retailer_name) >= threshold}
+                self.assertLessEqual(above, candidates)
+
+    def test_blocked_top_k_equals_the_full_scan(self):
+        indices, scores = JaroBatchMatcher(self.retailer_names, blocking_threshold=None).top_k_matrix(self.query_names)
+
+        for threshold in (0.0, 0.6, 0.7, 0.8, 0.99):
+            blocked_indices, blocked_scores = JaroBatchMatcher(
+                self.retailer_names, blocking_threshold=threshold).top_k_matrix(self.query_names)
+            self.assertEqual(indices.tolist(), blocked_indices.tolist())
+            self.assertEqual(scores.tolist(), blocked_scores.tolist())
+
+    def test_criteria_match_the_per_pair_loops(self):
+        MatchingCriteria.jaro_matcher(self.filtered_retailers_df).prefetch(self.query_names[:50])
+
+        for query_name in self.query_names:
+            self.assertEqual(closest_3_per_pair(query_name, self.retailer_names),
+                             MatchingCriteria.matching_criteria_closest_3_jaro_sim_candidates(
+                                 query_name, self.filtered_retailers_df))
+            self.assertEqual(top_1_per_pair(query_name, self.retailer_names),
+                             MatchingCriteria.matching_criteria_top_1_jaro_sim_candidate(
+                                 query_name, self.filtered_retailers_df))
+
+    def test_no_retailers(self):
+        filtered_retailers_df = pd.DataFrame({0: [], 1: []})
+
+        self.assertIsNone(MatchingCriteria.matching_criteria_closest_3_jaro_sim_candidates('shop', filtered_retailers_df))
+        self.assertIsNone(MatchingCriteria.matching_criteria_top_1_jaro_sim_candidate('shop', filtered_retailers_df))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from CONFIG import CSV_SEPARATOR, HEADER_COLUMN_NAME_ADVANCED_MATCHING_JARO, \
+    HEADER_COLUMN_NAME_ADVANCED_MATCHING_JARO_TOP_1, HEADER_COLUMN_RESULTING_MATCH
+from src.Matching import MatchingProcessor
+from src.MatchingCriteria import MatchingCriteria
+
+# EHI layout: the Top-3 candidates overwrite the Top-1 candidate in column 7
+MATCHING_STEPS = [
+    (5, "matching_criteria_simple", MatchingCriteria.matching_criteria_simple),
+    (6, HEADER_COLUMN_RESULTING_MATCH, MatchingCriteria.matching_criteria_handelsverband),
+    (7, HEADER_COLUMN_NAME_ADVANCED_MATCHING_JARO_TOP_1, MatchingCriteria.matching_criteria_top_1_jaro_sim_candidate),
+    (7, HEADER_COLUMN_NAME_ADVANCED_MATCHING_JARO, MatchingCriteria.matching_criteria_closest_3_jaro_sim_candidates),
+    (8, "advanced", MatchingCriteria.matching_criteria_advanced),
+    (2, "advanced2", MatchingCriteria.matching_criteria_advanced2),
+]
+
+
+class MatchingPipelineTest(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.input_file = os.path.join(temp_dir.name, 'ehi_bevh.csv')
+        self.output_dir = temp_dir.name
+        with open(self.input_file, 'w') as csv_file:
+            csv_file.write("id;name;kept;c3;c4\n"
+                           "1;shop.at/shop;a;;x\n"
+                           "2;www.elektro-shop.de;;b;\n"
+                           "3;zzz;c;;\n"
+                           "4;mega.de;;;y\n")
+        self.filtered_retailers_df = pd.DataFrame({0: [1, 2, 3, 4],
+                                                   1: ['shop-at', 'elektro-shop-de', 'mega-de', 'shop-de']})
+
+    def test_single_pass_equals_the_csv_round_trips(self):
+        round_trip_set = set()
+        round_trip_file = os.path.join(self.output_dir, 'round_trip.csv')
+        processor = MatchingProcessor(self.filtered_retailers_df, round_trip_set)
+        round_trip_matches = []
+        for step, (col_index, col_header, criteria) in enumerate(MATCHING_STEPS):
+            df = pd.read_csv(self.input_file if step == 0 else round_trip_file, sep=CSV_SEPARATOR, header=None)
+            round_trip_matches.append(processor.process_matching(df, col_index, col_header, criteria, round_trip_file))
+
+        pipeline_set = set()
+        pipeline_file = os.path.join(self.output_dir, 'pipeline.csv')
+        guetesiegel_df, pipeline_matches = MatchingProcessor(self.filtered_retailers_df, pipeline_set).run_pipeline(
+            self.input_file, pipeline_file, MATCHING_STEPS)
+
+        with open(round_trip_file) as expected, open(pipeline_file) as actual:
+            self.assertEqual(expected.read(), actual.read())
+        self.assertEqual(round_trip_matches, pipeline_matches)
+        self.assertEqual(round_trip_set, pipeline_set)
+        self.assertEqual(5, len(guetesiegel_df))
+
+    def test_matched_columns(self):
+        matched_retailers_set = set()
+        guetesiegel_df, matches = MatchingProcessor(self.filtered_retailers_df, matched_retailers_set).run_pipeline(
+            self.input_file, os.path.join(self.output_dir, 'pipeline.csv'), MATCHING_STEPS)
+
+        self.assertEqual(["matching_criteria_simple", 'shop-at', None, None, 'mega-de'],
+                         [None if pd.isna(value) else value for value in guetesiegel_df[5]])
+        self.assertEqual(HEADER_COLUMN_NAME_ADVANCED_MATCHING_JARO, guetesiegel_df.at[0, 7])
+        self.assertEqual("['shop-at', 'shop-de', 'elektro-shop-de']", guetesiegel_df.at[1, 7])
+        # Rows without a match keep the value the column had
+        self.assertEqual(['advanced2', "['shop-at']", "['elektro-shop-de']", 'c', "['mega-de']"],
+                         guetesiegel_df[2].tolist())
+        self.assertEqual([2, 3, 3, 12, 2, 3], matches)
+        self.assertEqual({'shop-at', 'elektro-shop-de', 'mega-de', 'shop-de'}, matched_retailers_set)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import random
+import unittest
+
+import pandas as pd
+
+from CONFIG import GUETESIEGEL_NAME_PREFIXES, GUETESIEGEL_NAME_SUFFIXES, INSUFFICIENT_RETAILER_MATCH_SUFFIXES
+from src.AffixIndex import RetailerAffixIndex
+from src.MatchingCriteria import MatchingCriteria
+from static.StringHelper import StringHelper
+
+
+def advanced_per_retailer(guetesiegel_retailer_name, retailer_names, nchars):
+    stripped_name = StringHelper.strip_prefixes_suffixes(guetesiegel_retailer_name, GUETESIEGEL_NAME_PREFIXES,
+                                                         GUETESIEGEL_NAME_SUFFIXES)
+    matches = []
+    for retailer in retailer_names:
+        substring_front = stripped_name[:nchars]
+        substring_end = stripped_name[-nchars:]
+        if (
+                retailer.startswith(substring_front)
+                or (
+                    retailer.endswith(substring_end)
+                    and all(insufficient_suffix not in substring_end for insufficient_suffix in
+                            INSUFFICIENT_RETAILER_MATCH_SUFFIXES)
+                    and substring_end not in INSUFFICIENT_RETAILER_MATCH_SUFFIXES
+                )
+        ):
+            matches.append(retailer)
+    return matches
+
+
+class RetailerAffixIndexTest(unittest.TestCase):
+
+    def test_prefix_and_suffix_lookups(self):
+        index = RetailerAffixIndex(['shop-de', 'ab', 'shop', 'a', 'xshop', 'shop-de'])
+
+        self.assertEqual([0, 2, 5], sorted(index.with_prefix('shop')))
+        self.assertEqual([2, 4], sorted(index.with_suffix('shop')))
+        self.assertEqual(['shop-de', 'ab', 'shop', 'a', 'xshop', 'shop-de'], index.matches(''))
+        self.assertEqual(['shop-de', 'shop', 'xshop', 'shop-de'], index.matches('sh', 'hop'))
+        self.assertEqual([], index.matches('zz', 'zz'))
+
+    def test_advanced_criteria_match_the_per_retailer_scan(self):
+        generator = random.Random(5)
+        alphabet = 'abcd-.'
+        retailer_names = [''.join(generator.choice(alphabet) for _ in range(generator.randint(1, 8)))
+                          for _ in range(400)] + ['shop-de', 'shop-at', 'www-shop-de']
+        filtered_retailers_df = pd.DataFrame({1: retailer_names})
+        query_names = ['', 'www.shop.de', 'https://abc.de/shop', 'shop-de', '-de', 'ab-com'] + [
+            ''.join(generator.choice(alphabet) for _ in range(generator.randint(1, 10))) for _ in range(200)]
+
+        for query_name in query_names:
+            self.assertEqual(advanced_per_retailer(query_name, retailer_names,
+                                                   3 if len(query_name) < 6 else 5),
+                             MatchingCriteria.matching_criteria_advanced(query_name, filtered_retailers_df))
+            self.assertEqual(advanced_per_retailer(query_name, retailer_names,
+                                                   3 if query_name.find('.') <= 3 else 4),
+                             MatchingCriteria.matching_criteria_advanced2(query_name, filtered_retailers_df))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import gc
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.MatchingCriteria import MatchingCriteria
+
+
+class RetailerNameIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.filtered_retailers_df = pd.DataFrame({0: [1, 2, 3], 1: ['shop-at', 'elektro-shop-de', 'www-x']})
+        self.names = ['shop.at', 'shop.at/shop', 'www.elektro-shop.de', 'www.x', 'elektro-shop.de/de', 'unknown.at',
+                      np.nan]
+
+    def test_criteria(self):
+        self.assertEqual('shop-at', MatchingCriteria.matching_criteria_simple('shop.at/shop',
+                                                                              self.filtered_retailers_df))
+        self.assertEqual('www-x', MatchingCriteria.matching_criteria_simple('www.x', self.filtered_retailers_df))
+        self.assertIsNone(MatchingCriteria.matching_criteria_simple('unknown.at', self.filtered_retailers_df))
+        self.assertEqual('elektro-shop-de', MatchingCriteria.matching_criteria_handelsverband(
+            'www.elektro-shop.de', self.filtered_retailers_df))
+        self.assertIsNone(MatchingCriteria.matching_criteria_handelsverband('www.x', self.filtered_retailers_df))
+
+    def test_resolve_many(self):
+        self.assertEqual(['shop-at', 'shop-at', None, 'www-x', 'elektro-shop-de', None, None],
+                         MatchingCriteria.resolve_many(self.names, self.filtered_retailers_df))
+        self.assertEqual(['shop-at', 'shop-at', 'elektro-shop-de', None, 'elektro-shop-de', None, None],
+                         MatchingCriteria.resolve_many(self.names, self.filtered_retailers_df,
+                                                       MatchingCriteria.handelsverband_candidate))
+
+    def test_indexes_are_shared_and_dropped_with_the_retailers(self):
+        name_index = MatchingCriteria.name_index(self.filtered_retailers_df)
+        self.assertIs(name_index, MatchingCriteria.name_index(self.filtered_retailers_df))
+        self.assertIn(id(self.filtered_retailers_df), MatchingCriteria._indexes)
+
+        retailers_id = id(self.filtered_retailers_df)
+        del self.filtered_retailers_df
+        gc.collect()
+        self.assertNotIn(retailers_id, MatchingCriteria._indexes)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -20,6 +20,10 @@ os.makedirs(OUTPUT_DIR, exist_ok=True)
 filtered_haendler_bez_df = pd.read_csv(FILTERED_HAENDLER_BEZ_PATH, sep=";")
 filtered_haendler_bez = filtered_haendler_bez_df.iloc[:, 1].tolist()  # haendler_bez is in the 2nd column
 
+# List every input dir once instead of probing each weekly file on the network filesystem
+INPUT_DIR_FILES = {input_dir: set(os.listdir(input_dir)) if os.path.isdir(input_dir) else set()
+                   for input_dir in INPUT_DIRS}
+
 results = []
 
 
@@ -29,9 +33,9 @@ def process_year(year):
     parquet_files = []
     for week in range(1, 52 if USE_LEAP_WEEK and year % 4 == 0 else 53):
         for input_dir in INPUT_DIRS:
-            parquet_file = os.path.join(input_dir, f'angebot_{year}w{week:02d}.parquet')
-            if os.path.exists(parquet_file):
-                parquet_files.append(parquet_file)
+            file_name = f'angebot_{year}w{week:02d}.parquet'
+            if file_name in INPUT_DIR_FILES[input_dir]:
+                parquet_files.append(os.path.join(input_dir, file_name))
 
     if len(parquet_files) >= 2:
         # Take the first and last parquet files for each year
@@ -0,0 +1,18 @@
+import logging
+
+import CONFIG
+from impl.db.datasource import DuckDBDataSource
+from impl.db.loaders.click_cube import build_click_cube
+from impl.db.loaders.init_db import DatabaseInitializer
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                    filename='00c_build_click_cube.log', filemode='w')
+logger = logging.getLogger(__name__)
+
+if __name__ == '__main__':
+    db = DuckDBDataSource()
+    db_initializer = DatabaseInitializer(db)
+    db_initializer.initialize_database()
+
+    built = build_click_cube(db)
+    logger.info(f"Built {built} click cube files in {CONFIG.CLICK_CUBE_DIR}.")
@@ -0,0 +1,18 @@
+import logging
+
+import CONFIG
+from impl.db.datasource import DuckDBDataSource
+from impl.db.loaders.init_db import DatabaseInitializer
+from impl.db.loaders.offer_coverage_index import build_offer_coverage_index
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                    filename='00d_build_offer_coverage_index.log', filemode='w')
+logger = logging.getLogger(__name__)
+
+if __name__ == '__main__':
+    db = DuckDBDataSource()
+    db_initializer = DatabaseInitializer(db)
+    db_initializer.initialize_database()
+
+    built = build_offer_coverage_index(db)
+    logger.info(f"Built {built} offer coverage bitmaps in {CONFIG.OFFER_COVERAGE_INDEX_DIR}.")
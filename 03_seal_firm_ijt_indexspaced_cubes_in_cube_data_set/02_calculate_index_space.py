@@ -1,9 +1,13 @@
 import os
+import hashlib
+import json
 import logging
+import multiprocessing
+import multiprocessing.util
 import threading
 import time
 import psutil
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from multiprocessing import Manager, Value
 from functools import lru_cache
 
@@ -11,17 +15,40 @@ import polars as pl
 from tqdm import tqdm
 
 import CONFIG
+from ApplicationThreadConfig import ApplicationThreadConfig
 from impl.db.datasource import DuckDBDataSource
+from impl.db.index_space_checkpoint_store import IndexSpaceCheckpointStore
+from impl.db.loaders.click_cube import CLICK_CUBE_MANIFEST, load_click_cube
 from impl.db.loaders.init_db import DatabaseInitializer
 from impl.db.loaders.load_temp_clicks_data import initialize_clicks_table, load_selection_criteria_inflow_click_data
 from impl.db.loaders.load_temp_offers_data import initialize_offer_table, load_selection_criteria_inflow_angebot_data
+from impl.db.loaders.offer_coverage_index import load_offer_coverage_index, offer_coverage_index_is_current
+from impl.db.loaders.offer_store import resolve_offer_source
+from impl.db.loaders.parquet_manifest import get_parquet_manifest, register_parquet_manifest
+from impl.db.loaders.retailer_dictionary import build_retailer_dictionary
+from impl.db.loaders.sliding_window_loader import SlidingWindowLoader
 from impl.factory import Factory
 from impl.helpers import calculate_running_var_t_from_u, print_process_mem_usage
+from impl.service.enum.index_space_engine import IndexSpaceEngine
+from impl.service.enum.index_space_result_format import IndexSpaceResultFormat
+from impl.service.enum.inflow_loading_strategy import InflowLoadingStrategy
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
-                    filename='02_calculate_index_space.log', filemode='w')
 logger = logging.getLogger(__name__)
 
+RESULTS_HEADER = "produkt_id,haendler_bez,week_running_var,firm_has_seal_j\n"
+
+# The CONFIG values the rows of a seal firm depend on, part of the run fingerprint of the checkpoints
+RUN_FINGERPRINT_CONFIG = (
+    'HAS_WEEKS_BEFORE_AND_AFTER_PRODUCT_ANGEBOTEN_AMOUNT',
+    'MAX_WEEKS_BEFORE_AFTER_PRODUCT_ANGEBOTEN_MISSING_ALLOWED_AMOUNT',
+    'OFFER_TIME_SPELLS_PREPROCESSING_WEEKS_PRE_SEAL_CONSIDERED',
+    'OFFER_TIME_SPELLS_PREPROCESSING_WEEKS_POST_SEAL_CONSIDERED',
+    'RANDOM_COUNTERFACTUAL_FIRMS_AMOUNT',
+    'RANDOM_PRODUCTS_AMOUNTS',
+    'RANDOM_SAMPLER_DETERMINISTIC_SEED',
+    'TOP_PRODUCTS_OF_SEAL_CHANGE_FIRM_BY_CLICKS_AMOUNT',
+)
+
 # boundedSemaphore = threading.BoundedSemaphore(120)
 
 
@@ -35,11 +62,11 @@ def monitor_prcss_threads():
 
 
 def free_up_memory_and_drop_table(db: DuckDBDataSource, table_name: str):
-    """Free memory by dropping a table and displaying memory usage."""
+    """Free memory by evicting a table from the table cache and displaying memory usage."""
     print_process_mem_usage()
-    db.free_up_table_and_manipulate_file_logs(table_name)
+    # DuckDB releases the table's memory when it is dropped, there is nothing to wait for.
+    db.table_cache.evict(table_name)
     logger.info(f"Table '{table_name}' dropped to free memory.")
-    time.sleep(60)  # Allow time for resources to be freed.
     print_process_mem_usage()
 
 
@@ -88,11 +115,9 @@ def process_single_product(product, firm_id, seal_date_str, product_service, has
             for week in offered_weeks]
 
 
-def gather_tasks(product, seal_date_str, seal_firms: pl.Series, geizhals_id, allowed_firms: pl.Series, product_service):
+def gather_tasks(product, seal_date_str, geizhals_id, counterfactual_firms: list, product_service):
     """Gather all tasks related to a product and its counterfactual firms."""
     main_task = [(product, geizhals_id, seal_date_str, True, product_service)]
-    counterfactual_firms = product_service.get_rand_max_N_counterfactual_firms(product, seal_date_str, seal_firms,
-                                                                               allowed_firms)
     counterfactual_tasks = [(product, firm, seal_date_str, False, product_service) for firm in counterfactual_firms]
     logger.info(f"Total tasks for product {product}: {len(main_task + counterfactual_tasks)}")
     return main_task + counterfactual_tasks
@@ -105,13 +130,94 @@ def process_task(args):
     return process_single_product(product, firm, seal_date_str, product_service, int(is_main_firm))
 
 
-def process_seal_firm(seal_firm_data, result_counter, db: DuckDBDataSource):
-    """Process all tasks related to a single seal firm."""
+def process_task_block(tasks, seal_date_str, product_service) -> pl.DataFrame:
+    """Process all tasks of a seal firm in one set-based query and return the resulting rows."""
+    task_frame = pl.DataFrame({
+        'produkt_id': [task[0] for task in tasks],
+        'haendler_bez': [task[1] for task in tasks],
+        'firm_has_seal_j': [int(task[3]) for task in tasks],
+    })
+    return product_service.get_offered_weeks_block(task_frame, seal_date_str)
+
+
+def compute_seal_firm_rows(haendler_bez, geizhals_id, seal_date_str, seal_firms: pl.Series, allowed_firms: pl.Series,
+                           product_service, clicks_service, db: DuckDBDataSource,
+                           engine: IndexSpaceEngine = IndexSpaceEngine.PER_TASK, loader: SlidingWindowLoader = None,
+                           offers_table='angebot', clicks_table='clicks', load_clicks=True,
+                           continuity_service=None) -> pl.DataFrame:
+    """
+    Load the inflow window of a single seal firm and compute its (i, j, t) rows.
+    Without load_clicks the click events are not loaded, e.g. if clicks_service ranks on the click cube.
+    A continuity_service (the offer coverage index) replaces the continuous offering check of product_service.
+    The inflow tables are protected from eviction while in use, afterwards the table cache rules apply to all
+    tables but a sliding window.
+    """
+    with db.table_cache.in_use(offers_table, clicks_table):
+        rows = _compute_seal_firm_rows(haendler_bez, geizhals_id, seal_date_str, seal_firms, allowed_firms,
+                                       product_service, clicks_service, db, engine, loader,
+                                       offers_table, clicks_table, load_clicks, continuity_service)
+
+    window_tables = list(loader.loaded_files) if loader is not None else []
+    db.table_cache.enforce(protected=window_tables, after_use=True)
+    return rows
+
+
+def _compute_seal_firm_rows(haendler_bez, geizhals_id, seal_date_str, seal_firms: pl.Series, allowed_firms: pl.Series,
+                            product_service, clicks_service, db: DuckDBDataSource,
+                            engine: IndexSpaceEngine, loader: SlidingWindowLoader,
+                            offers_table, clicks_table, load_clicks, continuity_service) -> pl.DataFrame:
+    if loader is not None:
+        loader.advance_to(seal_date_str)
+    else:
+        free_up_memory_and_drop_table(db, offers_table)
+        initialize_offer_table(db, table_name=offers_table)
+        load_selection_criteria_inflow_angebot_data(db, seal_date_str, table_name=offers_table)
+
+        if load_clicks:
+            free_up_memory_and_drop_table(db, clicks_table)
+            initialize_clicks_table(db, table_name=clicks_table)
+            load_selection_criteria_inflow_click_data(db, seal_date_str, table_name=clicks_table)
+
+    db.table_cache.touch(offers_table, clicks_table)
+
+    products = clicks_service.get_top_n_products_by_clicks(haendler_bez, seal_date_str)
+    logger.info(f"Sampled {len(products)} products for {haendler_bez}.")
+
+    filtered_products = (continuity_service or product_service).filter_continuously_offered_products(
+        haendler_bez, products, seal_date_str,
+        week_amount=CONFIG.HAS_WEEKS_BEFORE_AND_AFTER_PRODUCT_ANGEBOTEN_AMOUNT
+    )
+    logger.info(f"Filtered {len(filtered_products)} products for firm {haendler_bez}.")
+
+    counterfactual_firms = product_service.get_rand_max_N_counterfactual_firms_by_products(
+        filtered_products, seal_date_str, seal_firms, allowed_firms)
+
+    tasks = [task for product in filtered_products for task in
+             gather_tasks(product, seal_date_str, geizhals_id, counterfactual_firms[product], product_service)]
+
+    if not tasks:
+        return pl.DataFrame()
+
+    if engine == IndexSpaceEngine.SET_BASED:
+        return process_task_block(tasks, seal_date_str, product_service)
+
+    if db.cursor_pool is not None:
+        # Every thread queries through its own pooled cursor, so the per task queries overlap.
+        with ThreadPoolExecutor(max_workers=db.cursor_pool.max_size) as task_executor:
+            return pl.DataFrame([row for task_rows in task_executor.map(process_task, tasks) for row in task_rows])
+
+    return pl.DataFrame([row for task in tasks for row in process_task(task)])
+
+
+def process_seal_firm(seal_firm_data, result_counter, db: DuckDBDataSource, store: IndexSpaceCheckpointStore,
+                      engine: IndexSpaceEngine = IndexSpaceEngine.PER_TASK, loader: SlidingWindowLoader = None,
+                      load_clicks=True, continuity_service=None):
+    """Process all tasks related to a single seal firm and checkpoint its rows."""
     haendler_bez, geizhals_id, seal_date, seal_firms, allowed_firms, processed_firms, product_service, clicks_service = seal_firm_data
     firm_seal_key = (haendler_bez, seal_date)
 
-    # Check if the firm_seal_key has already been processed
-    if firm_seal_key in processed_firms:
+    # Check if the firm_seal_key has already been processed (in this or a checkpointed previous run)
+    if firm_seal_key in processed_firms or store.is_completed(haendler_bez, seal_date):
         logger.info(f"Firm {haendler_bez} with seal date {seal_date} already processed. Skipping.")
         return
 
@@ -122,46 +228,261 @@ def process_seal_firm(seal_firm_data, result_counter, db: DuckDBDataSource):
     seal_date_str = seal_date.strftime(CONFIG.SEAL_CHANGE_DATE_PATTERN)
     logger.info(f"Processing seal firm {result_counter.value}: {haendler_bez} for seal date: {seal_date_str}")
 
-    free_up_memory_and_drop_table(db, 'angebot')
-    free_up_memory_and_drop_table(db, 'clicks')
+    rows = compute_seal_firm_rows(haendler_bez, geizhals_id, seal_date_str, seal_firms, allowed_firms,
+                                  product_service, clicks_service, db, engine, loader, load_clicks=load_clicks,
+                                  continuity_service=continuity_service)
+
+    with store.open_shard(haendler_bez, seal_date) as sink:
+        sink.write(rows)
+
+
+def scan_inflow_folders(use_click_cube=False) -> list:
+    """
+    Scan the offer (and click) folders once at start-up, the loaders resolve their files from these manifests.
+    The offer store is only scanned if it covers every raw offer file unchanged (see resolve_offer_source).
+    """
+    offer_dir, offer_folders = resolve_offer_source()
+    manifests = [get_parquet_manifest(offer_dir, offer_folders)]
+    if not use_click_cube:
+        manifests.append(get_parquet_manifest(CONFIG.PARQUET_FILES_DIR, CONFIG.CLICKS_FOLDER))
+    return manifests
+
+
+def index_space_run_fingerprint(engine: IndexSpaceEngine, allowed_firms: pl.Series, use_click_cube: bool,
+                                manifests: list) -> dict:
+    """
+    Fingerprint the settings and inputs the rows of a seal firm depend on: the RUN_FINGERPRINT_CONFIG values,
+    the engine, the allowed firms and the scanned inflow files (and the click cube), so resumed runs never reuse
+    shards computed from other settings or inputs.
+    """
+    def digest(value) -> str:
+        return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    inputs = {
+        f"{manifest.base_dir}|{','.join(manifest.folders)}": digest(sorted(
+            (entry['path'], entry['rows'], entry['time_start'], entry['time_end'])
+            for entry in manifest.entries_by_path.values()))
+        for manifest in manifests
+    }
+    if use_click_cube:
+        inputs['click_cube'] = DuckDBDataSource.file_fingerprint(os.path.join(CONFIG.CLICK_CUBE_DIR,
+                                                                              CLICK_CUBE_MANIFEST))
+    return {
+        'config': {name: getattr(CONFIG, name) for name in RUN_FINGERPRINT_CONFIG},
+        'engine': engine.value,
+        'allowed_firms': digest(sorted(allowed_firms.cast(pl.Utf8).to_list())),
+        'inputs': inputs,
+    }
+
+
+# Per worker process state, set up once by init_index_space_worker.
+_worker_context = {}
+
+
+def init_index_space_worker(worker_counter, worker_count, seal_firms: pl.Series, allowed_firms: pl.Series,
+                            retailer_names: pl.Series, engine: IndexSpaceEngine, loading: InflowLoadingStrategy,
+                            use_click_cube=False, manifests=(), use_offer_coverage_index=False):
+    """
+    Set up a worker process: its own DuckDB connection, thread/memory budget, retailer dictionary
+    and namespaced inflow tables (and the click cube with use_click_cube, the offer coverage table of the seal
+    firms with use_offer_coverage_index). The inflow folder manifests
+    of the main process are reused instead of scanning the folders again.
+    """
+    for manifest in manifests:
+        register_parquet_manifest(manifest)
+
+    with worker_counter.get_lock():
+        worker_id = worker_counter.value
+        worker_counter.value += 1
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        filename=f'02_calculate_index_space_worker_{worker_id}.log', filemode='w')
+
+    # The inflow tables are worker local, so every worker owns a private in-memory database.
+    budget = ApplicationThreadConfig.calculate_worker_thread_distribution(worker_count)
+    db = DuckDBDataSource(db_path=':memory:', threads=budget['duckdb_thread_count'],
+                          memory_limit=budget['duckdb_memory_limit'], bypass_application_thread_config=True)
+    ApplicationThreadConfig.apply_worker_thread_config(db, worker_count)
+    if db.profiler is not None:
+        # Log the worker's query profile to its log file when the pool shuts the worker down.
+        multiprocessing.util.Finalize(db, db.profiler.log_summary, exitpriority=10)
+    logger.info(f"Worker {worker_id} (pid {os.getpid()}) uses {budget['duckdb_thread_count']} DuckDB threads "
+                f"and a {budget['duckdb_memory_limit']} memory limit.")
+
+    # Built from the same names as in the main process, so the retailer ids agree.
+    build_retailer_dictionary(db, retailer_names)
+
+    offers_table = f"angebot_w{worker_id}"
+    clicks_table = f"clicks_w{worker_id}"
+    # The offer source resolved (and checked against the raw offer files) by the main process, whose offer manifest
+    # comes first
+    offer_dir, offer_folders = (manifests[0].base_dir, manifests[0].folders) if manifests else resolve_offer_source()
+
+    if use_click_cube:
+        load_click_cube(db)
+    if use_offer_coverage_index:
+        load_offer_coverage_index(db, seal_firms)
+
+    _worker_context.update(
+        db=db,
+        engine=engine,
+        loading=loading,
+        # Workers always track their loaded files, RELOAD resets the window before every seal firm.
+        loader=SlidingWindowLoader(db, offers_table=offers_table, clicks_table=clicks_table,
+                                   offer_dir=offer_dir, offer_folders=offer_folders, load_clicks=not use_click_cube),
+        seal_firms=seal_firms,
+        allowed_firms=allowed_firms,
+        product_service=Factory.create_offers_service(offers_table),
+        clicks_service=(Factory.create_click_cube_service() if use_click_cube
+                        else Factory.create_clicks_service(clicks_table)),
+        continuity_service=Factory.create_offer_coverage_service() if use_offer_coverage_index else None,
+    )
 
-    initialize_clicks_table(db)
-    initialize_offer_table(db)
-    load_selection_criteria_inflow_angebot_data(db, seal_date_str)
-    load_selection_criteria_inflow_click_data(db, seal_date_str)
 
-    products = clicks_service.get_top_n_products_by_clicks(haendler_bez, seal_date_str)
-    logger.info(f"Sampled {len(products)} products for {haendler_bez}.")
-
-    filtered_products = product_service.filter_continuously_offered_products(
-        haendler_bez, products, seal_date_str,
-        week_amount=CONFIG.HAS_WEEKS_BEFORE_AND_AFTER_PRODUCT_ANGEBOTEN_AMOUNT
-    )
-    logger.info(f"Filtered {len(filtered_products)} products for firm {haendler_bez}.")
+def process_seal_firm_in_worker(haendler_bez, geizhals_id, seal_date) -> pl.DataFrame:
+    """Compute the rows of a single seal firm inside a worker process set up by init_index_space_worker."""
+    context = _worker_context
+    seal_date_str = seal_date.strftime(CONFIG.SEAL_CHANGE_DATE_PATTERN)
+    logger.info(f"Processing seal firm {haendler_bez} for seal date: {seal_date_str}")
+
+    if context['loading'] == InflowLoadingStrategy.RELOAD:
+        context['loader'].reset()
+
+    return compute_seal_firm_rows(haendler_bez, geizhals_id, seal_date_str, context['seal_firms'],
+                                  context['allowed_firms'], context['product_service'], context['clicks_service'],
+                                  context['db'], context['engine'], context['loader'],
+                                  continuity_service=context['continuity_service'])
+
+
+def process_seal_firm_chunk_in_worker(seal_firm_keys: list) -> list:
+    """
+    Compute the rows of a chunk of seal firms, in seal date order, inside a worker process, so its sliding
+    inflow window keeps reusing the loaded files from one seal firm to the next.
+    """
+    return [process_seal_firm_in_worker(*key) for key in seal_firm_keys]
+
+
+def chunk_seal_firm_keys(seal_firm_keys: list, chunk_count: int) -> list:
+    """
+    Split the seal firm keys (haendler_bez, geizhals_id, seal_date) sorted by seal date into chunk_count
+    contiguous chunks of (almost) equal size.
+    """
+    seal_firm_keys = sorted(seal_firm_keys, key=lambda key: key[2])
+    chunk_size, larger_chunks = divmod(len(seal_firm_keys), chunk_count)
+    chunks, start = [], 0
+    for chunk_number in range(chunk_count):
+        end = start + chunk_size + (chunk_number < larger_chunks)
+        chunks.append(seal_firm_keys[start:end])
+        start = end
+    return [chunk for chunk in chunks if chunk]
+
+
+def calculate_index_space_in_worker_processes(seal_firm_keys: list, seal_firms: pl.Series, allowed_firms: pl.Series,
+                                              retailer_names: pl.Series, store: IndexSpaceCheckpointStore,
+                                              engine: IndexSpaceEngine, loading: InflowLoadingStrategy,
+                                              use_click_cube=False, manifests=(), use_offer_coverage_index=False):
+    """
+    Compute the not yet completed seal firms in a bounded pool of worker processes and checkpoint their rows.
+    Every worker gets one contiguous chunk of the seal firms in seal date order (see chunk_seal_firm_keys),
+    instead of one task per seal firm interleaving the seal dates across the workers.
+    """
+    seal_firm_keys = [(haendler_bez, haendler_bez, seal_date) for haendler_bez, seal_date in seal_firm_keys
+                      if not store.is_completed(haendler_bez, seal_date)]
+    if not seal_firm_keys:
+        return
 
-    tasks = [task for product in filtered_products for task in
-             gather_tasks(product, seal_date_str, seal_firms, geizhals_id, allowed_firms, product_service)]
+    worker_count = max(1, min(CONFIG.SPAWN_MAX_MAIN_PROCESSES_AMOUNT, len(seal_firm_keys)))
+    mp_context = multiprocessing.get_context('spawn')
+    worker_counter = mp_context.Value('i', 0)
 
-    with open('results.csv', 'a') as csvfile:
-        for task in tasks:
-            results = process_task(task)
-            write_results_to_csv(results, csvfile)
+    with ProcessPoolExecutor(max_workers=worker_count, mp_context=mp_context,
+                             initializer=init_index_space_worker,
+                             initargs=(worker_counter, worker_count, seal_firms, allowed_firms, retailer_names,
+                                       engine, loading, use_click_cube, manifests, use_offer_coverage_index)
+                             ) as executor:
+        logger.info(f"ProcessPoolExecutor max workers set to {worker_count}")
 
+        futures = {executor.submit(process_seal_firm_chunk_in_worker, chunk): chunk
+                   for chunk in chunk_seal_firm_keys(seal_firm_keys, worker_count)}
 
-def write_results_to_csv(results, csvfile):
-    """Write processed results to CSV."""
-    for row in results:
-        csvfile.write(
-            f"{row['produkt_id']},{row['haendler_bez']},{row['week_running_var']},{row['firm_has_seal_j']}\n"
-        )
-        csvfile.flush()
+        # Only the main process writes shards, the results file is assembled in seal firm order afterwards.
+        with tqdm(total=len(seal_firm_keys), desc="Processing seal firms") as progress:
+            for future in as_completed(futures):
+                chunk = futures[future]
+                for (haendler_bez, _, seal_date), rows in zip(chunk, future.result()):
+                    with store.open_shard(haendler_bez, seal_date) as sink:
+                        sink.write(rows)
+                progress.update(len(chunk))
 
 
 def calculate_index_space(db: DuckDBDataSource, seal_firms: pl.DataFrame, allowed_firms: pl.DataFrame,
-                          seal_change_firms: pl.DataFrame, parallel=False):
-    """Main function to calculate index space across multiple seal firms."""
+                          seal_change_firms: pl.DataFrame, parallel=False,
+                          engine: IndexSpaceEngine = IndexSpaceEngine.PER_TASK,
+                          loading: InflowLoadingStrategy = InflowLoadingStrategy.RELOAD,
+                          resume=False, checkpoint_dir=CONFIG.INDEX_SPACE_CHECKPOINT_DIR,
+                          result_format: IndexSpaceResultFormat = IndexSpaceResultFormat.CSV,
+                          use_click_cube=CONFIG.USE_CLICK_CUBE,
+                          use_offer_coverage_index=CONFIG.USE_OFFER_COVERAGE_INDEX):
+    """
+    Main function to calculate index space across multiple seal firms.
+    Every seal firm is checkpointed to its own shard, with resume=True the completed seal firms of a
+    previous (interrupted) run with the same run fingerprint (index_space_run_fingerprint) are skipped,
+    shards of a run with other settings or inputs are discarded. The results file (CSV) or dataset (Parquet) is assembled
+    from the shards at the end. With use_click_cube the top N products are ranked on the click cube
+    (built by 00c_build_click_cube.py) and no click events are loaded per seal firm. With use_offer_coverage_index
+    the continuous offering check runs on the offer coverage index (built by 00d_build_offer_coverage_index.py),
+    as long as it is current with the offer store.
+    """
     logger.info("Starting index space calculation.")
 
+    if use_offer_coverage_index and not offer_coverage_index_is_current():
+        logger.warning(f"Offer coverage index {CONFIG.OFFER_COVERAGE_INDEX_DIR} is not current with the offer store "
+                       f"{CONFIG.OFFER_STORE_DIR}. Checking the continuous offering on the offer spells instead.")
+        use_offer_coverage_index = False
+
+    if loading == InflowLoadingStrategy.SLIDING_WINDOW:
+        # Consecutive seal dates share most of their inflow window, so slide it instead of reloading it.
+        seal_change_firms = seal_change_firms.sort('Guetesiegel First Date', maintain_order=True)
+
+    manifests = scan_inflow_folders(use_click_cube)
+
+    store = IndexSpaceCheckpointStore(checkpoint_dir, result_format, run_fingerprint=index_space_run_fingerprint(
+        engine, allowed_firms.to_series(1), use_click_cube, manifests))
+    if resume:
+        store.discard_partial_shards()
+        store.discard_stale_shards()
+    else:
+        store.clear()
+
+    seal_firm_keys = list(dict.fromkeys(
+        (row['RESULTING MATCH'], row['Guetesiegel First Date']) for row in seal_change_firms.iter_rows(named=True)
+    ))
+    completed = sum(store.is_completed(haendler_bez, seal_date) for haendler_bez, seal_date in seal_firm_keys)
+    logger.info(f"Processing seal firms... ({completed} of {len(seal_firm_keys)} already checkpointed)")
+
+    if parallel:
+        # Every worker process owns its DuckDB connection and inflow tables.
+        retailer_names = Factory.create_retailer_dictionary_repository().fetch_all()['haendler_bez']
+        calculate_index_space_in_worker_processes(seal_firm_keys, seal_firms.to_series(2), allowed_firms.to_series(1),
+                                                  retailer_names, store, engine, loading, use_click_cube, manifests,
+                                                  use_offer_coverage_index)
+        assemble_results(store, seal_firm_keys)
+        return
+
+    if use_click_cube:
+        load_click_cube(db)
+    continuity_service = None
+    if use_offer_coverage_index:
+        load_offer_coverage_index(db, seal_firms.to_series(2))
+        continuity_service = Factory.create_offer_coverage_service()
+
+    loader = None
+    if loading == InflowLoadingStrategy.SLIDING_WINDOW:
+        offer_dir, offer_folders = resolve_offer_source()
+        loader = SlidingWindowLoader(db, offer_dir=offer_dir, offer_folders=offer_folders,
+                                     load_clicks=not use_click_cube)
+        loader.reset()
+
     with Manager() as manager:
         processed_firms = manager.dict()  # thread-safe dict
         result_counter = Value('i', 0)  # thread-safe counter
@@ -176,33 +497,32 @@ def calculate_index_space(db: DuckDBDataSource, seal_firms: pl.DataFrame, allowe
                 allowed_firms.to_series(1),  # filtered allowed firms as counterfactual firms
                 processed_firms,  # thread-safe dict
                 Factory.create_offers_service(),
-                Factory.create_clicks_service()
+                Factory.create_click_cube_service() if use_click_cube else Factory.create_clicks_service()
             )
             for row in seal_change_firms.iter_rows(named=True)
         ]
 
-        logger.info("Processing seal firms...")
-        with open('results.csv', 'w') as csvfile:
-            csvfile.write("produkt_id,haendler_bez,week_running_var,firm_has_seal_j\n")
-
-        if parallel:
-            with ThreadPoolExecutor(max_workers=CONFIG.SPAWN_MAX_MAIN_PROCESSES_AMOUNT) as executor:
-                logger.info(f"ThreadPoolExecutor max workers set to {executor._max_workers}")
+        with ThreadPoolExecutor(max_workers=1) as single_executor:
+            futures = [single_executor.submit(process_seal_firm, args, result_counter, db, store, engine, loader,
+                                              not use_click_cube, continuity_service)
+                       for args in seal_firm_data_list]
 
-                futures = [executor.submit(process_seal_firm, args, result_counter, db)
-                           for args in seal_firm_data_list]
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Processing seal firms"):
+                future.result()
 
-                for future in tqdm(as_completed(futures), total=len(futures), desc="Processing seal firms"):
-                    future.result()
-        else:
-            with ThreadPoolExecutor(max_workers=1) as single_executor:
-                futures = [single_executor.submit(process_seal_firm, args, result_counter, db)
-                           for args in seal_firm_data_list]
+    if loader is not None:
+        logger.info(f"Sliding window inflow loading read {loader.files_read} files.")
+    assemble_results(store, seal_firm_keys)
 
-                for future in tqdm(as_completed(futures), total=len(futures), desc="Processing seal firms"):
-                    future.result()
 
-    logger.info("Processing complete and results saved to results.csv.")
+def assemble_results(store: IndexSpaceCheckpointStore, seal_firm_keys: list):
+    """Assemble the checkpointed shards into the results file (CSV) or the partitioned dataset (Parquet)."""
+    if store.result_format == IndexSpaceResultFormat.PARQUET:
+        store.assemble_dataset(CONFIG.INDEX_SPACE_RESULTS_PARQUET_DIR, seal_firm_keys)
+        logger.info(f"Processing complete and results saved to {CONFIG.INDEX_SPACE_RESULTS_PARQUET_DIR}.")
+    else:
+        store.assemble(CONFIG.INDEX_SPACE_RESULTS_FILE, seal_firm_keys, RESULTS_HEADER)
+        logger.info(f"Processing complete and results saved to {CONFIG.INDEX_SPACE_RESULTS_FILE}.")
 
 
 def main():
@@ -232,10 +552,19 @@ def main():
     monitoring_thread.start()
 
     calculate_index_space(db, seal_change_firms, allowed_firms, seal_change_firms,
-                          parallel=False)
+                          parallel=True, engine=IndexSpaceEngine.SET_BASED,
+                          loading=InflowLoadingStrategy.SLIDING_WINDOW, resume=CONFIG.INDEX_SPACE_RESUME,
+                          result_format=IndexSpaceResultFormat.PARQUET)
+
+    if db.profiler is not None:
+        db.profiler.log_summary()
 
 
 if __name__ == '__main__':
+    # Configured here, as spawned worker processes re-import this module and log to their own files.
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        filename='02_calculate_index_space.log', filemode='w')
+
     os.environ["POLARS_MAX_THREADS"] = "64"
     os.environ["NUMEXPR_MAX_THREADS"] = "32"
     os.environ["ARROW_NUM_THREADS"] = "8"
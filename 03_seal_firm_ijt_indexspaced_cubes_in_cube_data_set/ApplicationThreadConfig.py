@@ -1,3 +1,4 @@
+import re
 from functools import lru_cache
 
 import CONFIG
@@ -27,3 +28,37 @@ class ApplicationThreadConfig:
         db_connection.conn.execute("SET allocator_background_threads=true;")
         db_connection.conn.execute(f"SET allocator_background_threads={config['duckdb_background_thread_count']};")
         db_connection.conn.execute(f"SET threads={config['duckdb_thread_count']};")
+
+    @staticmethod
+    def calculate_worker_thread_distribution(worker_count: int):
+        """
+        Split the DuckDB thread and memory budget evenly across worker processes, each owning a connection.
+        """
+        config = ApplicationThreadConfig.calculate_thread_distribution()
+        worker_count = max(1, worker_count)
+
+        return {
+            "duckdb_thread_count": max(1, config["duckdb_thread_count"] // worker_count),
+            "duckdb_background_thread_count": max(1, config["duckdb_background_thread_count"] // worker_count),
+            "duckdb_memory_limit": ApplicationThreadConfig.split_memory_limit(CONFIG.DUCKDB_MEMORY_LIMIT, worker_count),
+        }
+
+    @staticmethod
+    def split_memory_limit(memory_limit: str, parts: int) -> str:
+        """
+        Split a DuckDB memory limit such as '1200GB' into equal parts, returned in MB.
+        """
+        units_in_mb = {"KB": 1 / 1000, "MB": 1, "GB": 1000, "TB": 1000 * 1000}
+        match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]B)\s*", memory_limit.upper())
+        if not match:
+            raise ValueError(f"Unsupported memory limit: {memory_limit}")
+
+        memory_limit_mb = float(match.group(1)) * units_in_mb[match.group(2)]
+        return f"{max(1, int(memory_limit_mb // max(1, parts)))}MB"
+
+    @staticmethod
+    def apply_worker_thread_config(db_connection, worker_count: int):
+        config = ApplicationThreadConfig.calculate_worker_thread_distribution(worker_count)
+        db_connection.conn.execute("SET allocator_background_threads=true;")
+        db_connection.conn.execute(f"SET threads={config['duckdb_thread_count']};")
+        db_connection.conn.execute(f"SET memory_limit='{config['duckdb_memory_limit']}';")
@@ -12,10 +12,27 @@ NCPUS = os.getenv("NCPUS")  # should be available
 # or psutil.cpu_count(logical=True)
 
 # DUCKDB CONFIG
-DUCKDB_PATH = ':memory:'
+# Persistent snapshot: keep the database on disk, so the scripts reuse the loaded base tables (seal change firms,
+# filtered retailers, products, retailers and the retailer dictionary) as long as their input files are unchanged
+# according to the size, mtime and hash recorded in file_log, instead of reloading them at every start
+USE_DUCKDB_SNAPSHOT = False
+DUCKDB_SNAPSHOT_PATH = './data/seal_analysis.duckdb'
+DUCKDB_PATH = DUCKDB_SNAPSHOT_PATH if USE_DUCKDB_SNAPSHOT else ':memory:'
+# Estimated (uncompressed) bytes the loaded tables may hold before the least recently used ones are evicted
+# (TableCacheManager), None for no budget; the per table rules are set in TABLES_CONFIG
+TABLE_CACHE_MEMORY_BUDGET_BYTES = None
+# Bytes hashed at the head and at the tail of a loaded file (the Parquet footer) to fingerprint a snapshot input file in file_log
+FILE_LOG_HASH_SAMPLE_BYTES = 1 << 20
 DUCKDB_MEMORY_LIMIT = '1200GB'   # TODO: Set based on curr Caps
 MAX_DUCKDB_THREADS = 128  # test
 MAX_DUCKDB_BACKGROUND_THREADS = 32
+# Pooled access: every thread queries through its own cursor, at most DUCKDB_CURSOR_POOL_SIZE at once
+USE_DUCKDB_CURSOR_POOL = False
+DUCKDB_CURSOR_POOL_SIZE = 8
+# Query profiling: wall time, rows and fingerprint per query, summarized per repository method at the end of
+# Script 2 together with the EXPLAIN ANALYZE plans of the QUERY_PROFILER_SLOWEST_N slowest queries
+PROFILE_QUERIES = False
+QUERY_PROFILER_SLOWEST_N = 10
 
 # PYTHON CONFIG
 # Processors
@@ -41,6 +58,10 @@ UNIX_WEDNESDAY_MIDDAY_INTERCEPT = UNIX_DAY * 2.5  # From Monday 0:00 GMT+0000
 UNIX_TIME_ORIGIN = 1179093600
 
 UNIX_TIME_ORIGIN_FIRST_WEEK_WEDNESDAY = UNIX_TIME_ORIGIN + UNIX_WEDNESDAY_MIDDAY_INTERCEPT
+
+# RANGE OF THE RUNNING VARIABLE t, e.g. the bit positions of the offer coverage index
+WEEK_RUNNING_VAR_MIN = -26
+WEEK_RUNNING_VAR_MAX = 832
 # UNIX_TIME_ORIGIN + t=8 weeks
 UNIX_TIME_ORIGIN_T8_INTERCEPT = UNIX_TIME_ORIGIN + 8 * UNIX_WEEK
 
@@ -99,6 +120,13 @@ CSV_OUTPUT_DELIM_STYLE = ","
 # STATIC INPUT FILES
 SEAL_CHANGE_DATE_PATTERN = '%d.%m.%Y'
 
+# INDEX SPACE OUTPUT FILES
+INDEX_SPACE_RESULTS_FILE = 'results.csv'
+INDEX_SPACE_CHECKPOINT_DIR = './index_space_checkpoints'  # one shard per (seal firm, seal date) and a manifest.json
+INDEX_SPACE_RESUME = False  # skip the seal firms checkpointed by a previous run with the same run fingerprint
+INDEX_SPACE_RESULTS_PARQUET_DIR = 'results_parquet'  # hive partitioned by seal_firm and seal_date
+INDEX_SPACE_RESULT_BATCH_SIZE = 65536  # rows per Arrow record batch (Parquet row group)
+
 # GLOBAL FILE PATHS
 PARQUET_FILES_DIR = Path("/nfn_vwl/geizhals/zieg_pq_db")
 # PARQUET_FILES_DIR = Path("./data")
@@ -113,6 +141,29 @@ SEAL_CHANGE_FIRMS = './data/final_matrix.csv'  # Contains j ∈ { J_G } in the c
 # and t_seal_change in the column Guetesiegel First Date in the format of 12.07.2007 until row 255
 # the seal provider is in the first column
 
+# OFFER STORE (built once by 00b_build_offer_store.py)
+# The weekly offer files reduced to the filtered_haendler_bez retailers and OFFER_STORE_COLUMNS,
+# sorted by (haendler_bez, produkt_id, dtimebegin), under the same file names.
+OFFER_STORE_DIR = Path("./data/offer_store")
+OFFER_STORE_COLUMNS = ['produkt_id', 'haendler_bez', 'dtimebegin', 'dtimeend']
+OFFER_STORE_ROW_GROUP_SIZE = 122880
+USE_OFFER_STORE = True  # falls back to the raw offer files if the store is not built
+
+# CLICK CUBE (built incrementally by 00c_build_click_cube.py)
+# The monthly click files of the filtered_haendler_bez retailers aggregated to
+# (haendler_bez, produkt_id, week_running_var, clicks), one cube file per click file.
+CLICK_CUBE_DIR = Path("./data/click_cube")
+# Rank the top N products of a seal firm on the click cube, i.e. by the clicks of whole weeks t around the seal week,
+# instead of the click events of the seal date +- HAS_WEEKS_BEFORE_AND_AFTER_PRODUCT_ANGEBOTEN_AMOUNT weeks.
+USE_CLICK_CUBE = False
+
+# OFFER COVERAGE INDEX (built by 00d_build_offer_coverage_index.py from the offer store)
+# Two weekly bitmaps per (haendler_bez, produkt_id) over WEEK_RUNNING_VAR_MIN..WEEK_RUNNING_VAR_MAX (local wall clock
+# weeks): the weeks with a weekly offer spell step and the weeks with a step at their very start.
+OFFER_COVERAGE_INDEX_DIR = Path("./data/offer_coverage_index")
+# Check the continuous offering of the top N products of a seal firm on the index instead of stepping the offer spells
+USE_OFFER_COVERAGE_INDEX = False
+
 # PARQUET DATABASE FILES
 
 # ANGEBOTE FOLDERS
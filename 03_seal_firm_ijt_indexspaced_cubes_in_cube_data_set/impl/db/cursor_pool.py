@@ -0,0 +1,73 @@
+import logging
+import threading
+from contextlib import contextmanager
+
+import duckdb
+
+import CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class DuckDBCursorPool:
+    """
+    Hands every thread its own cursor (conn.cursor()) on the database of a DuckDB connection.
+
+    Cursors are cached per thread, so a thread reuses its cursor (and the views registered on it), and at most
+    max_size threads hold a checked out cursor at the same time. A DuckDB connection must not be used by
+    several threads at once, whereas cursors of the same database can run their queries concurrently.
+    """
+
+    def __init__(self, conn: duckdb.DuckDBPyConnection, max_size: int = CONFIG.DUCKDB_CURSOR_POOL_SIZE):
+        """
+        Parameters:
+        conn (duckdb.DuckDBPyConnection): The connection whose database the cursors are opened on.
+        max_size (int): The maximum number of concurrently checked out cursors.
+        """
+        self.conn = conn
+        self.max_size = max_size
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.local = threading.local()
+        self.cursors = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def checkout(self):
+        """
+        Check out the cursor of the calling thread, waiting while max_size other threads hold theirs.
+        Nested checkouts of the same thread reuse the outer one.
+
+        Yields:
+        duckdb.DuckDBPyConnection: The cursor of the calling thread.
+        """
+        depth = getattr(self.local, 'depth', 0)
+        if depth == 0:
+            self.slots.acquire()
+        self.local.depth = depth + 1
+        try:
+            yield self._thread_cursor()
+        finally:
+            self.local.depth -= 1
+            if self.local.depth == 0:
+                self.slots.release()
+
+    def close(self):
+        """
+        Close all cursors handed out by the pool.
+        """
+        with self.lock:
+            for cursor in self.cursors:
+                cursor.close()
+            logger.info(f"Closed {len(self.cursors)} pooled DuckDB cursors.")
+            self.cursors = []
+        self.local = threading.local()
+
+    def _thread_cursor(self) -> duckdb.DuckDBPyConnection:
+        cursor = getattr(self.local, 'cursor', None)
+        if cursor is None:
+            with self.lock:
+                cursor = self.conn.cursor()
+                self.cursors.append(cursor)
+            self.local.cursor = cursor
+            logger.info(f"Opened pooled DuckDB cursor for thread {threading.current_thread().name}.")
+        return cursor
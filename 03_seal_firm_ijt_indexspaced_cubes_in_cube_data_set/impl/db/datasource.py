@@ -1,15 +1,22 @@
+import hashlib
 import logging
+import os
 import pathlib
 import time
+from contextlib import contextmanager
 from datetime import datetime
 from typing import List, Optional
 
 import duckdb
 import polars as pl
+import pyarrow as pa
 
 import CONFIG
 from ApplicationThreadConfig import ApplicationThreadConfig
 from TABLES_CONFIG import TABLES_CONFIG
+from impl.db.cursor_pool import DuckDBCursorPool
+from impl.db.query_profiler import QueryProfiler
+from impl.db.table_cache import TableCacheManager
 from impl.singleton import Singleton
 
 logger = logging.getLogger(__name__)
@@ -22,7 +29,10 @@ class DuckDBDataSource(Singleton):
                  memory_limit: str = CONFIG.DUCKDB_MEMORY_LIMIT,
                  tables_config: dict = TABLES_CONFIG,
                  bypass_singleton=False,
-                 bypass_application_thread_config=False):
+                 bypass_application_thread_config=False,
+                 pooled: bool = CONFIG.USE_DUCKDB_CURSOR_POOL,
+                 cursor_pool_size: int = CONFIG.DUCKDB_CURSOR_POOL_SIZE,
+                 profile_queries: bool = CONFIG.PROFILE_QUERIES):
         """
         Initialize the DuckDB connection and configure threads.
 
@@ -30,6 +40,9 @@ class DuckDBDataSource(Singleton):
         db_path (str): The path to the DuckDB database file.
         threads (int): The number of threads DuckDB should use.
         bypass_singleton (bool): Whether to bypass Singleton for test purposes.
+        pooled (bool): Whether every thread queries through its own cursor (see enable_cursor_pool).
+        cursor_pool_size (int): The maximum number of concurrently checked out cursors if pooled.
+        profile_queries (bool): Whether to record every query in a QueryProfiler (see enable_profiler).
         """
         if bypass_singleton or not hasattr(self, 'conn'):
             # Create DuckDB connection if it doesn't exist or bypassing singleton
@@ -49,10 +62,62 @@ class DuckDBDataSource(Singleton):
 
             # Set TABLES_CONFIG dict
             self.tables_config = tables_config
+            self.table_cache = TableCacheManager(self, tables_config)
 
             # Set allocator_background_threads
             self.conn.execute("SET allocator_background_threads=true;")
 
+            self.cursor_pool = None
+            if pooled:
+                self.enable_cursor_pool(cursor_pool_size)
+
+            self.profiler = None
+            if profile_queries:
+                self.enable_profiler()
+
+    def enable_cursor_pool(self, max_size: int = CONFIG.DUCKDB_CURSOR_POOL_SIZE):
+        """
+        Switch to pooled access: queryAsPl, query, register and unregister run on a cursor of the calling thread
+        (see DuckDBCursorPool), so repositories can be queried from several threads concurrently.
+        Bulk loads keep using the connection.
+
+        Parameters:
+        max_size (int): The maximum number of concurrently checked out cursors.
+        """
+        if self.cursor_pool is None:
+            self.cursor_pool = DuckDBCursorPool(self.conn, max_size)
+            logger.info(f"Enabled DuckDB cursor pool with at most {max_size} cursors.")
+
+    def enable_profiler(self, slowest_n: int = CONFIG.QUERY_PROFILER_SLOWEST_N) -> QueryProfiler:
+        """
+        Record the wall time, returned rows and fingerprint of every queryAsPl and query call per calling method,
+        and the EXPLAIN ANALYZE plans of the slowest_n slowest queryAsPl SELECTs (see QueryProfiler).
+
+        Parameters:
+        slowest_n (int): The number of slowest queries to keep the plans of.
+
+        Returns:
+        QueryProfiler: The profiler, e.g. to log_summary at the end of a run.
+        """
+        if self.profiler is None:
+            self.profiler = QueryProfiler(slowest_n)
+            logger.info(f"Enabled query profiling (plans of the {slowest_n} slowest queries).")
+        return self.profiler
+
+    @contextmanager
+    def cursor(self):
+        """
+        Check out the cursor of the calling thread if pooled, otherwise the connection.
+
+        Yields:
+        duckdb.DuckDBPyConnection: The cursor or connection to execute queries on.
+        """
+        if self.cursor_pool is None:
+            yield self.conn
+            return
+        with self.cursor_pool.checkout() as cursor:
+            yield cursor
+
     # https://duckdb.org/docs/configuration/overview.html
     def log_duckdb_config(self):
         """
@@ -66,7 +131,8 @@ class DuckDBDataSource(Singleton):
 
     def initialize_file_log_table(self):
         """
-        Create a file log table if it does not exist to track file insertions.
+        Create a file log table if it does not exist to track file insertions, together with the size, mtime
+        and hash of the snapshot input files, so a persistent database can tell unchanged inputs from changed ones.
         """
         self.conn.execute("""
             CREATE TABLE IF NOT EXISTS file_log (
@@ -74,37 +140,132 @@ class DuckDBDataSource(Singleton):
                 insert_timestamp TIMESTAMP
             )
         """)
+        # Databases written before the files were fingerprinted lack these columns
+        for column, column_type in (('file_bytes', 'BIGINT'), ('file_mtime', 'DOUBLE'), ('file_hash', 'VARCHAR')):
+            self.conn.execute(f"ALTER TABLE file_log ADD COLUMN IF NOT EXISTS {column} {column_type}")
         logger.info("Initialized file_log table.")
 
+    def is_file_loaded(self, file_name: str) -> bool:
+        """
+        Check whether a file has been loaded and is unchanged since, as recorded in the file log.
+
+        Parameters:
+        file_name (str): The path of the file to check.
+
+        Returns:
+        bool: True if the file has been loaded and is unchanged, otherwise False.
+        """
+        return self._has_file_been_inserted(str(file_name))
+
     def _has_file_been_inserted(self, file_name: str) -> bool:
         """
-        Check if the file has already been inserted into the database.
+        Check if the file has already been inserted into the database and has not changed since.
+        A file counts as unchanged if its size and mtime match the log, or, if only its mtime differs
+        (e.g. it was copied or touched), its hash. Entries without a fingerprint (the inflow files, whose tables
+        are dropped with their file log entries at start-up) and files which are not local count as unchanged
+        once logged.
 
         Parameters:
         file_name (str): The name of the file to check.
 
         Returns:
-        bool: True if the file has been inserted, otherwise False.
+        bool: True if the file has been inserted and is unchanged, otherwise False.
         """
-        result = self.conn.execute(
-            "SELECT COUNT(*) AS count FROM file_log WHERE file_name = ?",
+        logged = self.conn.execute(
+            "SELECT file_bytes, file_mtime, file_hash FROM file_log WHERE file_name = ?",
             (file_name,)
         ).fetchone()
-        return result[0] > 0
+        if logged is None:
+            return False
 
-    def _log_file_insertion(self, file_name: str):
+        file_bytes, file_mtime, file_hash = logged
+        if file_bytes is None or not os.path.isfile(file_name):
+            return True
+
+        file_stat = os.stat(file_name)
+        if file_stat.st_size != file_bytes:
+            return False
+        return file_stat.st_mtime == file_mtime or self._file_hash(file_name) == file_hash
+
+    def _is_file_logged(self, file_name: str) -> bool:
+        return self.conn.execute("SELECT COUNT(*) FROM file_log WHERE file_name = ?", (file_name,)).fetchone()[0] > 0
+
+    def _log_file_insertion(self, file_name: str, fingerprint: bool = False):
         """
-        Log the insertion of a file with the current timestamp.
+        Log the insertion of a file with the current timestamp and, optionally, the fingerprint of the file.
 
         Parameters:
         file_name (str): The name of the file being inserted into the log.
+        fingerprint (bool, optional): Record the size, mtime and hash of the file. Defaults to False.
+        """
+        self._log_file_insertions([file_name], fingerprint)
+
+    def _log_file_insertions(self, file_names: List[str], fingerprint: bool = False):
+        """
+        Log the insertion of files with the current timestamp, in one batch. Only the snapshot input files are
+        fingerprinted, the inflow files are logged without touching them.
+
+        Parameters:
+        file_names (List[str]): The names of the files being inserted into the log.
+        fingerprint (bool, optional): Record the size, mtime and hash of the files. Defaults to False.
         """
         insert_time = datetime.now()
-        self.conn.execute(
-            "INSERT INTO file_log (file_name, insert_timestamp) VALUES (?, ?)",
-            (file_name, insert_time)
+        rows = []
+        for file_name in file_names:
+            file_bytes, file_mtime, file_hash = None, None, None
+            if fingerprint and os.path.isfile(file_name):
+                file_stat = os.stat(file_name)
+                file_bytes, file_mtime, file_hash = file_stat.st_size, file_stat.st_mtime, self._file_hash(file_name)
+            rows.append((file_name, insert_time, file_bytes, file_mtime, file_hash))
+
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO file_log (file_name, insert_timestamp, file_bytes, file_mtime, file_hash) "
+            "VALUES (?, ?, ?, ?, ?)",
+            rows
         )
-        logger.info(f"Logged file insertion: {file_name} at {insert_time}")
+        for file_name in file_names:
+            logger.info(f"Logged file insertion: {file_name} at {insert_time}")
+
+    @staticmethod
+    def file_fingerprint(file_name) -> Optional[dict]:
+        """
+        The path, size and content hash of a small input file (its mtime is ignored), e.g. a filter file
+        a derived store was built with.
+
+        Parameters:
+        file_name (str): The path of the file.
+
+        Returns:
+        dict: The fingerprint, None if the file does not exist.
+        """
+        if not os.path.isfile(file_name):
+            return None
+        return {'source': str(file_name), 'bytes': os.path.getsize(file_name),
+                'hash': DuckDBDataSource._file_hash(str(file_name))}
+
+    @staticmethod
+    def _file_hash(file_name: str, sample_bytes: int = CONFIG.FILE_LOG_HASH_SAMPLE_BYTES) -> str:
+        """
+        Hash the size, the head and the tail of a file. For Parquet files the tail holds the footer with the
+        row group statistics, so any rewrite changes the hash without reading the whole file.
+
+        Parameters:
+        file_name (str): The path of the file.
+        sample_bytes (int, optional): The number of bytes hashed at the head and at the tail.
+
+        Returns:
+        str: The hex digest.
+        """
+        file_size = os.path.getsize(file_name)
+        digest = hashlib.sha256(str(file_size).encode('ascii'))
+        with open(file_name, 'rb') as file:
+            if file_size <= 2 * sample_bytes:
+                digest.update(file.read())
+            else:
+                digest.update(file.read(sample_bytes))
+                file.seek(-sample_bytes, os.SEEK_END)
+                digest.update(file.read(sample_bytes))
+        return digest.hexdigest()
 
     def _skip_load(self, file_path: str) -> bool:
         """
@@ -119,28 +280,80 @@ class DuckDBDataSource(Singleton):
         if self._has_file_been_inserted(file_path):
             logger.info(f"File {file_path} has already been inserted. Skipping load.")
             return True
+        if self._is_file_logged(file_path):
+            logger.warning(f"File {file_path} has changed since it was inserted. Reloading.")
         return False
 
     def _load_data(self,
                    file_path: str,
                    query_template: str,
-                   params: tuple):
+                   params: tuple,
+                   table_name: str,
+                   encode_retailers: bool = False,
+                   fingerprint: bool = False):
         """
-        Execute the query to load data from a file and log the file insertion.
+        Execute the query to load data from a file, log the file insertion and record the load in the table cache.
 
         Parameters:
         file_path (str): The path of the file being loaded.
         query_template (str): The SQL query template to execute.
         params (tuple): The parameters to pass into the query.
+        table_name (str): The table the data is loaded into.
+        encode_retailers (bool, optional): Whether the query encodes the retailers, see delete_unknown_retailers.
+        fingerprint (bool, optional): Fingerprint the file in the file log, see _log_file_insertions.
         """
         logger.info(f"Loading data from {file_path}")
         self.conn.execute(query_template, params)
-        self._log_file_insertion(file_path)
+        if encode_retailers:
+            self.delete_unknown_retailers(table_name, file_path)
+        self._log_file_insertion(file_path, fingerprint)
+        self.table_cache.record_load(table_name)
+
+    @staticmethod
+    def _parquet_select(columns: Optional[List[str]], encode_retailers: bool,
+                        parquet_source: str = "read_parquet(?)") -> tuple:
+        """
+        Build the column list and source of a Parquet read. With encode_retailers the haendler_bez column is
+        replaced by its haendler_id from the retailer dictionary; rows of retailers not in the dictionary get a NULL
+        haendler_id and are removed by delete_unknown_retailers after the load.
+
+        Returns:
+        tuple: The (column_str, source_str) of the SELECT.
+        """
+        if not encode_retailers:
+            return (", ".join(columns) if columns else "*"), parquet_source
+        if not columns:
+            raise ValueError("Encoding retailers requires the columns to load.")
+        column_str = ", ".join('rd.haendler_id' if column == 'haendler_bez' else f"pq.{column}" for column in columns)
+        return column_str, f"{parquet_source} pq LEFT JOIN retailer_dictionary rd ON rd.haendler_bez = pq.haendler_bez"
+
+    def delete_unknown_retailers(self, table_name: str, source: str) -> int:
+        """
+        Delete the rows of retailers not in the retailer dictionary (NULL haendler_id) from a table loaded with
+        encode_retailers and log how many were dropped. The retailer dictionary holds all retailers of
+        haendler.parquet, so the rows of any other retailer are unusable for the analysis. Row groups without
+        NULL haendler_id are skipped by their statistics, so this barely costs after an append.
+
+        Parameters:
+        table_name (str): The name of the loaded table.
+        source (str): The loaded file(s), for the log message.
+
+        Returns:
+        int: The number of deleted rows.
+        """
+        dropped = self.conn.execute(f"DELETE FROM {table_name} WHERE haendler_id IS NULL").fetchone()[0]
+        if dropped:
+            logger.warning(f"Dropped {dropped} rows of retailers not in the retailer dictionary from table "
+                           f"{table_name} loaded from {source}.")
+        return dropped
 
     def load_parquet_to_table(self,
                               parquet_path: pathlib.PosixPath,
                               table_name: str,
-                              columns: Optional[List[str]] = None):
+                              columns: Optional[List[str]] = None,
+                              where: Optional[str] = None,
+                              encode_retailers: bool = False,
+                              fingerprint: bool = False):
         """
         Load a Parquet file into a table. Optionally specify columns to load.
 
@@ -148,19 +361,71 @@ class DuckDBDataSource(Singleton):
         parquet_path (pathlib.PosixPath): The path of the Parquet file.
         table_name (str): The name of the table to load the data into.
         columns (List[str], optional): A list of column names to load. Loads all columns if None.
+        where (str, optional): A filter condition, pushed down into the Parquet scan. Loads all rows if None.
+        encode_retailers (bool, optional): Load haendler_bez as its haendler_id from the retailer dictionary,
+        dropping the rows of retailers not in it (logged as a warning).
+        fingerprint (bool, optional): Fingerprint the file in the file log, for the snapshot input files.
         """
         parquet_path_str = str(parquet_path)
         if self._skip_load(parquet_path_str):
             return
 
         logger.info(f"Loading Parquet from {parquet_path_str} into table {table_name}")
-        column_str = ", ".join(columns) if columns else "*"
+        column_str, source_str = self._parquet_select(columns, encode_retailers)
+        where_str = f" WHERE {where}" if where else ""
         self._load_data(
             parquet_path_str,
-            f"CREATE OR REPLACE TABLE {table_name} AS SELECT {column_str} FROM read_parquet(?)",
-            (parquet_path_str,)
+            f"CREATE OR REPLACE TABLE {table_name} AS SELECT {column_str} FROM {source_str}{where_str}",
+            (parquet_path_str,),
+            table_name,
+            encode_retailers,
+            fingerprint
         )
 
+    def load_parquet_files_to_table(self,
+                                    parquet_paths: List[str],
+                                    table_name: str,
+                                    columns: Optional[List[str]] = None,
+                                    where: Optional[str] = None,
+                                    encode_retailers: bool = False) -> List[str]:
+        """
+        Load several Parquet files into a table with a single scan over all of them, so DuckDB reads the files
+        and their row groups in parallel, and log the files in one batch. Files already loaded are skipped;
+        the rows of the other files replace the table, or are appended to it if files were skipped.
+
+        Parameters:
+        parquet_paths (List[str]): The paths of the Parquet files, in load order.
+        table_name (str): The name of the table to load the data into.
+        columns (List[str], optional): A list of column names to load. Loads all columns if None.
+        where (str, optional): A filter condition, pushed down into the Parquet scan. Loads all rows if None.
+        encode_retailers (bool, optional): Load haendler_bez as its haendler_id from the retailer dictionary,
+        dropping the rows of retailers not in it (logged as a warning).
+
+        Returns:
+        List[str]: The loaded files.
+        """
+        parquet_paths = [str(parquet_path) for parquet_path in parquet_paths]
+        files_to_load = [parquet_path for parquet_path in parquet_paths if not self._skip_load(parquet_path)]
+        if not files_to_load:
+            return []
+
+        logger.info(f"Loading {len(files_to_load)} Parquet files into table {table_name}")
+        # The folders hold files written over many years, match their columns by name
+        column_str, source_str = self._parquet_select(columns, encode_retailers,
+                                                      "read_parquet(?, union_by_name = true)")
+        where_str = f" WHERE {where}" if where else ""
+        if len(files_to_load) < len(parquet_paths) and self.table_exists(table_name):
+            statement = f"INSERT INTO {table_name} SELECT {column_str} FROM {source_str}{where_str}"
+        else:
+            statement = f"CREATE OR REPLACE TABLE {table_name} AS SELECT {column_str} FROM {source_str}{where_str}"
+
+        self.conn.execute(statement, (files_to_load,))
+        if encode_retailers:
+            self.delete_unknown_retailers(table_name, f"{len(files_to_load)} files")
+        self._log_file_insertions(files_to_load)
+        self.table_cache.record_load(table_name)
+        return files_to_load
+
     def gz_load_filtered_parquet_to_table(self,
                                           parquet_path: pathlib.PosixPath,
                                           table_name: str,
@@ -175,13 +440,16 @@ class DuckDBDataSource(Singleton):
             parquet_path_str,
             f"CREATE OR REPLACE TABLE {table_name} AS SELECT {column_str} FROM read_parquet(?) pq"
             f" WHERE EXISTS ( SELECT 1 FROM filtered_haendler_bez WHERE haendler_bez = pq.haendler_bez )",
-            (parquet_path_str,)
+            (parquet_path_str,),
+            table_name
         )
 
     def append_parquet_to_table(self,
                                 parquet_path: str,
                                 table_name: str,
-                                columns: Optional[List[str]] = None):
+                                columns: Optional[List[str]] = None,
+                                where: Optional[str] = None,
+                                encode_retailers: bool = False):
         """
         Append data from a Parquet file to an existing table. Optionally specify columns.
 
@@ -189,16 +457,23 @@ class DuckDBDataSource(Singleton):
         parquet_path (str): The path of the Parquet file.
         table_name (str): The name of the table to append the data to.
         columns (List[str], optional): A list of column names to append. Appends all columns if None.
+        where (str, optional): A filter condition, pushed down into the Parquet scan. Appends all rows if None.
+        encode_retailers (bool, optional): Append haendler_bez as its haendler_id from the retailer dictionary,
+        dropping the rows of retailers not in it (logged as a warning).
         """
+        parquet_path = str(parquet_path)
         if self._skip_load(parquet_path):
             return
 
         logger.info(f"Appending Parquet from {parquet_path} into table {table_name}")
-        column_str = ", ".join(columns) if columns else "*"
+        column_str, source_str = self._parquet_select(columns, encode_retailers)
+        where_str = f" WHERE {where}" if where else ""
         self._load_data(
             parquet_path,
-            f"INSERT INTO {table_name} SELECT {column_str} FROM read_parquet(?)",
-            (parquet_path,)
+            f"INSERT INTO {table_name} SELECT {column_str} FROM {source_str}{where_str}",
+            (parquet_path,),
+            table_name,
+            encode_retailers
         )
 
     def gz_append_filtered_parquet_to_table(self,
@@ -214,13 +489,97 @@ class DuckDBDataSource(Singleton):
             parquet_path,
             f"INSERT INTO {table_name} SELECT {column_str} FROM read_parquet(?) pq "
             f"WHERE EXISTS ( SELECT 1 FROM filtered_haendler_bez WHERE haendler_bez = pq.haendler_bez )",
-            (parquet_path,)
+            (parquet_path,),
+            table_name
+        )
+
+    def append_parquet_files_to_table_with_source(self,
+                                                  parquet_paths: List[str],
+                                                  table_name: str,
+                                                  columns: Optional[List[str]] = None,
+                                                  where: Optional[str] = None,
+                                                  encode_retailers: bool = False) -> List[str]:
+        """
+        Append the data of several Parquet files to a table with a single scan over all of them and tag every row
+        with its source file, so the rows can later be evicted per file. The files are logged in one batch.
+        Creates the table if it does not exist.
+
+        Parameters:
+        parquet_paths (List[str]): The paths of the Parquet files.
+        table_name (str): The name of the table to append the data to.
+        columns (List[str], optional): A list of column names to append. Appends all columns if None.
+        where (str, optional): A filter condition, pushed down into the Parquet scan. Appends all rows if None.
+        encode_retailers (bool, optional): Append haendler_bez as its haendler_id from the retailer dictionary,
+        dropping the rows of retailers not in it (logged as a warning).
+
+        Returns:
+        List[str]: The appended files.
+        """
+        parquet_paths = [str(parquet_path) for parquet_path in parquet_paths]
+        files_to_load = [parquet_path for parquet_path in parquet_paths if not self._skip_load(parquet_path)]
+        if not files_to_load:
+            return []
+
+        changed_files = [parquet_path for parquet_path in files_to_load if self._is_file_logged(parquet_path)]
+        if changed_files and self.table_exists(table_name):
+            # The files have changed since they were appended, replace their rows
+            placeholders = ", ".join("?" for _ in changed_files)
+            self.conn.execute(f"DELETE FROM {table_name} WHERE source_file IN ({placeholders})", changed_files)
+
+        logger.info(f"Appending {len(files_to_load)} Parquet files into table {table_name} (source tracked)")
+        # The scan tags every row with the path of its file, as passed in
+        column_str, source_str = self._parquet_select(columns, encode_retailers,
+                                                      "read_parquet(?, filename = true, union_by_name = true)")
+        source_file = "pq.filename" if encode_retailers else "filename"
+        where_str = f" WHERE {where}" if where else ""
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table_name} AS "
+            f"SELECT {column_str}, CAST({source_file} AS VARCHAR) AS source_file FROM {source_str} LIMIT 0",
+            (files_to_load,)
+        )
+        self.conn.execute(
+            f"INSERT INTO {table_name} SELECT {column_str}, {source_file} AS source_file FROM {source_str}{where_str}",
+            (files_to_load,)
         )
+        if encode_retailers:
+            self.delete_unknown_retailers(table_name, f"{len(files_to_load)} files")
+        self._log_file_insertions(files_to_load)
+        self.table_cache.record_load(table_name)
+        return files_to_load
+
+    def evict_files_from_table(self, table_name: str, file_paths: List[str]):
+        """
+        Delete the rows of the given source files from a table loaded with append_parquet_files_to_table_with_source
+        and remove the files from the file log, so they can be loaded again later.
+
+        Parameters:
+        table_name (str): The name of the table to evict the rows from.
+        file_paths (List[str]): The source files whose rows are evicted.
+        """
+        if not file_paths:
+            return
+
+        file_paths = [str(file_path) for file_path in file_paths]
+        placeholders = ", ".join("?" for _ in file_paths)
+
+        self.conn.execute("BEGIN;")
+        try:
+            if self.table_exists(table_name):
+                self.conn.execute(f"DELETE FROM {table_name} WHERE source_file IN ({placeholders})", file_paths)
+            self.conn.execute(f"DELETE FROM file_log WHERE file_name IN ({placeholders})", file_paths)
+            self.conn.execute("COMMIT;")
+            logger.info(f"Evicted {len(file_paths)} files from table '{table_name}'.")
+
+        except duckdb.Error as e:
+            self.conn.execute("ROLLBACK;")
+            logger.error(f"Error occurred while evicting files, rolling back transaction: {e}")
+            raise
 
     def load_csv_to_table(self,
                           csv_path: str,
                           table_name: str,
-                          separator: str = CONFIG.CSV_IMPORT_DELIM_STYLE):
+                          separator: str = CONFIG.CSV_IMPORT_DELIM_STYLE,
+                          fingerprint: bool = False):
         """
         Load data from a CSV file into a table.
 
@@ -228,6 +587,7 @@ class DuckDBDataSource(Singleton):
         csv_path (str): The path of the CSV file.
         table_name (str): The name of the table to load the data into.
         separator (str): The delimiter used in the CSV file.
+        fingerprint (bool, optional): Fingerprint the file in the file log, for the snapshot input files.
         """
         if self._skip_load(csv_path):
             return
@@ -236,7 +596,9 @@ class DuckDBDataSource(Singleton):
         self._load_data(
             csv_path,
             f"CREATE OR REPLACE TABLE {table_name} AS SELECT * FROM read_csv_auto(?, delim=?)",
-            (csv_path, separator)
+            (csv_path, separator),
+            table_name,
+            fingerprint=fingerprint
         )
 
     def free_up_table_and_manipulate_file_logs(self, table_name: str):
@@ -259,6 +621,7 @@ class DuckDBDataSource(Singleton):
 
             self.conn.execute("COMMIT;")
             logger.info("Transaction committed successfully.")
+            self.table_cache.forget(table_name)
 
         except duckdb.CatalogException as e:
             self.conn.execute("ROLLBACK;")
@@ -280,17 +643,13 @@ class DuckDBDataSource(Singleton):
                 self.free_up_table_and_manipulate_file_logs(table_name)
                 return
 
-        # TODO: Check cache duration
+        # Check cache duration (minutes since the table was loaded)
         if cache_duration:
-            table_info = self.conn.execute(f"PRAGMA table_info('{table_name}');").fetchall()
-            if table_info:
-                last_modified_time = time.time()  # TODO: Use actual last modified time if available
-                current_time = time.time()
-                elapsed_time = (current_time - last_modified_time) / 60  # convert to minutes
-                if elapsed_time > cache_duration:
-                    logger.info(f"Cache duration exceeded for {table_name}. Dropping table.")
-                    self.free_up_table_and_manipulate_file_logs(table_name)
-                    return
+            minutes_since_load = self.table_cache.minutes_since_load(table_name)
+            if minutes_since_load is not None and minutes_since_load > cache_duration:
+                logger.info(f"Cache duration exceeded for {table_name}. Dropping table.")
+                self.free_up_table_and_manipulate_file_logs(table_name)
+                return
 
         if drop_after_use:
             logger.info(f"Dropping table {table_name} based on drop_after_use configuration.")
@@ -301,7 +660,7 @@ class DuckDBDataSource(Singleton):
         Loops through the tables in the configuration and processes them.
         """
         for key, config in self.tables_config.items():
-            table_name = config.get("folder_name", config.get("file_name"))
+            table_name = TableCacheManager.table_name_of(config)
             if not table_name:
                 logger.error(f"Table name not found in config for {key}")
                 continue
@@ -312,6 +671,9 @@ class DuckDBDataSource(Singleton):
             else:
                 logger.info(f"Table {table_name} does not exist in the database.")
 
+        # Tables without a config of their own are only subject to the memory budget
+        self.table_cache.enforce()
+
     def table_exists(self, table_name: str) -> bool:
         """
         Checks if a table exists in the DuckDB database using PRAGMA.
@@ -340,36 +702,134 @@ class DuckDBDataSource(Singleton):
             logger.info(f"Table: {table_name}, Column: {row[1]}, Compression: {row[7]}")
         return storage_info
 
-    def queryAsPl(self, query_str: str) -> pl.DataFrame:
+    def queryAsPl(self, query_str: str, params: Optional[list] = None) -> pl.DataFrame:
         """
         Execute a query and return the result as a Polars DataFrame.
 
         Parameters:
         query_str (str): The SQL query to execute.
+        params (list, optional): The values bound to the ? placeholders of the query.
 
         Returns:
         pl.DataFrame: The result of the query as a Polars DataFrame.
         """
-        logger.info(f"Executing query: {query_str}")
-        return self.conn.execute(query_str).pl()
+        return self._fetch(query_str, params, lambda result: result.pl(), lambda df: df.height)
 
-    def query(self, query_str: str):
+    def queryAsArrow(self, query_str: str, params: Optional[list] = None) -> pa.Table:
+        """
+        Execute a query and return the result as an Arrow table, handed over by DuckDB without converting
+        the values to Python objects.
+
+        Parameters:
+        query_str (str): The SQL query to execute.
+        params (list, optional): The values bound to the ? placeholders of the query.
+
+        Returns:
+        pa.Table: The result of the query as an Arrow table.
+        """
+        return self._fetch(query_str, params, lambda result: result.fetch_arrow_table(),
+                           lambda table: table.num_rows)
+
+    def queryAsRecordBatches(self, query_str: str, params: Optional[list] = None,
+                             batch_size: int = 1_000_000) -> pa.RecordBatchReader:
+        """
+        Execute a query and stream the result as Arrow record batches, e.g. to process results larger than memory.
+        The reader must be consumed before the next query on the same connection (or cursor if pooled).
+
+        Parameters:
+        query_str (str): The SQL query to execute.
+        params (list, optional): The values bound to the ? placeholders of the query.
+        batch_size (int, optional): The number of rows per record batch. Defaults to 1_000_000.
+
+        Returns:
+        pa.RecordBatchReader: The reader of the result batches.
+        """
+        # The batches are produced while the reader is consumed, so only the execution time is profiled.
+        return self._fetch(query_str, params, lambda result: result.fetch_record_batch(batch_size),
+                           lambda reader: -1, explain=False)
+
+    def _fetch(self, query_str: str, params: Optional[list], materialize, count_rows, explain: bool = True):
+        """
+        Execute a query on the cursor of the calling thread, materialize its result and record it
+        in the profiler if enabled.
+
+        Parameters:
+        query_str (str): The SQL query to execute.
+        params (list, optional): The values bound to the ? placeholders of the query.
+        materialize (callable): Fetches the result from the executed cursor.
+        count_rows (callable): Counts the rows of the fetched result for the profiler.
+        explain (bool, optional): Whether the plan of a slow query may be recorded. Defaults to True.
+
+        Returns:
+        The fetched result.
+        """
+        logger.debug(f"Executing query: {query_str}" + (f" with parameters {params}" if params else ""))
+        with self.cursor() as cursor:
+            if self.profiler is None:
+                return materialize(cursor.execute(query_str, params or None))
+
+            start = time.perf_counter()
+            result = materialize(cursor.execute(query_str, params or None))
+            seconds = time.perf_counter() - start
+
+            plan = None
+            if explain and self.profiler.wants_plan(seconds) and QueryProfiler.is_read_query(query_str):
+                plan = "\n".join(row[1] for row in
+                                 cursor.execute(f"EXPLAIN ANALYZE {query_str}", params or None).fetchall())
+            self.profiler.record(query_str, seconds, count_rows(result), self.profiler.caller(), plan)
+            return result
+
+    def query(self, query_str: str, params: Optional[list] = None):
         """
         Execute a query.
 
         Parameters:
         query_str (str): The SQL query to execute.
+        params (list, optional): The values bound to the ? placeholders of the query.
 
         Returns:
             duckdb.duckdb.DuckDBPyConnection
         """
-        logger.info(f"Executing query: {query_str}")
-        return self.conn.execute(query_str)
+        logger.debug(f"Executing query: {query_str}" + (f" with parameters {params}" if params else ""))
+        with self.cursor() as cursor:
+            if self.profiler is None:
+                return cursor.execute(query_str, params or None)
+
+            # The result is not materialized here, so only the execution time is recorded.
+            start = time.perf_counter()
+            result = cursor.execute(query_str, params or None)
+            self.profiler.record(query_str, time.perf_counter() - start, -1, self.profiler.caller())
+            return result
+
+    def register(self, view_name: str, df: pl.DataFrame):
+        """
+        Register a Polars DataFrame as a (connection local) view, so it can be joined in set-based queries.
+
+        Parameters:
+        view_name (str): The name of the view to register.
+        df (pl.DataFrame): The DataFrame backing the view.
+        """
+        logger.info(f"Registering DataFrame with {df.height} rows as view {view_name}")
+        with self.cursor() as cursor:
+            cursor.register(view_name, df)
+
+    def unregister(self, view_name: str):
+        """
+        Unregister a view previously registered with register.
+
+        Parameters:
+        view_name (str): The name of the view to unregister.
+        """
+        with self.cursor() as cursor:
+            cursor.unregister(view_name)
 
     def close(self):
         """
         Close the DuckDB connection.
         """
+        if getattr(self, 'cursor_pool', None) is not None:
+            self.cursor_pool.close()
+            self.cursor_pool = None
         if hasattr(self, 'conn') and self.conn:
             logger.info("Closing DuckDB connection.")
             self.conn.close()
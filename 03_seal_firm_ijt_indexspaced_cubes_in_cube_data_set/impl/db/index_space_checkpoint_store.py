@@ -0,0 +1,243 @@
+import datetime as dt
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import urllib.parse
+from contextlib import contextmanager
+
+import CONFIG
+from impl.db.index_space_result_sink import create_result_sink
+from impl.service.enum.index_space_result_format import IndexSpaceResultFormat
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'manifest.json'
+PARTIAL_SHARD_SUFFIX = '.partial'
+
+
+class IndexSpaceCheckpointStore:
+    """
+    Durable per seal firm checkpoints of the index space calculation.
+
+    Every (haendler_bez, seal_date) is written to its own shard, which is only renamed into place and recorded
+    in the manifest once it is complete. A restarted run skips the completed seal firms, partial shards of an
+    interrupted run are discarded and recomputed. Every shard records the fingerprint of the run it was computed
+    in (settings and inputs), shards of a run with another fingerprint are never reused.
+    """
+
+    def __init__(self, checkpoint_dir: str = CONFIG.INDEX_SPACE_CHECKPOINT_DIR,
+                 result_format: IndexSpaceResultFormat = IndexSpaceResultFormat.CSV,
+                 batch_size: int = CONFIG.INDEX_SPACE_RESULT_BATCH_SIZE,
+                 run_fingerprint: dict = None):
+        """
+        Parameters:
+        checkpoint_dir (str): The directory holding the shards and the manifest.
+        result_format (IndexSpaceResultFormat): The format of the shards.
+        batch_size (int): The number of rows per record batch of Parquet shards.
+        run_fingerprint (dict): The settings and inputs the rows depend on, JSON serializable.
+        """
+        self.checkpoint_dir = checkpoint_dir
+        self.result_format = result_format
+        self.batch_size = batch_size
+        self.run_fingerprint = run_fingerprint
+        self.run_id = hashlib.sha1(
+            json.dumps(run_fingerprint, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        self.manifest_path = os.path.join(checkpoint_dir, MANIFEST_FILE)
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        self.manifest = self._read_manifest()
+
+    def clear(self):
+        """
+        Remove all shards and the manifest, e.g. to start a fresh run.
+        """
+        for file_name in os.listdir(self.checkpoint_dir):
+            os.remove(os.path.join(self.checkpoint_dir, file_name))
+        self.manifest = {'shards': {}}
+        logger.info(f"Cleared index space checkpoints in {self.checkpoint_dir}.")
+
+    def discard_partial_shards(self) -> int:
+        """
+        Remove shards left behind by an interrupted run.
+
+        Returns:
+        int: The number of removed partial shards.
+        """
+        partial_shards = [file_name for file_name in os.listdir(self.checkpoint_dir)
+                          if file_name.endswith(PARTIAL_SHARD_SUFFIX)]
+        for file_name in partial_shards:
+            os.remove(os.path.join(self.checkpoint_dir, file_name))
+        if partial_shards:
+            logger.info(f"Discarded {len(partial_shards)} partial index space shards.")
+        return len(partial_shards)
+
+    def discard_stale_shards(self) -> int:
+        """
+        Remove the shards computed in a run with another fingerprint, e.g. with changed settings or inputs.
+
+        Returns:
+        int: The number of removed shards.
+        """
+        stale_keys = [key for key, entry in self.manifest['shards'].items() if entry.get('run') != self.run_id]
+        for key in stale_keys:
+            shard_path = os.path.join(self.checkpoint_dir, self.manifest['shards'].pop(key)['file'])
+            if os.path.isfile(shard_path):
+                os.remove(shard_path)
+        if stale_keys:
+            self._write_manifest()
+            logger.info(f"Discarded {len(stale_keys)} index space shards of a run with another fingerprint.")
+        return len(stale_keys)
+
+    def is_completed(self, haendler_bez, seal_date) -> bool:
+        """
+        Check whether the shard of a seal firm has been completed.
+
+        Parameters:
+        haendler_bez (str): The seal firm.
+        seal_date (date): The seal date.
+
+        Returns:
+        bool: True if the shard is recorded in the manifest in the current format and run fingerprint and exists,
+        otherwise False.
+        """
+        entry = self.manifest['shards'].get(self._key(haendler_bez, seal_date))
+        return (entry is not None
+                and entry.get('format', IndexSpaceResultFormat.CSV.value) == self.result_format.value
+                and entry.get('run') == self.run_id
+                and os.path.isfile(os.path.join(self.checkpoint_dir, entry['file'])))
+
+    @contextmanager
+    def open_shard(self, haendler_bez, seal_date):
+        """
+        Open the shard of a seal firm for writing. The shard is committed atomically when the block
+        completes and discarded if it raises.
+
+        Parameters:
+        haendler_bez (str): The seal firm.
+        seal_date (date): The seal date.
+
+        Yields:
+        IndexSpaceResultSink: The result sink writing the partial shard.
+        """
+        shard_file = self._shard_file(haendler_bez, seal_date)
+        shard_path = os.path.join(self.checkpoint_dir, shard_file)
+        partial_path = shard_path + PARTIAL_SHARD_SUFFIX
+
+        try:
+            with create_result_sink(partial_path, self.result_format, self.batch_size) as sink:
+                yield sink
+            with open(partial_path, 'rb') as shard:
+                os.fsync(shard.fileno())
+        except BaseException:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+
+        os.replace(partial_path, shard_path)
+        self.manifest.setdefault('runs', {})[self.run_id] = self.run_fingerprint
+        self.manifest['shards'][self._key(haendler_bez, seal_date)] = {
+            'haendler_bez': haendler_bez,
+            'seal_date': self._seal_date_str(seal_date),
+            'file': shard_file,
+            'format': self.result_format.value,
+            'bytes': os.path.getsize(shard_path),
+            'run': self.run_id,
+            'completed_at': dt.datetime.now().isoformat(timespec='seconds'),
+        }
+        self._write_manifest()
+        logger.info(f"Checkpointed seal firm {haendler_bez} ({self._seal_date_str(seal_date)}) to {shard_file}.")
+
+    def assemble(self, results_path: str, seal_firm_keys: list, header: str):
+        """
+        Concatenate the completed shards in the given seal firm order into one results file.
+
+        Parameters:
+        results_path (str): The path of the assembled results file.
+        seal_firm_keys (list): The (haendler_bez, seal_date) tuples in output order.
+        header (str): The header line of the results file.
+        """
+        if self.result_format == IndexSpaceResultFormat.PARQUET:
+            raise ValueError("Parquet shards are assembled into a dataset with assemble_dataset.")
+
+        partial_results_path = results_path + PARTIAL_SHARD_SUFFIX
+        missing = 0
+        with open(partial_results_path, 'w') as results_file:
+            results_file.write(header)
+            for haendler_bez, seal_date in seal_firm_keys:
+                if not self.is_completed(haendler_bez, seal_date):
+                    missing += 1
+                    continue
+                entry = self.manifest['shards'][self._key(haendler_bez, seal_date)]
+                with open(os.path.join(self.checkpoint_dir, entry['file'])) as shard:
+                    shutil.copyfileobj(shard, results_file)
+        os.replace(partial_results_path, results_path)
+
+        if missing:
+            logger.warning(f"Assembled {results_path} without {missing} incomplete seal firms.")
+        else:
+            logger.info(f"Assembled {results_path} from {len(seal_firm_keys)} seal firm shards.")
+
+    def assemble_dataset(self, dataset_dir: str, seal_firm_keys: list):
+        """
+        Collect the completed Parquet shards into a hive partitioned dataset
+        (seal_firm=<haendler_bez>/seal_date=<date>/part-0.parquet), readable with e.g.
+        pyarrow.dataset, polars.scan_parquet, DuckDB read_parquet or R arrow::open_dataset.
+
+        Parameters:
+        dataset_dir (str): The directory of the dataset, replaced as a whole.
+        seal_firm_keys (list): The (haendler_bez, seal_date) tuples to include.
+        """
+        partial_dataset_dir = dataset_dir + PARTIAL_SHARD_SUFFIX
+        shutil.rmtree(partial_dataset_dir, ignore_errors=True)
+        os.makedirs(partial_dataset_dir)
+
+        included = 0
+        for haendler_bez, seal_date in seal_firm_keys:
+            if not self.is_completed(haendler_bez, seal_date):
+                continue
+            entry = self.manifest['shards'][self._key(haendler_bez, seal_date)]
+            partition_dir = os.path.join(partial_dataset_dir,
+                                         f"seal_firm={urllib.parse.quote(str(haendler_bez), safe='')}",
+                                         f"seal_date={self._seal_date_str(seal_date)}")
+            os.makedirs(partition_dir, exist_ok=True)
+            shutil.copyfile(os.path.join(self.checkpoint_dir, entry['file']),
+                            os.path.join(partition_dir, 'part-0.parquet'))
+            included += 1
+
+        shutil.rmtree(dataset_dir, ignore_errors=True)
+        os.replace(partial_dataset_dir, dataset_dir)
+
+        missing = len(seal_firm_keys) - included
+        if missing:
+            logger.warning(f"Assembled {dataset_dir} without {missing} incomplete seal firms.")
+        else:
+            logger.info(f"Assembled {dataset_dir} from {included} seal firm shards.")
+
+    def _read_manifest(self) -> dict:
+        if not os.path.isfile(self.manifest_path):
+            return {'shards': {}}
+        with open(self.manifest_path) as manifest_file:
+            return json.load(manifest_file)
+
+    def _write_manifest(self):
+        partial_manifest_path = self.manifest_path + PARTIAL_SHARD_SUFFIX
+        with open(partial_manifest_path, 'w') as manifest_file:
+            json.dump(self.manifest, manifest_file, indent=2, sort_keys=True)
+            manifest_file.flush()
+            os.fsync(manifest_file.fileno())
+        os.replace(partial_manifest_path, self.manifest_path)
+
+    @staticmethod
+    def _seal_date_str(seal_date) -> str:
+        return seal_date if isinstance(seal_date, str) else seal_date.strftime('%Y-%m-%d')
+
+    def _key(self, haendler_bez, seal_date) -> str:
+        return f"{haendler_bez}|{self._seal_date_str(seal_date)}"
+
+    def _shard_file(self, haendler_bez, seal_date) -> str:
+        # Retailer names are arbitrary strings, so keep a readable prefix and make the name unique by hash.
+        readable = re.sub(r'[^A-Za-z0-9.-]+', '_', str(haendler_bez))[:40]
+        digest = hashlib.sha1(self._key(haendler_bez, seal_date).encode('utf-8')).hexdigest()[:12]
+        return f"{readable}_{self._seal_date_str(seal_date)}_{digest}.{self.result_format.value}"
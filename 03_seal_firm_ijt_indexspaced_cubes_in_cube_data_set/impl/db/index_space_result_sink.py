@@ -0,0 +1,143 @@
+import logging
+from abc import ABC, abstractmethod
+
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import CONFIG
+from impl.service.enum.index_space_result_format import IndexSpaceResultFormat
+
+logger = logging.getLogger(__name__)
+
+RESULT_COLUMNS = ['produkt_id', 'haendler_bez', 'week_running_var', 'firm_has_seal_j']
+
+# int64 product, dictionary encoded retailer, int16 week (t in [-26, 832]) and bool seal flag
+RESULT_ARROW_SCHEMA = pa.schema([
+    pa.field('produkt_id', pa.int64()),
+    pa.field('haendler_bez', pa.dictionary(pa.int32(), pa.string())),
+    pa.field('week_running_var', pa.int16()),
+    pa.field('firm_has_seal_j', pa.bool_()),
+])
+
+
+class IndexSpaceResultSink(ABC):
+    """
+    Receives the (produkt_id, haendler_bez, week_running_var, firm_has_seal_j) rows of the index space.
+    """
+
+    @abstractmethod
+    def write(self, rows: pl.DataFrame):
+        """
+        Write rows to the sink.
+
+        Parameters:
+        rows (pl.DataFrame): The rows with the RESULT_COLUMNS, may be empty.
+        """
+        pass
+
+    @abstractmethod
+    def close(self):
+        """
+        Flush all buffered rows and release the underlying file.
+        """
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class CsvResultSink(IndexSpaceResultSink):
+    """
+    Writes the rows as header-less CSV lines, one write per DataFrame instead of one flush per row.
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, 'w')
+
+    def write(self, rows: pl.DataFrame):
+        if rows.is_empty():
+            return
+        self.file.write("".join(
+            f"{produkt_id},{haendler_bez},{week_running_var},{firm_has_seal_j}\n"
+            for produkt_id, haendler_bez, week_running_var, firm_has_seal_j in rows.select(RESULT_COLUMNS).iter_rows()
+        ))
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+class ParquetResultSink(IndexSpaceResultSink):
+    """
+    Buffers the rows into typed Arrow record batches and writes them as zstd compressed Parquet,
+    one row group per batch.
+    """
+
+    def __init__(self, path: str, batch_size: int = CONFIG.INDEX_SPACE_RESULT_BATCH_SIZE):
+        """
+        Parameters:
+        path (str): The path of the Parquet file.
+        batch_size (int): The number of rows per record batch / row group.
+        """
+        self.batch_size = batch_size
+        self.buffer = []
+        self.buffered_rows = 0
+        self.writer = pq.ParquetWriter(path, RESULT_ARROW_SCHEMA, compression='zstd')
+
+    def write(self, rows: pl.DataFrame):
+        if rows.is_empty():
+            return
+        self.buffer.append(rows.select(RESULT_COLUMNS))
+        self.buffered_rows += rows.height
+        if self.buffered_rows >= self.batch_size:
+            self._flush(final=False)
+
+    def close(self):
+        if self.writer is not None:
+            self._flush(final=True)
+            self.writer.close()
+            self.writer = None
+
+    def _flush(self, final: bool):
+        if not self.buffer:
+            return
+        rows = pl.concat(self.buffer, how='vertical_relaxed')
+        full_batches = rows.height if final else rows.height - rows.height % self.batch_size
+
+        for offset in range(0, full_batches, self.batch_size):
+            self.writer.write_batch(self._to_record_batch(rows.slice(offset, min(self.batch_size, full_batches - offset))))
+
+        remainder = rows.slice(full_batches)
+        self.buffer = [remainder] if remainder.height else []
+        self.buffered_rows = remainder.height
+
+    @staticmethod
+    def _to_record_batch(rows: pl.DataFrame) -> pa.RecordBatch:
+        return pa.RecordBatch.from_arrays([
+            rows['produkt_id'].cast(pl.Int64).to_arrow(),
+            rows['haendler_bez'].cast(pl.Utf8).to_arrow().cast(pa.string()).dictionary_encode(),
+            rows['week_running_var'].cast(pl.Int16).to_arrow(),
+            rows['firm_has_seal_j'].cast(pl.Boolean).to_arrow(),
+        ], schema=RESULT_ARROW_SCHEMA)
+
+
+def create_result_sink(path: str, result_format: IndexSpaceResultFormat,
+                       batch_size: int = CONFIG.INDEX_SPACE_RESULT_BATCH_SIZE) -> IndexSpaceResultSink:
+    """
+    Create the result sink of the given format.
+
+    Parameters:
+    path (str): The path of the file to write.
+    result_format (IndexSpaceResultFormat): The output format.
+    batch_size (int): The number of rows per record batch (Parquet only).
+
+    Returns:
+    IndexSpaceResultSink: The result sink.
+    """
+    if result_format == IndexSpaceResultFormat.PARQUET:
+        return ParquetResultSink(path, batch_size)
+    return CsvResultSink(path)
@@ -0,0 +1,182 @@
+import datetime as dt
+import json
+import logging
+import os
+
+from tqdm import tqdm
+
+import CONFIG
+from CONFIG import CLICKS_FOLDER, FILTERED_HAENDLER_BEZ, PARQUET_FILES_DIR, UNIX_TIME_ORIGIN, UNIX_WEEK
+from impl.db.datasource import DuckDBDataSource
+from impl.db.simple_sql_base_query_builder import SimpleSQLBaseQueryBuilder
+from impl.repository.click_cube_repository import DEFAULT_CLICK_CUBE_TABLE
+
+logger = logging.getLogger(__name__)
+
+CLICK_CUBE_MANIFEST = 'manifest.json'
+PARTIAL_FILE_SUFFIX = '.partial'
+
+
+def build_click_cube(
+        db: DuckDBDataSource,
+        cube_dir=CONFIG.CLICK_CUBE_DIR,
+        parquet_dir=PARQUET_FILES_DIR,
+        click_folders=CLICKS_FOLDER,
+        filter_file=FILTERED_HAENDLER_BEZ,
+        rebuild=False
+) -> int:
+    """
+    Build the click cube incrementally: every monthly click file is aggregated to the click counts per
+    (haendler_bez, produkt_id, week_running_var) of the retailers in 'filtered_haendler_bez' and written as
+    zstd compressed Parquet with the same file name into cube_dir. Files already built from an unchanged
+    click file are kept, so a new month only aggregates its own file. The manifest records the fingerprint of the
+    filter file 'filtered_haendler_bez' was loaded from, if it changes all files are rebuilt.
+
+    Parameters:
+    db (DuckDBDataSource): The database connection instance, 'filtered_haendler_bez' must be loaded.
+    cube_dir (Path, optional): The directory of the click cube. Defaults to CONFIG.CLICK_CUBE_DIR.
+    parquet_dir (Path, optional): Directory containing the click folder(s). Defaults to PARQUET_FILES_DIR.
+    click_folders (str, optional): The folder(s) containing the monthly click files. Defaults to CLICKS_FOLDER.
+    filter_file (str, optional): The CSV file of 'filtered_haendler_bez'. Defaults to FILTERED_HAENDLER_BEZ.
+    rebuild (bool, optional): Rebuild all files, even if their click file is unchanged. Defaults to False.
+
+    Returns:
+    int: The number of (re)built cube files.
+    """
+    os.makedirs(cube_dir, exist_ok=True)
+
+    manifest = {'files': {}} if rebuild else _read_manifest(cube_dir)
+    filter_source = DuckDBDataSource.file_fingerprint(filter_file)
+    if manifest.get('filter') != filter_source:
+        if manifest['files']:
+            logger.info(f"Filter file {filter_file} changed, rebuilding all click cube files.")
+        manifest = {'files': {}}
+    manifest['filter'] = filter_source
+    source_files = list_click_source_files(parquet_dir, click_folders)
+    built = 0
+
+    for file_name, source_path in tqdm(source_files.items(), desc="Building Click Cube", unit="file", ncols=100):
+        source_stat = os.stat(source_path)
+        source = {'source': str(source_path), 'bytes': source_stat.st_size, 'mtime': source_stat.st_mtime}
+        cube_path = os.path.join(cube_dir, file_name)
+
+        entry = manifest['files'].get(file_name)
+        if entry is not None and entry['source'] == source and os.path.isfile(cube_path):
+            continue
+
+        _write_cube_file(db, source_path, cube_path)
+        manifest['files'][file_name] = {
+            'source': source,
+            'rows': db.conn.execute("SELECT COUNT(*) FROM read_parquet(?)", (str(cube_path),)).fetchone()[0],
+            'built_at': dt.datetime.now().isoformat(timespec='seconds'),
+        }
+        _write_manifest(cube_dir, manifest)
+        built += 1
+
+    logger.info(f"Click cube {cube_dir} holds {len(manifest['files'])} files, {built} (re)built.")
+    return built
+
+
+def load_click_cube(db: DuckDBDataSource, cube_dir=CONFIG.CLICK_CUBE_DIR, table_name=DEFAULT_CLICK_CUBE_TABLE) -> int:
+    """
+    (Re)create the click cube table from the cube files. Weeks spanning two months are summed up and the
+    retailer names are loaded as their haendler_id from the retailer dictionary, dropping the clicks of retailers
+    not in it (logged as a warning).
+
+    Parameters:
+    db (DuckDBDataSource): The database connection instance, 'retailer_dictionary' must be loaded.
+    cube_dir (Path, optional): The directory of the click cube. Defaults to CONFIG.CLICK_CUBE_DIR.
+    table_name (str, optional): The name of the click cube table. Defaults to 'click_cube'.
+
+    Returns:
+    int: The number of (haendler_id, produkt_id, week_running_var) rows.
+    """
+    cube_files = [os.path.join(cube_dir, file_name) for file_name in sorted(_read_manifest(cube_dir)['files'])]
+    if not cube_files:
+        raise FileNotFoundError(f"Click cube {cube_dir} is not built. Run 00c_build_click_cube.py to build it.")
+
+    file_list = ", ".join(_sql_literal(cube_file) for cube_file in cube_files)
+    query = (
+        SimpleSQLBaseQueryBuilder(f"read_parquet([{file_list}]) pq")
+        .join('LEFT', 'retailer_dictionary rd', 'rd.haendler_bez = pq.haendler_bez')
+        .select(['rd.haendler_id', 'pq.produkt_id', 'pq.week_running_var', 'SUM(pq.clicks) AS clicks'])
+        .group_by(['rd.haendler_id', 'pq.produkt_id', 'pq.week_running_var'])
+        .order_by('rd.haendler_id, pq.week_running_var')
+        .build()
+    )
+    db.query(f"CREATE OR REPLACE TABLE {table_name} AS {query}")
+    db.delete_unknown_retailers(table_name, cube_dir)
+
+    row_count = db.conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+    logger.info(f"Loaded click cube '{table_name}' from {len(cube_files)} files with {row_count} rows.")
+    return row_count
+
+
+def list_click_source_files(parquet_dir=PARQUET_FILES_DIR, click_folders=CLICKS_FOLDER) -> dict:
+    """
+    List the monthly click files. A file name found in several folders resolves to the first folder,
+    as in file_exists_in_folders.
+
+    Returns:
+    dict: The source file paths by file name, in file name order.
+    """
+    if isinstance(click_folders, str):
+        click_folders = [click_folders]
+
+    source_files = {}
+    for folder in click_folders:
+        folder_path = os.path.join(parquet_dir, folder)
+        if not os.path.isdir(folder_path):
+            continue
+        for file_name in os.listdir(folder_path):
+            if file_name.startswith('clicks_') and file_name.endswith('.parquet'):
+                source_files.setdefault(file_name, os.path.join(folder_path, file_name))
+    return dict(sorted(source_files.items()))
+
+
+def click_cube_is_built(cube_dir=CONFIG.CLICK_CUBE_DIR) -> bool:
+    """
+    Check whether the click cube has been built.
+
+    Returns:
+    bool: True if the cube directory holds a manifest with at least one file, otherwise False.
+    """
+    return bool(_read_manifest(cube_dir)['files'])
+
+
+def _write_cube_file(db: DuckDBDataSource, source_path, cube_path):
+    partial_path = cube_path + PARTIAL_FILE_SUFFIX
+    select_query = (
+        SimpleSQLBaseQueryBuilder(f"read_parquet({_sql_literal(source_path)}) pq")
+        .select([
+            'haendler_bez', 'produkt_id',
+            f"CAST(trunc((timestamp - {UNIX_TIME_ORIGIN}) / {UNIX_WEEK}) AS BIGINT) AS week_running_var",
+            'COUNT(*) AS clicks'
+        ])
+        .where("EXISTS ( SELECT 1 FROM filtered_haendler_bez WHERE haendler_bez = pq.haendler_bez )")
+        .group_by(['haendler_bez', 'produkt_id', 'week_running_var'])
+        .order_by('haendler_bez, week_running_var, produkt_id')
+        .build()
+    )
+    db.query(f"COPY ({select_query}) TO {_sql_literal(partial_path)} (FORMAT PARQUET, COMPRESSION ZSTD)")
+    os.replace(partial_path, cube_path)
+    logger.info(f"Built click cube file {cube_path} from {source_path}")
+
+
+def _read_manifest(cube_dir) -> dict:
+    manifest_path = os.path.join(cube_dir, CLICK_CUBE_MANIFEST)
+    if not os.path.isfile(manifest_path):
+        return {'files': {}}
+    with open(manifest_path) as manifest_file:
+        return json.load(manifest_file)
+
+
+def _write_manifest(cube_dir, manifest: dict):
+    manifest_path = os.path.join(cube_dir, CLICK_CUBE_MANIFEST)
+    with open(manifest_path + PARTIAL_FILE_SUFFIX, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    os.replace(manifest_path + PARTIAL_FILE_SUFFIX, manifest_path)
+
+
+def _sql_literal(value) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
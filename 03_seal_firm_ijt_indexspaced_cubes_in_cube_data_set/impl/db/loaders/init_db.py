@@ -1,8 +1,12 @@
 import logging
 
+import polars as pl
+
 from CONFIG import PARQUET_FILES_DIR, SEAL_CHANGE_FIRMS, FILTERED_HAENDLER_BEZ
 from SCHEMA_CONFIG import INITIAL_TABLE_SCHEMAS
 from impl.db.datasource import DuckDBDataSource
+from impl.db.loaders.retailer_dictionary import build_retailer_dictionary
+from impl.db.table_cache import SNAPSHOT_TABLES
 
 logger = logging.getLogger(__name__)
 
@@ -36,7 +40,8 @@ class DatabaseInitializer:
         Parameters:
         tables (list, optional): List of table names to drop. Drops default tables if None.
         """
-        default_tables = ['seal_change_firms', 'filtered_haendler_bez', 'products', 'retailers', 'file_log']
+        default_tables = ['seal_change_firms', 'filtered_haendler_bez', 'products', 'retailers', 'retailer_dictionary',
+                          'file_log']
         tables = tables or default_tables
 
         for table in tables:
@@ -46,22 +51,91 @@ class DatabaseInitializer:
             except Exception as e:
                 logger.error(f"Error dropping table '{table}': {e}")
 
+    @staticmethod
+    def input_files() -> list:
+        """
+        Get the input files of the base tables, as recorded in the file log.
+
+        Returns:
+        list: The paths of the CSV and Parquet files loaded by load_data_into_tables.
+        """
+        return [SEAL_CHANGE_FIRMS, FILTERED_HAENDLER_BEZ,
+                str(PARQUET_FILES_DIR / 'produkt.parquet'), str(PARQUET_FILES_DIR / 'haendler.parquet')]
+
+    def is_snapshot_current(self) -> bool:
+        """
+        Check whether the database already holds the base tables loaded from the current input files,
+        e.g. a persistent database initialized by an earlier script.
+
+        Returns:
+        bool: True if all base tables exist and no input file changed since it was loaded, otherwise False.
+        """
+        return (all(self.db.table_exists(table) for table in SNAPSHOT_TABLES)
+                and all(self.db.is_file_loaded(file_name) for file_name in self.input_files()))
+
+    def reset_working_tables(self):
+        """
+        Drop all tables but the base tables, e.g. the offer and click windows of an earlier run,
+        and remove their files from the file log, so they are loaded again.
+        """
+        working_tables = [table for table in self._table_names() if table not in SNAPSHOT_TABLES]
+        if working_tables:
+            self.drop_tables(working_tables)
+
+        input_files = self.input_files()
+        placeholders = ", ".join("?" for _ in input_files)
+        self.db.query(f"DELETE FROM file_log WHERE file_name NOT IN ({placeholders})", input_files)
+
     def load_data_into_tables(self):
         """
         Load data into the respective tables from CSV and Parquet files.
         """
         try:
-            self.db.load_csv_to_table(SEAL_CHANGE_FIRMS, 'seal_change_firms')
-            self.db.load_csv_to_table(FILTERED_HAENDLER_BEZ, 'filtered_haendler_bez')
-            self.db.load_parquet_to_table(PARQUET_FILES_DIR / 'produkt.parquet', 'products')
-            self.db.load_parquet_to_table(PARQUET_FILES_DIR / 'haendler.parquet', 'retailers')
+            # Fingerprinted, so is_snapshot_current detects a changed input file
+            self.db.load_csv_to_table(SEAL_CHANGE_FIRMS, 'seal_change_firms', fingerprint=True)
+            self.db.load_csv_to_table(FILTERED_HAENDLER_BEZ, 'filtered_haendler_bez', fingerprint=True)
+            self.db.load_parquet_to_table(PARQUET_FILES_DIR / 'produkt.parquet', 'products', fingerprint=True)
+            self.db.load_parquet_to_table(PARQUET_FILES_DIR / 'haendler.parquet', 'retailers', fingerprint=True)
         except Exception as e:
             logger.error(f"Error loading data into tables: {e}")
 
-    def initialize_database(self):
+    def create_retailer_dictionary(self):
+        """
+        Create the retailer dictionary over the filtered retailers, the seal change firms and all retailers,
+        so the inflow tables can be keyed by dense integer ids instead of retailer names.
+        """
+        try:
+            retailer_names = pl.concat([
+                name_column.cast(pl.Utf8).alias('haendler_bez') for name_column in (
+                    self.db.queryAsPl("SELECT * FROM filtered_haendler_bez").to_series(1),
+                    self.db.queryAsPl("SELECT * FROM seal_change_firms").to_series(2),
+                    self.db.queryAsPl("SELECT haendler_bez FROM retailers").to_series(0),
+                )
+            ])
+            build_retailer_dictionary(self.db, retailer_names)
+        except Exception as e:
+            logger.error(f"Error creating the retailer dictionary: {e}")
+
+    def initialize_database(self) -> bool:
         """
-        Initialize the database by dropping tables, creating new ones, and loading data.
+        Initialize the database by dropping tables, creating new ones, loading data and creating the retailer dictionary.
+        A persistent database whose base tables were loaded from the current input files is reused instead,
+        only its working tables are reset.
+
+        Returns:
+        bool: True if the base tables were (re)loaded, False if they were reused.
         """
-        self.drop_tables()
+        if self.is_snapshot_current():
+            self.reset_working_tables()
+            logger.info("Input files are unchanged, reusing the base tables of the database.")
+            return False
+
+        # A changed input invalidates the retailer ids, and with them every table keyed by them
+        self.drop_tables(self._table_names())
         self.create_tables()
         self.load_data_into_tables()
+        self.create_retailer_dictionary()
+        return True
+
+    def _table_names(self) -> list:
+        return [table for (table,) in self.db.conn.execute("PRAGMA show_tables;").fetchall()]
@@ -1,12 +1,11 @@
 import logging
 import os
 
-from tqdm import tqdm
-
 from CONFIG import CLICKS_SCHEME, PARQUET_FILES_DIR, CLICKS_FOLDER
 from impl.db.datasource import DuckDBDataSource
+from impl.db.loaders.parquet_manifest import get_parquet_manifest
 from impl.db.simple_sql_base_query_builder import SimpleSQLBaseQueryBuilder
-from impl.helpers import get_year_month_from_seal_date, generate_months_around_seal, file_exists_in_folders
+from impl.helpers import get_year_month_from_seal_date, generate_months_around_seal
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +19,9 @@ def load_selection_criteria_inflow_click_data(
         file_scheme=CLICKS_SCHEME
 ):
     """
-    Load click data from Parquet files around a specific seal date.
+    Load click data from Parquet files around a specific seal date, in a single scan over all monthly files.
+    The retailer names are loaded as their haendler_id from the retailer dictionary, the clicks of retailers not
+    in it are dropped (their number is logged as a warning).
 
     Parameters:
     db (DuckDBDataSource): The database connection instance.
@@ -35,30 +36,18 @@ def load_selection_criteria_inflow_click_data(
 
     seal_year, seal_month = get_year_month_from_seal_date(seal_date)
     relevant_months = generate_months_around_seal(seal_year, seal_month)
-    total_files = len(relevant_months)
-    table_created = False
-
-    with tqdm(total=total_files, desc="Loading Click Data", unit="file", ncols=100) as pbar:
-        for month in relevant_months:
-            file_name = month
-            file_path = file_exists_in_folders(file_name, CLICKS_FOLDER)
-
-            if file_path:
-                if not table_created:
-                    logger.info(f"Creating table from {file_path}")
-                    db.load_parquet_to_table(file_path, table_name, columns=columns)
-                    table_created = True
-                else:
-                    logger.info(f"Appending data from {file_path}")
-                    db.append_parquet_to_table(file_path, table_name, columns=columns)
+    manifest = get_parquet_manifest(parquet_dir, CLICKS_FOLDER)
+    file_paths = [file_path for file_path in map(manifest.resolve, relevant_months) if file_path]
 
-            pbar.update(1)
+    logger.info(f"Loading {len(file_paths)} of {len(relevant_months)} monthly click files in one scan")
+    db.load_parquet_files_to_table(file_paths, table_name, columns=columns, encode_retailers=True)
+    table_created = len(file_paths) > 0
 
     if table_created:
 
         # POST INIT
         count_query = (
-            SimpleSQLBaseQueryBuilder('clicks')
+            SimpleSQLBaseQueryBuilder(table_name)
             .select(
                 'COUNT(*) AS total_loaded_inflow_rows')
             # .where("haendler_bez IN (SELECT haendler_bez FROM filtered_haendler_bez)")
@@ -140,7 +129,7 @@ def initialize_clicks_table(
     db.queryAsPl(f"""
         CREATE TABLE IF NOT EXISTS {table_name} (
             produkt_id BIGINT,
-            haendler_bez STRING,
+            haendler_id INTEGER,
             timestamp BIGINT
         )
     """)
@@ -1,13 +1,13 @@
+import datetime as dt
 import logging
 import os
 
-from tqdm import tqdm
-
 import CONFIG
-from CONFIG import ANGEBOTE_FOLDER
 from impl.db.datasource import DuckDBDataSource
+from impl.db.loaders.offer_store import resolve_offer_source
+from impl.db.loaders.parquet_manifest import get_parquet_manifest
 from impl.db.simple_sql_base_query_builder import SimpleSQLBaseQueryBuilder
-from impl.helpers import get_week_year_from_seal_date, generate_weeks_around_seal, file_exists_in_folders
+from impl.helpers import get_week_year_from_seal_date, generate_weeks_around_seal, date_to_unix_time
 
 logger = logging.getLogger(__name__)
 
@@ -17,17 +17,26 @@ def load_selection_criteria_inflow_angebot_data(
         seal_date,
         columns=None,
         pre_seal_weeks=None,
-        post_seal_weeks=None
+        post_seal_weeks=None,
+        table_name='angebot',
+        use_offer_store=CONFIG.USE_OFFER_STORE
 ):
     """
     Load offer data from Parquet files around a specific seal date.
 
+    The weekly files are read from the offer store (see 00b_build_offer_store.py) if it is built, otherwise from
+    the raw offer folders. Only offer spells overlapping the inflow window are loaded, the condition is pushed
+    down into a single scan over all weekly files. The retailer names are loaded as their haendler_id from the
+    retailer dictionary, the offers of retailers not in it are dropped (their number is logged as a warning).
+
     Parameters:
     db (DuckDBDataSource): The database connection instance.
     seal_date (any): The seal date used to determine which files to load.
     columns (list, optional): The columns to load from Parquet. Defaults to ['produkt_id', 'haendler_bez', 'dtimebegin', 'dtimeend'].
     pre_seal_weeks (int, optional): Number of weeks before the seal date to consider. Defaults to CONFIG.OFFER_TIME_SPELLS_PREPROCESSING_WEEKS_PRE_SEAL_CONSIDERED.
     post_seal_weeks (int, optional): Number of weeks after the seal date to consider. Defaults to CONFIG.OFFER_TIME_SPELLS_PREPROCESSING_WEEKS_POST_SEAL_CONSIDERED.
+    table_name (str, optional): The name of the table to load the data into. Defaults to 'angebot'.
+    use_offer_store (bool, optional): Read from the offer store if it is built. Defaults to CONFIG.USE_OFFER_STORE.
     """
     if columns is None:
         columns = ['produkt_id', 'haendler_bez', 'dtimebegin', 'dtimeend']
@@ -47,30 +56,31 @@ def load_selection_criteria_inflow_angebot_data(
         post_seal_weeks
     )
 
-    total_files = len(relevant_weeks)
-    table_initialized = False
+    seal_date_dt = dt.datetime.fromtimestamp(date_to_unix_time(seal_date))
+    window_start = int((seal_date_dt - dt.timedelta(weeks=pre_seal_weeks)).timestamp())
+    window_end = int((seal_date_dt + dt.timedelta(weeks=post_seal_weeks)).timestamp())
+    window_condition = f"dtimebegin <= {window_end} AND dtimeend >= {window_start}"
 
-    with tqdm(total=total_files, desc="Loading Offer Data", unit="file", ncols=100) as progress_bar:
-        for week in relevant_weeks:
-            file_name = week
-            file_path = file_exists_in_folders(file_name, ANGEBOTE_FOLDER)
+    offer_dir, offer_folders = resolve_offer_source(use_offer_store)
+    manifest = get_parquet_manifest(offer_dir, offer_folders)
 
-            if file_path:
-                if not table_initialized:
-                    logger.info(f"Initializing table from {file_path}")
-                    db.load_parquet_to_table(file_path, 'angebot', columns=columns)
-                    table_initialized = True
-                else:
-                    logger.info(f"Adding data from {file_path}")
-                    db.append_parquet_to_table(file_path, 'angebot', columns=columns)
+    file_paths = []
+    for week in relevant_weeks:
+        file_path = manifest.resolve(week)
+        # Files whose spells all lie outside the window (footer statistics) would not add any row
+        if file_path and manifest.overlaps(file_path, window_start, window_end):
+            file_paths.append(file_path)
 
-            progress_bar.update(1)
+    logger.info(f"Loading {len(file_paths)} of {len(relevant_weeks)} weekly offer files in one scan")
+    db.load_parquet_files_to_table(file_paths, table_name, columns=columns, where=window_condition,
+                                   encode_retailers=True)
+    table_initialized = len(file_paths) > 0
 
     if table_initialized:
 
         # POST INIT
         count_query = (
-            SimpleSQLBaseQueryBuilder('angebot')
+            SimpleSQLBaseQueryBuilder(table_name)
             .select(
                 'COUNT(*) AS total_loaded_inflow_rows')
             # .where("haendler_bez IN (SELECT haendler_bez FROM filtered_haendler_bez)")
@@ -170,7 +180,7 @@ def initialize_offer_table(
     db.queryAsPl(f"""
         CREATE TABLE IF NOT EXISTS {table_name} (
             produkt_id BIGINT,
-            haendler_bez STRING,
+            haendler_id INTEGER,
             dtimebegin BIGINT,
             dtimeend BIGINT
         )
@@ -0,0 +1,189 @@
+import datetime as dt
+import json
+import logging
+import os
+
+import polars as pl
+
+import CONFIG
+from CONFIG import UNIX_WEEK, WEEK_RUNNING_VAR_MIN, WEEK_RUNNING_VAR_MAX
+from impl.db.datasource import DuckDBDataSource
+from impl.db.loaders.offer_store import OFFER_STORE_MANIFEST, list_offer_store_files, offer_store_is_built, \
+    resolve_offer_source
+from impl.db.simple_sql_base_query_builder import SimpleSQLBaseQueryBuilder
+from impl.repository.offer_coverage_repository import DEFAULT_OFFER_COVERAGE_TABLE, INDEX_END_WALL, INDEX_START_WALL, \
+    INDEX_WEEK_COUNT, WEEK_ORIGIN_WALL
+
+logger = logging.getLogger(__name__)
+
+OFFER_COVERAGE_INDEX_FILE = 'offer_coverage.parquet'
+OFFER_COVERAGE_MANIFEST = 'manifest.json'
+PARTIAL_FILE_SUFFIX = '.partial'
+OFFER_COVERAGE_RETAILERS_VIEW = 'offer_coverage_retailers'
+
+
+def build_offer_coverage_index(
+        db: DuckDBDataSource,
+        index_dir=CONFIG.OFFER_COVERAGE_INDEX_DIR,
+        store_dir=CONFIG.OFFER_STORE_DIR,
+        rebuild=False
+) -> int:
+    """
+    Build the offer coverage index once from the offer store: per (haendler_bez, produkt_id) two fixed width bitmaps
+    over the local wall clock weeks WEEK_RUNNING_VAR_MIN..WEEK_RUNNING_VAR_MAX. Every offer spell is stepped in
+    weekly increments from its begin up to its end, as in OffersService#filter_continuously_offered_products,
+    'offered_weeks' has the bit of every week holding a step set, 'week_start_steps' the bit of every week with a
+    step at its very start (Monday 00:00). The index is kept as long as the offer store is unchanged.
+
+    Parameters:
+    db (DuckDBDataSource): The database connection instance.
+    index_dir (Path, optional): The directory of the index. Defaults to CONFIG.OFFER_COVERAGE_INDEX_DIR.
+    store_dir (Path, optional): The directory of the offer store. Defaults to CONFIG.OFFER_STORE_DIR.
+    rebuild (bool, optional): Rebuild the index, even if the offer store is unchanged. Defaults to False.
+
+    Returns:
+    int: The number of (retailer, product) bitmap pairs built, 0 if the index was kept.
+    """
+    if not offer_store_is_built(store_dir):
+        raise FileNotFoundError(f"Offer store {store_dir} is not built. Run 00b_build_offer_store.py to build it.")
+
+    os.makedirs(index_dir, exist_ok=True)
+    index_path = os.path.join(index_dir, OFFER_COVERAGE_INDEX_FILE)
+    store_source = DuckDBDataSource.file_fingerprint(os.path.join(store_dir, OFFER_STORE_MANIFEST))
+    if not rebuild and _read_manifest(index_dir).get('store') == store_source and os.path.isfile(index_path):
+        logger.info(f"Offer coverage index {index_dir} is up to date with the offer store {store_dir}.")
+        return 0
+
+    last_bit = INDEX_WEEK_COUNT - 1
+    file_list = ", ".join(_sql_literal(store_file) for store_file in list_offer_store_files(store_dir))
+    spells_query = (
+        SimpleSQLBaseQueryBuilder(f"read_parquet([{file_list}])")
+        .select([
+            'haendler_bez', 'produkt_id',
+            'CAST(epoch(CAST(to_timestamp(dtimebegin) AS TIMESTAMP)) AS BIGINT) AS begin_wall',
+            'CAST(epoch(CAST(to_timestamp(dtimeend) AS TIMESTAMP)) AS BIGINT) AS end_wall'
+        ])
+        .build()
+    )
+    # First weekly step of a spell within the index, then all steps up to the spell or index end.
+    steps_query = (
+        SimpleSQLBaseQueryBuilder('spells')
+        .select([
+            'haendler_bez', 'produkt_id',
+            f"unnest(range(begin_wall + greatest(0, CAST(ceil(({INDEX_START_WALL} - begin_wall) / {UNIX_WEEK}) "
+            f"AS BIGINT)) * {UNIX_WEEK}, least(end_wall, {INDEX_END_WALL}) + 1, {UNIX_WEEK})) AS step_wall"
+        ])
+        .where(f"begin_wall <= {INDEX_END_WALL} AND end_wall >= {INDEX_START_WALL}")
+        .build()
+    )
+    week_bit = f"(step_wall - {INDEX_START_WALL}) // {UNIX_WEEK}"
+    query = (
+        SimpleSQLBaseQueryBuilder('steps')
+        .with_cte('spells', spells_query)
+        .with_cte('steps', steps_query)
+        .select([
+            'haendler_bez', 'produkt_id',
+            f"CAST(bitstring_agg({week_bit}, 0, {last_bit}) AS VARCHAR) AS offered_weeks",
+            f"CAST(coalesce(bitstring_agg({week_bit}, 0, {last_bit}) "
+            f"FILTER (WHERE (step_wall - {INDEX_START_WALL}) % {UNIX_WEEK} = 0), "
+            f"'{'0' * INDEX_WEEK_COUNT}'::BITSTRING) AS VARCHAR) AS week_start_steps"
+        ])
+        .group_by(['haendler_bez', 'produkt_id'])
+        .order_by('haendler_bez, produkt_id')
+        .build()
+    )
+
+    partial_path = index_path + PARTIAL_FILE_SUFFIX
+    db.query(f"COPY ({query}) TO {_sql_literal(partial_path)} (FORMAT PARQUET, COMPRESSION ZSTD)")
+    os.replace(partial_path, index_path)
+
+    bitmap_count = db.conn.execute("SELECT COUNT(*) FROM read_parquet(?)", (index_path,)).fetchone()[0]
+    _write_manifest(index_dir, {
+        'store': store_source,
+        'weeks': [WEEK_RUNNING_VAR_MIN, WEEK_RUNNING_VAR_MAX],
+        'week_origin_wall': WEEK_ORIGIN_WALL,
+        'bitmaps': bitmap_count,
+        'built_at': dt.datetime.now().isoformat(timespec='seconds'),
+    })
+    logger.info(f"Built offer coverage index {index_path} from the offer store {store_dir} "
+                f"with {bitmap_count} bitmaps.")
+    return bitmap_count
+
+
+def offer_coverage_index_is_current(index_dir=CONFIG.OFFER_COVERAGE_INDEX_DIR,
+                                    store_dir=CONFIG.OFFER_STORE_DIR) -> bool:
+    """
+    Check whether the offer coverage index has been built from the current offer store, and the offer store
+    itself covers every raw offer file unchanged (see resolve_offer_source).
+
+    Returns:
+    bool: True if the index can be used instead of the offer spells, otherwise False.
+    """
+    manifest = _read_manifest(index_dir)
+    return (os.path.isfile(os.path.join(index_dir, OFFER_COVERAGE_INDEX_FILE))
+            and manifest.get('store') == DuckDBDataSource.file_fingerprint(os.path.join(store_dir,
+                                                                                          OFFER_STORE_MANIFEST))
+            and manifest.get('week_origin_wall') == WEEK_ORIGIN_WALL
+            and resolve_offer_source(True, store_dir)[0] == store_dir)
+
+
+def load_offer_coverage_index(db: DuckDBDataSource, retailers: pl.Series, index_dir=CONFIG.OFFER_COVERAGE_INDEX_DIR,
+                              table_name=DEFAULT_OFFER_COVERAGE_TABLE) -> int:
+    """
+    (Re)create the offer coverage table with the bitmaps of the given retailers, e.g. the seal firms, keyed by their
+    haendler_id from the retailer dictionary.
+
+    Parameters:
+    db (DuckDBDataSource): The database connection instance, 'retailer_dictionary' must be loaded.
+    retailers (pl.Series): The retailers whose bitmaps are loaded.
+    index_dir (Path, optional): The directory of the index. Defaults to CONFIG.OFFER_COVERAGE_INDEX_DIR.
+    table_name (str, optional): The name of the offer coverage table. Defaults to 'offer_coverage'.
+
+    Returns:
+    int: The number of (retailer, product) bitmap pairs loaded.
+    """
+    index_path = os.path.join(index_dir, OFFER_COVERAGE_INDEX_FILE)
+    if not os.path.isfile(index_path):
+        raise FileNotFoundError(f"Offer coverage index {index_dir} is not built. "
+                                f"Run 00d_build_offer_coverage_index.py to build it.")
+
+    query = (
+        SimpleSQLBaseQueryBuilder(f"read_parquet({_sql_literal(index_path)}) pq")
+        .join('LEFT', 'retailer_dictionary rd', 'rd.haendler_bez = pq.haendler_bez')
+        .select([
+            'rd.haendler_id', 'pq.produkt_id',
+            'CAST(pq.offered_weeks AS BITSTRING) AS offered_weeks',
+            'CAST(pq.week_start_steps AS BITSTRING) AS week_start_steps'
+        ])
+        .where(f"EXISTS (SELECT 1 FROM {OFFER_COVERAGE_RETAILERS_VIEW} r WHERE r.haendler_bez = pq.haendler_bez)")
+        .build()
+    )
+    db.register(OFFER_COVERAGE_RETAILERS_VIEW, pl.DataFrame({'haendler_bez': retailers.cast(pl.Utf8).unique()}))
+    try:
+        db.query(f"CREATE OR REPLACE TABLE {table_name} AS {query}")
+    finally:
+        db.unregister(OFFER_COVERAGE_RETAILERS_VIEW)
+    db.delete_unknown_retailers(table_name, index_path)
+
+    bitmap_count = db.conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+    logger.info(f"Loaded offer coverage table '{table_name}' from {index_path} with {bitmap_count} bitmaps.")
+    return bitmap_count
+
+
+def _read_manifest(index_dir) -> dict:
+    manifest_path = os.path.join(index_dir, OFFER_COVERAGE_MANIFEST)
+    if not os.path.isfile(manifest_path):
+        return {}
+    with open(manifest_path) as manifest_file:
+        return json.load(manifest_file)
+
+
+def _write_manifest(index_dir, manifest: dict):
+    manifest_path = os.path.join(index_dir, OFFER_COVERAGE_MANIFEST)
+    with open(manifest_path + PARTIAL_FILE_SUFFIX, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    os.replace(manifest_path + PARTIAL_FILE_SUFFIX, manifest_path)
+
+
+def _sql_literal(value) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
@@ -0,0 +1,226 @@
+import datetime as dt
+import json
+import logging
+import os
+
+from tqdm import tqdm
+
+import CONFIG
+from CONFIG import ANGEBOTE_FOLDER, FILTERED_HAENDLER_BEZ, PARQUET_FILES_DIR
+from impl.db.datasource import DuckDBDataSource
+from impl.db.simple_sql_base_query_builder import SimpleSQLBaseQueryBuilder
+
+logger = logging.getLogger(__name__)
+
+OFFER_STORE_MANIFEST = 'manifest.json'
+PARTIAL_FILE_SUFFIX = '.partial'
+
+# The verdicts of resolve_offer_source by store manifest version, so the raw folders are listed once per process
+_resolved_sources = {}
+
+
+def build_offer_store(
+        db: DuckDBDataSource,
+        store_dir=CONFIG.OFFER_STORE_DIR,
+        parquet_dir=PARQUET_FILES_DIR,
+        offer_folders=ANGEBOTE_FOLDER,
+        columns=None,
+        row_group_size=CONFIG.OFFER_STORE_ROW_GROUP_SIZE,
+        filter_file=FILTERED_HAENDLER_BEZ,
+        rebuild=False
+) -> int:
+    """
+    Build the offer store: every weekly offer file reduced to the retailers in 'filtered_haendler_bez' and the
+    needed columns, sorted by (haendler_bez, produkt_id, dtimebegin) and written as zstd compressed Parquet with
+    the same file name into store_dir. Files already built from an unchanged source file are kept. The manifest
+    records the fingerprint of the filter file and the columns, if either changed all files are rebuilt, and is
+    only marked complete once every source file has been built.
+
+    Parameters:
+    db (DuckDBDataSource): The database connection instance, 'filtered_haendler_bez' must be loaded.
+    store_dir (Path, optional): The directory of the offer store. Defaults to CONFIG.OFFER_STORE_DIR.
+    parquet_dir (Path, optional): Directory containing the offer folders. Defaults to PARQUET_FILES_DIR.
+    offer_folders (list, optional): The folders containing the weekly offer files. Defaults to ANGEBOTE_FOLDER.
+    columns (list, optional): The columns to keep. Defaults to CONFIG.OFFER_STORE_COLUMNS.
+    row_group_size (int, optional): The number of rows per Parquet row group.
+    filter_file (str, optional): The CSV file 'filtered_haendler_bez' was loaded from. Defaults to
+        FILTERED_HAENDLER_BEZ.
+    rebuild (bool, optional): Rebuild all files, even if their source file is unchanged. Defaults to False.
+
+    Returns:
+    int: The number of (re)built store files.
+    """
+    columns = columns or CONFIG.OFFER_STORE_COLUMNS
+    os.makedirs(store_dir, exist_ok=True)
+
+    manifest = {'files': {}} if rebuild else _read_manifest(store_dir)
+    filter_source = DuckDBDataSource.file_fingerprint(filter_file)
+    if manifest.get('filter') != filter_source or manifest.get('columns') != columns:
+        if manifest['files']:
+            logger.info(f"Filter file {filter_file} or the columns changed, rebuilding all offer store files.")
+        manifest = {'files': {}}
+    manifest.update({'filter': filter_source, 'columns': columns, 'complete': False})
+    source_files = list_offer_source_files(parquet_dir, offer_folders)
+    built = 0
+
+    for file_name, source_path in tqdm(source_files.items(), desc="Building Offer Store", unit="file", ncols=100):
+        source = _source_fingerprint(source_path)
+        store_path = os.path.join(store_dir, file_name)
+
+        entry = manifest['files'].get(file_name)
+        if entry is not None and entry['source'] == source and os.path.isfile(store_path):
+            continue
+
+        _write_store_file(db, source_path, store_path, columns, row_group_size)
+        manifest['files'][file_name] = {
+            'source': source,
+            'rows': _count_rows(db, store_path),
+            'built_at': dt.datetime.now().isoformat(timespec='seconds'),
+        }
+        _write_manifest(store_dir, manifest)
+        built += 1
+
+    manifest['complete'] = True
+    _write_manifest(store_dir, manifest)
+    logger.info(f"Offer store {store_dir} holds {len(manifest['files'])} files, {built} (re)built.")
+    return built
+
+
+def list_offer_source_files(parquet_dir=PARQUET_FILES_DIR, offer_folders=ANGEBOTE_FOLDER) -> dict:
+    """
+    List the weekly offer files. A file name found in several folders resolves to the first folder,
+    as in file_exists_in_folders.
+
+    Returns:
+    dict: The source file paths by file name, in file name order.
+    """
+    if isinstance(offer_folders, str):
+        offer_folders = [offer_folders]
+
+    source_files = {}
+    for folder in offer_folders:
+        folder_path = os.path.join(parquet_dir, folder)
+        if not os.path.isdir(folder_path):
+            continue
+        for file_name in os.listdir(folder_path):
+            if file_name.startswith('angebot_') and file_name.endswith('.parquet'):
+                source_files.setdefault(file_name, os.path.join(folder_path, file_name))
+    return dict(sorted(source_files.items()))
+
+
+def offer_store_is_built(store_dir=CONFIG.OFFER_STORE_DIR, filter_file=FILTERED_HAENDLER_BEZ, columns=None) -> bool:
+    """
+    Check whether the offer store has been built completely, with the current filter file and columns.
+
+    Returns:
+    bool: True if the store manifest is marked complete and its fingerprint matches, otherwise False.
+    """
+    manifest = _read_manifest(store_dir)
+    return (manifest.get('complete', False) and bool(manifest['files'])
+            and manifest.get('filter') == DuckDBDataSource.file_fingerprint(filter_file)
+            and manifest.get('columns') == (columns or CONFIG.OFFER_STORE_COLUMNS))
+
+
+def list_offer_store_files(store_dir=CONFIG.OFFER_STORE_DIR) -> list:
+    """
+    List the files of the offer store, as recorded in its manifest.
+
+    Returns:
+    list: The store file paths, in file name order.
+    """
+    return [os.path.join(store_dir, file_name) for file_name in sorted(_read_manifest(store_dir)['files'])]
+
+
+def stale_offer_store_files(store_dir=CONFIG.OFFER_STORE_DIR, parquet_dir=PARQUET_FILES_DIR,
+                            offer_folders=ANGEBOTE_FOLDER) -> list:
+    """
+    Compare the offer store against the weekly offer files listed by list_offer_source_files.
+
+    Returns:
+    list: The file names missing from the store or built from another or since changed source file.
+    """
+    store_files = _read_manifest(store_dir)['files']
+    stale = []
+    for file_name, source_path in list_offer_source_files(parquet_dir, offer_folders).items():
+        entry = store_files.get(file_name)
+        if entry is None or entry['source'] != _source_fingerprint(source_path) \
+                or not os.path.isfile(os.path.join(store_dir, file_name)):
+            stale.append(file_name)
+    return stale
+
+
+def resolve_offer_source(use_offer_store=CONFIG.USE_OFFER_STORE, store_dir=CONFIG.OFFER_STORE_DIR,
+                         parquet_dir=PARQUET_FILES_DIR, offer_folders=ANGEBOTE_FOLDER):
+    """
+    Resolve where the weekly offer files are read from: the offer store if it is used, completely built and
+    covers every current raw offer file unchanged, otherwise the raw offer folders, so no week is dropped.
+    The verdict is kept until the store manifest changes.
+
+    Returns:
+    tuple: The (base_dir, folders) to pass to file_exists_in_folders.
+    """
+    raw_source = (parquet_dir, offer_folders)
+    if not use_offer_store:
+        return raw_source
+
+    manifest_path = os.path.join(store_dir, OFFER_STORE_MANIFEST)
+    manifest_mtime = os.stat(manifest_path).st_mtime_ns if os.path.isfile(manifest_path) else None
+    key = (str(store_dir), manifest_mtime, str(parquet_dir), tuple(offer_folders))
+    if key not in _resolved_sources:
+        stale = stale_offer_store_files(store_dir, parquet_dir, offer_folders) if offer_store_is_built(store_dir) \
+            else None
+        if stale is None:
+            logger.warning(f"Offer store {store_dir} is not (completely) built, reading the raw offer files. "
+                           f"Run 00b_build_offer_store.py to build it.")
+            _resolved_sources[key] = raw_source
+        elif stale:
+            logger.warning(f"Offer store {store_dir} misses or holds outdated {len(stale)} of the raw offer files "
+                           f"({', '.join(stale[:5])}{', ...' if len(stale) > 5 else ''}), reading the raw "
+                           f"offer files. Run 00b_build_offer_store.py to update it.")
+            _resolved_sources[key] = raw_source
+        else:
+            _resolved_sources[key] = (store_dir, [''])
+    return _resolved_sources[key]
+
+
+def _source_fingerprint(source_path) -> dict:
+    source_stat = os.stat(source_path)
+    return {'source': str(source_path), 'bytes': source_stat.st_size, 'mtime': source_stat.st_mtime}
+
+
+def _write_store_file(db: DuckDBDataSource, source_path, store_path, columns: list, row_group_size: int):
+    partial_path = store_path + PARTIAL_FILE_SUFFIX
+    select_query = (
+        SimpleSQLBaseQueryBuilder(f"read_parquet({_sql_literal(source_path)}) pq")
+        .select(columns)
+        .where("EXISTS ( SELECT 1 FROM filtered_haendler_bez WHERE haendler_bez = pq.haendler_bez )")
+        .order_by('haendler_bez, produkt_id, dtimebegin')
+        .build()
+    )
+    db.query(f"COPY ({select_query}) TO {_sql_literal(partial_path)} "
+             f"(FORMAT PARQUET, COMPRESSION ZSTD, ROW_GROUP_SIZE {row_group_size})")
+    os.replace(partial_path, store_path)
+    logger.info(f"Built offer store file {store_path} from {source_path}")
+
+
+def _count_rows(db: DuckDBDataSource, store_path) -> int:
+    return db.conn.execute("SELECT COUNT(*) FROM read_parquet(?)", (str(store_path),)).fetchone()[0]
+
+
+def _read_manifest(store_dir) -> dict:
+    manifest_path = os.path.join(store_dir, OFFER_STORE_MANIFEST)
+    if not os.path.isfile(manifest_path):
+        return {'files': {}}
+    with open(manifest_path) as manifest_file:
+        return json.load(manifest_file)
+
+
+def _write_manifest(store_dir, manifest: dict):
+    manifest_path = os.path.join(store_dir, OFFER_STORE_MANIFEST)
+    with open(manifest_path + PARTIAL_FILE_SUFFIX, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    os.replace(manifest_path + PARTIAL_FILE_SUFFIX, manifest_path)
+
+
+def _sql_literal(value) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
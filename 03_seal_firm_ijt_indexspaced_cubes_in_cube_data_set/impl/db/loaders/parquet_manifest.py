@@ -0,0 +1,193 @@
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import polars as pl
+import pyarrow.parquet as pq
+
+import CONFIG
+from CONFIG import PARQUET_FILES_DIR
+
+logger = logging.getLogger(__name__)
+
+# The weekly offer and monthly click files: (dataset, year, week or month) from the file name
+DATASET_FILE_PATTERNS = {
+    'angebot': re.compile(r'^angebot_(\d{4})w(\d{2})\.parquet$'),
+    'clicks': re.compile(r'^clicks_(\d{4})m(\d{2})\.parquet$'),
+}
+# The columns whose footer statistics bound the time range of a file: (start column, end column)
+DATASET_TIME_COLUMNS = {
+    'angebot': ('dtimebegin', 'dtimeend'),
+    'clicks': ('timestamp', 'timestamp'),
+}
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+class ParquetFileManifest:
+    """
+    The weekly offer and monthly click files of a set of folders, scanned once: one directory listing per folder
+    instead of an os.path.isfile probe per file, folder and seal window on the network filesystem.
+
+    Every file is recorded with its dataset, year, week or month, row count and the time range of its rows
+    (min dtimebegin/max dtimeend, or min/max timestamp) from the Parquet footer statistics.
+    """
+
+    def __init__(self, base_dir=PARQUET_FILES_DIR, folders=CONFIG.ANGEBOTE_FOLDER, read_statistics: bool = True,
+                 max_workers: int = 16):
+        """
+        Parameters:
+        base_dir (Path, optional): The directory containing the folders. Defaults to PARQUET_FILES_DIR.
+        folders (list, optional): The folder(s) to scan, in resolution order. Defaults to ANGEBOTE_FOLDER.
+        read_statistics (bool, optional): Read the row counts and time ranges from the Parquet footers.
+        max_workers (int, optional): The number of footers read concurrently.
+        """
+        self.base_dir = base_dir
+        self.folders = [folders] if isinstance(folders, str) else list(folders)
+        self.files = {folder: self._scan_folder(folder) for folder in self.folders}
+        self.entries_by_path = {entry['path']: entry
+                                for folder_files in self.files.values() for entry in folder_files.values()}
+
+        entries = list(self.entries_by_path.values())
+        if read_statistics and entries:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(self._read_statistics, entries))
+
+        logger.info(f"Scanned {len(entries)} Parquet files in {len(self.folders)} folders of {base_dir}.")
+
+    def resolve(self, file_name: str, folders=None) -> str:
+        """
+        Resolve a file name to its path like file_exists_in_folders: the first folder holding the file.
+
+        Parameters:
+        file_name (str): The file name, e.g. angebot_2023w11.parquet.
+        folders (list, optional): The folder(s) to look in, in order. Defaults to all scanned folders.
+
+        Returns:
+        str: The path of the file, None if no folder holds it.
+        """
+        if folders is None:
+            folders = self.folders
+        elif isinstance(folders, str):
+            folders = [folders]
+
+        for folder in folders:
+            entry = self.files.get(folder, {}).get(file_name)
+            if entry is not None:
+                return entry['path']
+        return None
+
+    def overlaps(self, file_path: str, window_start: int, window_end: int) -> bool:
+        """
+        Check whether a file may hold rows within a time window, according to its footer statistics.
+
+        Parameters:
+        file_path (str): The path of the file, as returned by resolve.
+        window_start (int): The start of the window (Unix timestamp).
+        window_end (int): The end of the window (Unix timestamp).
+
+        Returns:
+        bool: False if the time range of the file lies outside the window, True otherwise
+        (also if the file has no statistics).
+        """
+        entry = self.entries_by_path.get(str(file_path))
+        if entry is None or entry['time_start'] is None or entry['time_end'] is None:
+            return True
+        return entry['time_start'] <= window_end and entry['time_end'] >= window_start
+
+    def to_frame(self) -> pl.DataFrame:
+        """
+        Get the manifest as a table.
+
+        Returns:
+        pl.DataFrame: A Polars DataFrame with the columns dataset, year, period (week or month), folder, path,
+        rows, time_start and time_end, one row per file.
+        """
+        return pl.DataFrame(list(self.entries_by_path.values()), schema={
+            'dataset': pl.Utf8, 'year': pl.Int32, 'period': pl.Int32, 'folder': pl.Utf8, 'path': pl.Utf8,
+            'rows': pl.Int64, 'time_start': pl.Int64, 'time_end': pl.Int64,
+        })
+
+    def _scan_folder(self, folder: str) -> dict:
+        folder_path = os.path.join(self.base_dir, folder)
+        if not os.path.isdir(folder_path):
+            return {}
+
+        folder_files = {}
+        with os.scandir(folder_path) as directory:
+            for dir_entry in directory:
+                for dataset, pattern in DATASET_FILE_PATTERNS.items():
+                    match = pattern.match(dir_entry.name)
+                    if match:
+                        folder_files[dir_entry.name] = {
+                            'dataset': dataset, 'year': int(match.group(1)), 'period': int(match.group(2)),
+                            'folder': folder, 'path': os.path.join(folder_path, dir_entry.name),
+                            'rows': None, 'time_start': None, 'time_end': None,
+                        }
+                        break
+        return folder_files
+
+    @staticmethod
+    def _read_statistics(entry: dict):
+        try:
+            metadata = pq.ParquetFile(entry['path']).metadata
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read the Parquet footer of {entry['path']}: {e}")
+            return
+
+        entry['rows'] = metadata.num_rows
+        start_column, end_column = DATASET_TIME_COLUMNS[entry['dataset']]
+        entry['time_start'] = _column_bound(metadata, start_column, min)
+        entry['time_end'] = _column_bound(metadata, end_column, max)
+
+
+def _column_bound(metadata, column_name: str, bound):
+    """The min (or max) of a column over all row groups, None if a row group has no statistics for it."""
+    values = []
+    for row_group_index in range(metadata.num_row_groups):
+        row_group = metadata.row_group(row_group_index)
+        if not row_group.num_rows:
+            continue
+        column = next((row_group.column(index) for index in range(row_group.num_columns)
+                       if row_group.column(index).path_in_schema == column_name), None)
+        if column is None or column.statistics is None or not column.statistics.has_min_max:
+            return None
+        values.append(column.statistics.min if bound is min else column.statistics.max)
+    return int(bound(values)) if values else None
+
+
+def get_parquet_manifest(base_dir=PARQUET_FILES_DIR, folders=CONFIG.ANGEBOTE_FOLDER) -> ParquetFileManifest:
+    """
+    Get the manifest of the given folders, scanned on first use and then shared within the process.
+
+    Parameters:
+    base_dir (Path, optional): The directory containing the folders. Defaults to PARQUET_FILES_DIR.
+    folders (list, optional): The folder(s) to scan, in resolution order. Defaults to ANGEBOTE_FOLDER.
+
+    Returns:
+    ParquetFileManifest: The manifest.
+    """
+    key = _manifest_key(base_dir, folders)
+    with _manifests_lock:
+        if key not in _manifests:
+            _manifests[key] = ParquetFileManifest(base_dir, folders)
+        return _manifests[key]
+
+
+def register_parquet_manifest(manifest: ParquetFileManifest):
+    """
+    Share a manifest scanned elsewhere within the process, e.g. the manifests of the main process in a worker
+    process, so get_parquet_manifest does not scan its folders again.
+
+    Parameters:
+    manifest (ParquetFileManifest): The manifest.
+    """
+    with _manifests_lock:
+        _manifests[_manifest_key(manifest.base_dir, manifest.folders)] = manifest
+
+
+def _manifest_key(base_dir, folders) -> tuple:
+    return str(base_dir), (folders,) if isinstance(folders, str) else tuple(folders)
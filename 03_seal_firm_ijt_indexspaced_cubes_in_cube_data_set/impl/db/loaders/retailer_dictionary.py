@@ -0,0 +1,45 @@
+import logging
+
+import polars as pl
+
+from impl.db.datasource import DuckDBDataSource
+from impl.repository.retailer_dictionary_repository import RETAILER_DICTIONARY_TABLE, RetailerDictionaryRepository
+
+logger = logging.getLogger(__name__)
+
+RETAILER_NAMES_VIEW = 'retailer_names'
+
+
+def build_retailer_dictionary(
+        db: DuckDBDataSource,
+        retailer_names: pl.Series,
+        table_name=RETAILER_DICTIONARY_TABLE
+) -> int:
+    """
+    (Re)create the retailer dictionary, mapping every distinct retailer name to a dense INTEGER id (0..n-1)
+    in name order. The ids only depend on the set of names, so processes building the dictionary from the
+    same names agree on them. The cached name to id map of the RetailerDictionaryRepository is cleared.
+
+    Parameters:
+    db (DuckDBDataSource): The database connection instance.
+    retailer_names (pl.Series): The retailer names, duplicates and nulls are dropped.
+    table_name (str, optional): The name of the dictionary table. Defaults to 'retailer_dictionary'.
+
+    Returns:
+    int: The number of retailers in the dictionary.
+    """
+    names = pl.DataFrame({'haendler_bez': retailer_names.cast(pl.Utf8)})
+    db.register(RETAILER_NAMES_VIEW, names)
+    try:
+        db.query(f"""
+            CREATE OR REPLACE TABLE {table_name} AS
+            SELECT CAST(ROW_NUMBER() OVER (ORDER BY haendler_bez) - 1 AS INTEGER) AS haendler_id, haendler_bez
+            FROM (SELECT DISTINCT haendler_bez FROM {RETAILER_NAMES_VIEW} WHERE haendler_bez IS NOT NULL)
+        """)
+    finally:
+        db.unregister(RETAILER_NAMES_VIEW)
+    RetailerDictionaryRepository(db, table_name).clear_retailer_ids()
+
+    retailer_count = db.conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+    logger.info(f"Created retailer dictionary '{table_name}' with {retailer_count} retailers.")
+    return retailer_count
@@ -0,0 +1,167 @@
+import datetime as dt
+import logging
+
+import CONFIG
+from CONFIG import ANGEBOTE_FOLDER, CLICKS_FOLDER, PARQUET_FILES_DIR
+from impl.db.datasource import DuckDBDataSource
+from impl.db.loaders.load_temp_clicks_data import initialize_clicks_table
+from impl.db.loaders.load_temp_offers_data import initialize_offer_table
+from impl.db.loaders.parquet_manifest import get_parquet_manifest
+from impl.helpers import get_week_year_from_seal_date, generate_weeks_around_seal, get_year_month_from_seal_date, \
+    generate_months_around_seal, date_to_unix_time
+
+logger = logging.getLogger(__name__)
+
+
+class SlidingWindowLoader:
+    """
+    Keeps the offer and click inflow windows of consecutive seal dates loaded incrementally.
+
+    Instead of dropping and reloading all weekly offer and monthly click files per seal firm, only the files
+    leaving the window are evicted and only the files entering it are loaded, in one scan. Processing seal firms in
+    seal date order therefore reads every file roughly once. Only offer spells ending after the start of the window
+    are loaded; moving the window back to an earlier start reloads it. The retailer names are loaded as their haendler_id
+    from the retailer dictionary, the rows of retailers not in it are dropped (their number is logged as a warning).
+    """
+
+    def __init__(self,
+                 db: DuckDBDataSource,
+                 offers_table='angebot',
+                 clicks_table='clicks',
+                 offer_columns=None,
+                 click_columns=None,
+                 parquet_dir=PARQUET_FILES_DIR,
+                 offer_dir=None,
+                 offer_folders=ANGEBOTE_FOLDER,
+                 click_folders=CLICKS_FOLDER,
+                 pre_seal_weeks=CONFIG.OFFER_TIME_SPELLS_PREPROCESSING_WEEKS_PRE_SEAL_CONSIDERED,
+                 post_seal_weeks=CONFIG.OFFER_TIME_SPELLS_PREPROCESSING_WEEKS_POST_SEAL_CONSIDERED,
+                 load_clicks=True):
+        """
+        Parameters:
+        db (DuckDBDataSource): The database connection instance.
+        offers_table (str, optional): The name of the offer table. Defaults to 'angebot'.
+        clicks_table (str, optional): The name of the clicks table. Defaults to 'clicks'.
+        offer_columns (list, optional): The offer columns to load. Defaults to ['produkt_id', 'haendler_bez', 'dtimebegin', 'dtimeend'].
+        click_columns (list, optional): The click columns to load. Defaults to ['produkt_id', 'haendler_bez', 'timestamp'].
+        parquet_dir (Path, optional): Directory containing the Parquet folders. Defaults to PARQUET_FILES_DIR.
+        offer_dir (Path, optional): Directory containing the offer folders, e.g. the offer store. Defaults to parquet_dir.
+        offer_folders (list, optional): The folders containing the weekly offer files. Defaults to ANGEBOTE_FOLDER.
+        click_folders (str, optional): The folder(s) containing the monthly click files. Defaults to CLICKS_FOLDER.
+        pre_seal_weeks (int, optional): Number of weeks before the seal date to consider.
+        post_seal_weeks (int, optional): Number of weeks after the seal date to consider.
+        load_clicks (bool, optional): Keep the click window loaded, not needed when the top N products are ranked
+        on the click cube. Defaults to True.
+        """
+        self.db = db
+        self.offers_table = offers_table
+        self.clicks_table = clicks_table
+        self.offer_columns = offer_columns or ['produkt_id', 'haendler_bez', 'dtimebegin', 'dtimeend']
+        self.click_columns = click_columns or ['produkt_id', 'haendler_bez', 'timestamp']
+        self.parquet_dir = parquet_dir
+        self.offer_dir = offer_dir if offer_dir is not None else parquet_dir
+        self.offer_folders = offer_folders
+        self.click_folders = click_folders
+        self.pre_seal_weeks = pre_seal_weeks
+        self.post_seal_weeks = post_seal_weeks
+
+        self.load_clicks = load_clicks
+
+        self.loaded_files = {offers_table: [], clicks_table: []} if load_clicks else {offers_table: []}
+        # The window start the loaded offer spells were filtered on
+        self.offer_window_start = None
+        self.files_read = 0
+
+    def reset(self):
+        """
+        Drop the offer and click tables, e.g. left over from a non incremental load, and forget the current windows.
+        """
+        for table_name, file_paths in self.loaded_files.items():
+            self.db.evict_files_from_table(table_name, file_paths)
+            if self.db.table_exists(table_name):
+                self.db.free_up_table_and_manipulate_file_logs(table_name)
+            self.loaded_files[table_name] = []
+        self.offer_window_start = None
+
+    def advance_to(self, seal_date_str: str):
+        """
+        Move the offer and click windows to the given seal date, evicting and loading only the differing files.
+
+        Parameters:
+        seal_date_str (str): The seal date as a string.
+
+        Returns:
+        tuple: The number of (evicted, loaded) files.
+        """
+        offer_files = self._resolve(self._relevant_offer_files(seal_date_str), self.offer_folders, self.offer_dir)
+        window_start = self._offer_window_start(seal_date_str)
+        if self.offer_window_start is not None and window_start < self.offer_window_start:
+            # The loaded files lack the spells ending before the later window start
+            self.db.evict_files_from_table(self.offers_table, self.loaded_files[self.offers_table])
+            self.loaded_files[self.offers_table] = []
+        # The window end is not pushed down, the kept files have to serve the later window ends as well
+        evicted_offers, loaded_offers = self._slide(self.offers_table, offer_files, self.offer_columns,
+                                                    where=f"dtimeend >= {window_start}")
+        self.offer_window_start = window_start
+
+        evicted_clicks, loaded_clicks = 0, 0
+        if self.load_clicks:
+            click_files = self._resolve(self._relevant_click_files(seal_date_str), self.click_folders, self.parquet_dir)
+            evicted_clicks, loaded_clicks = self._slide(self.clicks_table, click_files, self.click_columns)
+
+        logger.info(f"Moved inflow windows to {seal_date_str}: "
+                    f"offers -{evicted_offers}/+{loaded_offers} files, clicks -{evicted_clicks}/+{loaded_clicks} files.")
+        return evicted_offers + evicted_clicks, loaded_offers + loaded_clicks
+
+    def _relevant_offer_files(self, seal_date_str: str) -> list:
+        seal_year, seal_week = get_week_year_from_seal_date(seal_date_str)
+        return generate_weeks_around_seal(seal_year, seal_week, self.pre_seal_weeks, self.post_seal_weeks)
+
+    def _offer_window_start(self, seal_date_str: str) -> int:
+        seal_date = dt.datetime.fromtimestamp(date_to_unix_time(seal_date_str))
+        return int((seal_date - dt.timedelta(weeks=self.pre_seal_weeks)).timestamp())
+
+    @staticmethod
+    def _relevant_click_files(seal_date_str: str) -> list:
+        seal_year, seal_month = get_year_month_from_seal_date(seal_date_str)
+        return generate_months_around_seal(seal_year, seal_month)
+
+    @staticmethod
+    def _resolve(file_names: list, folders, base_dir) -> list:
+        manifest = get_parquet_manifest(base_dir, folders)
+        file_paths = [manifest.resolve(file_name) for file_name in file_names]
+        return [str(file_path) for file_path in file_paths if file_path]
+
+    def _slide(self, table_name: str, file_paths: list, columns: list, where: str = None) -> tuple:
+        """
+        Evict the files of the table no longer in file_paths and load the ones not loaded yet in one scan,
+        keeping only the rows matching where.
+
+        Returns:
+        tuple: The number of (evicted, loaded) files.
+        """
+        if not self.db.table_exists(table_name):
+            # Evicted in the meantime (see TableCacheManager), so its files have to be loaded again
+            self.loaded_files[table_name] = []
+
+        wanted = set(file_paths)
+        loaded = set(self.loaded_files[table_name])
+
+        stale = [file_path for file_path in self.loaded_files[table_name] if file_path not in wanted]
+        new = [file_path for file_path in file_paths if file_path not in loaded]
+
+        self.db.evict_files_from_table(table_name, stale)
+
+        self.files_read += len(self.db.append_parquet_files_to_table_with_source(new, table_name, columns=columns,
+                                                                                 where=where, encode_retailers=True))
+
+        self.loaded_files[table_name] = [file_path for file_path in self.loaded_files[table_name]
+                                         if file_path in wanted] + new
+
+        if not self.db.table_exists(table_name):
+            # Empty window, create the table so the repositories can still query it.
+            initialize_table = initialize_offer_table if table_name == self.offers_table else initialize_clicks_table
+            initialize_table(self.db, table_name=table_name)
+            self.db.query(f"ALTER TABLE {table_name} ADD COLUMN source_file VARCHAR")
+
+        return len(stale), len(new)
@@ -0,0 +1,192 @@
+import heapq
+import logging
+import os
+import re
+import sys
+import threading
+
+import polars as pl
+
+import CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the wall time histogram buckets, the last bucket is open ended.
+HISTOGRAM_BUCKETS_MS = [1, 10, 100, 1000, 10000]
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+_READ_QUERY = re.compile(r"\s*(SELECT|WITH)\b", re.IGNORECASE)
+
+_DATASOURCE_FILE = os.path.normcase(os.path.join('impl', 'db', 'datasource.py'))
+_PROFILER_FILE = os.path.normcase(os.path.join('impl', 'db', 'query_profiler.py'))
+
+
+class QueryProfiler:
+    """
+    Records the wall time, returned rows and fingerprint of every query run through DuckDBDataSource,
+    aggregates them into a wall time histogram per calling (repository) method and keeps the
+    EXPLAIN ANALYZE plans of the slowest queries.
+    """
+
+    def __init__(self, slowest_n: int = CONFIG.QUERY_PROFILER_SLOWEST_N):
+        """
+        Parameters:
+        slowest_n (int): The number of slowest queries to keep the plans of.
+        """
+        self.slowest_n = slowest_n
+        self.methods = {}
+        self.fingerprints = {}
+        self.slowest = []
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(query_str: str) -> str:
+        """
+        Normalize a query to its shape: literals and value lists become ? and whitespace is collapsed,
+        so the queries of one repository method with different arguments share a fingerprint.
+
+        Parameters:
+        query_str (str): The SQL query.
+
+        Returns:
+        str: The fingerprint of the query.
+        """
+        fingerprint = _STRING_LITERAL.sub('?', query_str)
+        fingerprint = _NUMBER_LITERAL.sub('?', fingerprint)
+        fingerprint = _VALUE_LIST.sub('(?...)', fingerprint)
+        return _WHITESPACE.sub(' ', fingerprint).strip()
+
+    @staticmethod
+    def is_read_query(query_str: str) -> bool:
+        """
+        Check whether a query only reads, i.e. can be re-run with EXPLAIN ANALYZE without side effects.
+        """
+        return _READ_QUERY.match(query_str) is not None
+
+    @staticmethod
+    def caller() -> str:
+        """
+        Get the method issuing the query: the first caller outside of DuckDBDataSource and the profiler.
+
+        Returns:
+        str: The calling method as Class.method (or module.function).
+        """
+        frame = sys._getframe(1)
+        while frame is not None:
+            file_name = os.path.normcase(frame.f_code.co_filename)
+            if not (file_name.endswith(_DATASOURCE_FILE) or file_name.endswith(_PROFILER_FILE)
+                    or file_name.endswith('contextlib.py')):
+                owner = frame.f_locals.get('self')
+                if owner is not None:
+                    return f"{type(owner).__name__}.{frame.f_code.co_name}"
+                return f"{os.path.splitext(os.path.basename(file_name))[0]}.{frame.f_code.co_name}"
+            frame = frame.f_back
+        return '<unknown>'
+
+    def wants_plan(self, seconds: float) -> bool:
+        """
+        Check whether a query of the given wall time is among the slowest so far, i.e. its plan should be captured.
+        """
+        with self.lock:
+            return len(self.slowest) < self.slowest_n or seconds > self.slowest[0][0]
+
+    def record(self, query_str: str, seconds: float, rows: int, method: str, plan: str = None):
+        """
+        Record a query.
+
+        Parameters:
+        query_str (str): The SQL query.
+        seconds (float): The wall time of the query.
+        rows (int): The number of returned rows, -1 if the result was not materialized.
+        method (str): The calling method, see caller.
+        plan (str, optional): The EXPLAIN ANALYZE output of the query.
+        """
+        fingerprint = self.fingerprint(query_str)
+        bucket = next((index for index, upper_ms in enumerate(HISTOGRAM_BUCKETS_MS) if seconds * 1000 < upper_ms),
+                      len(HISTOGRAM_BUCKETS_MS))
+
+        with self.lock:
+            stats = self.methods.setdefault(method, {
+                'queries': 0, 'total_s': 0.0, 'max_s': 0.0, 'rows': 0,
+                'histogram': [0] * (len(HISTOGRAM_BUCKETS_MS) + 1), 'fingerprints': set()
+            })
+            stats['queries'] += 1
+            stats['total_s'] += seconds
+            stats['max_s'] = max(stats['max_s'], seconds)
+            stats['rows'] += max(rows, 0)
+            stats['histogram'][bucket] += 1
+            stats['fingerprints'].add(fingerprint)
+
+            fingerprint_stats = self.fingerprints.setdefault(fingerprint, {'queries': 0, 'total_s': 0.0, 'method': method})
+            fingerprint_stats['queries'] += 1
+            fingerprint_stats['total_s'] += seconds
+
+            if plan is not None:
+                entry = (seconds, id(plan), method, query_str, plan)
+                if len(self.slowest) < self.slowest_n:
+                    heapq.heappush(self.slowest, entry)
+                elif seconds > self.slowest[0][0]:
+                    heapq.heapreplace(self.slowest, entry)
+
+    def summary(self) -> pl.DataFrame:
+        """
+        Summarize the recorded queries per calling method.
+
+        Returns:
+        pl.DataFrame: One row per method with the query count, total/mean/max wall time, returned rows,
+        number of distinct fingerprints and the histogram bucket counts, ordered by total wall time.
+        """
+        bucket_names = [f"lt_{upper_ms}ms" for upper_ms in HISTOGRAM_BUCKETS_MS] + [f"ge_{HISTOGRAM_BUCKETS_MS[-1]}ms"]
+        with self.lock:
+            rows = [{
+                'method': method,
+                'queries': stats['queries'],
+                'total_s': round(stats['total_s'], 3),
+                'mean_ms': round(stats['total_s'] * 1000 / stats['queries'], 3),
+                'max_ms': round(stats['max_s'] * 1000, 3),
+                'rows': stats['rows'],
+                'fingerprints': len(stats['fingerprints']),
+                **dict(zip(bucket_names, stats['histogram'])),
+            } for method, stats in self.methods.items()]
+
+        if not rows:
+            return pl.DataFrame()
+        return pl.DataFrame(rows).sort('total_s', descending=True)
+
+    def slowest_queries(self) -> list:
+        """
+        Get the slowest recorded queries with their plans.
+
+        Returns:
+        list: (seconds, method, query, plan) tuples, slowest first.
+        """
+        with self.lock:
+            return [(seconds, method, query_str, plan)
+                    for seconds, _, method, query_str, plan in sorted(self.slowest, reverse=True)]
+
+    def log_summary(self):
+        """
+        Log the per method summary table, the most expensive fingerprints and the plans of the slowest queries.
+        """
+        summary = self.summary()
+        if summary.is_empty():
+            logger.info("Query profile: no queries recorded.")
+            return
+
+        with pl.Config(tbl_rows=-1, tbl_cols=-1, tbl_width_chars=250, fmt_str_lengths=80):
+            logger.info(f"Query profile per method:\n{summary}")
+
+            with self.lock:
+                fingerprints = pl.DataFrame([
+                    {'fingerprint': fingerprint, 'method': stats['method'], 'queries': stats['queries'],
+                     'total_s': round(stats['total_s'], 3)}
+                    for fingerprint, stats in self.fingerprints.items()
+                ]).sort('total_s', descending=True).head(self.slowest_n)
+            logger.info(f"Query profile, most expensive fingerprints:\n{fingerprints}")
+
+        for rank, (seconds, method, query_str, plan) in enumerate(self.slowest_queries(), start=1):
+            logger.info(f"Query profile, slowest query {rank} ({seconds * 1000:.1f} ms, {method}):\n"
+                        f"{query_str}\n{plan}")
@@ -40,6 +40,8 @@ class SimpleSQLBaseQueryBuilder:
         self.window_clause = window_clause
         self.with_clause = with_clause
         self.having_clause = having_clause
+        self.cte_params = []
+        self.params = []
 
     def select(
             self,
@@ -66,15 +68,18 @@ class SimpleSQLBaseQueryBuilder:
 
     def where(
             self,
-            condition: str
+            condition: str,
+            *params
     ):
         """
         Add a condition to the WHERE clause.
 
         Parameters:
-        condition (str): The condition to be added to the WHERE clause.
+        condition (str): The condition to be added to the WHERE clause, may contain ? placeholders.
+        *params: The values bound to the ? placeholders of the condition, in order.
         """
         self.conditions.append(condition)
+        self.params.extend(params)
         return self
 
     def group_by(
@@ -167,7 +172,8 @@ class SimpleSQLBaseQueryBuilder:
     def with_cte(
             self,
             cte_name: str,
-            cte_query: str
+            cte_query: str,
+            cte_params: list = None
     ):
         """
         Add a Common Table Expression (CTE) to the query.
@@ -175,7 +181,9 @@ class SimpleSQLBaseQueryBuilder:
         Parameters:
         cte_name (str): The name of the CTE.
         cte_query (str): The query to define the CTE.
+        cte_params (list, optional): The values bound to the ? placeholders of the CTE query, e.g. build_params().
         """
+        self.cte_params.extend(cte_params or [])
         if self.with_clause:
             self.with_clause += f", {cte_name} AS ({cte_query})"
         else:
@@ -187,7 +195,8 @@ class SimpleSQLBaseQueryBuilder:
             produkt_id: str = None,
             haendler_bez: str = None,
             time_start: str = None,
-            time_end: str = None
+            time_end: str = None,
+            haendler_id: int = None
     ):
         """
         Dynamically build the WHERE clause based on provided filters.
@@ -197,11 +206,14 @@ class SimpleSQLBaseQueryBuilder:
         haendler_bez (str, optional): Retailer name filter.
         time_start (str, optional): Start time filter.
         time_end (str, optional): End time filter.
+        haendler_id (int, optional): Retailer id filter (see the retailer dictionary).
         """
         if produkt_id:
             self.where(f"produkt_id = '{produkt_id}'")
         if haendler_bez:
-            self.where(f"haendler_bez = '{haendler_bez}'")
+            self.where("haendler_bez = ?", haendler_bez)
+        if haendler_id is not None:
+            self.where(f"haendler_id = {haendler_id}")
         if time_start is not None and time_end is not None:
             self.where(f"(dtimebegin <= {time_end} AND dtimeend >= {time_start})")
         elif time_start is not None:
@@ -242,6 +254,15 @@ class SimpleSQLBaseQueryBuilder:
 
         return query
 
+    def build_params(self) -> list:
+        """
+        Get the values bound to the ? placeholders of the built query, in placeholder order.
+
+        Returns:
+        list: The parameters to execute the query with.
+        """
+        return self.cte_params + self.params
+
     def insert_into(
             self,
             target_table: str
@@ -0,0 +1,283 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import polars as pl
+
+import CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Uncompressed bytes per value of the DuckDB column types, VARCHAR and other variable sized types count their
+# 16 byte string_t header (short strings are inlined)
+COLUMN_TYPE_BYTES = {
+    'BOOLEAN': 1, 'TINYINT': 1, 'UTINYINT': 1,
+    'SMALLINT': 2, 'USMALLINT': 2,
+    'INTEGER': 4, 'UINTEGER': 4, 'FLOAT': 4, 'DATE': 4,
+    'BIGINT': 8, 'UBIGINT': 8, 'DOUBLE': 8, 'TIMESTAMP': 8, 'TIMESTAMP WITH TIME ZONE': 8, 'TIME': 8,
+}
+DEFAULT_COLUMN_TYPE_BYTES = 16
+
+# The base tables, loaded once by Script 0 and kept in a persistent database (see CONFIG.USE_DUCKDB_SNAPSHOT) while
+# their input files are unchanged; nothing loads them again, so they are never evicted
+SNAPSHOT_TABLES = ['seal_change_firms', 'filtered_haendler_bez', 'products', 'retailers', 'retailer_dictionary',
+                   'file_log']
+
+
+class TableCacheManager:
+    """
+    Tracks the tables loaded into a DuckDBDataSource (load time, last access and estimated size) and evicts them
+    according to their TABLES_CONFIG entry and a memory budget.
+
+    Eviction is event driven instead of timed: loading a table evicts the least recently used tables while the
+    loaded tables exceed the memory budget, and enforce, run when tables have been used, additionally drops the
+    tables whose cache_duration elapsed, which exceed their row_limit or are to be dropped after use.
+    Tables in use (see in_use) are never evicted, and the memory budget never evicts the SNAPSHOT_TABLES or the
+    tables their config keeps (drop_after_use False and no cache_duration).
+    """
+
+    def __init__(self, db, tables_config: dict,
+                 memory_budget_bytes: int = CONFIG.TABLE_CACHE_MEMORY_BUDGET_BYTES,
+                 clock=time.monotonic):
+        """
+        Parameters:
+        db (DuckDBDataSource): The database whose tables are managed.
+        tables_config (dict): The eviction rules per table, see TABLES_CONFIG.
+        memory_budget_bytes (int, optional): The estimated bytes the loaded tables may hold, None for no budget.
+        clock (callable, optional): The time source in seconds. Defaults to time.monotonic.
+        """
+        self.db = db
+        self.configs = {self.table_name_of(config): config for config in tables_config.values()
+                        if self.table_name_of(config)}
+        self.memory_budget_bytes = memory_budget_bytes
+        self.clock = clock
+        self.tables = {}
+        self.pinned = {}
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def table_name_of(config: dict) -> str:
+        """
+        Get the table a TABLES_CONFIG entry applies to: its folder or file name without slashes and extension.
+
+        Parameters:
+        config (dict): The TABLES_CONFIG entry.
+
+        Returns:
+        str: The table name, None if the entry names neither a folder nor a file.
+        """
+        name = config.get("folder_name", config.get("file_name"))
+        if not name:
+            return None
+        return name.strip('/').removesuffix('.parquet')
+
+    def config_for(self, table_name: str) -> dict:
+        """
+        Get the eviction rules of a table.
+
+        Parameters:
+        table_name (str): The table name.
+
+        Returns:
+        dict: The TABLES_CONFIG entry of the table, empty if it has none.
+        """
+        return self.configs.get(table_name, {})
+
+    def is_kept(self, table_name: str) -> bool:
+        """
+        Check whether a table is exempt from the memory budget.
+
+        Parameters:
+        table_name (str): The table name.
+
+        Returns:
+        bool: True for the SNAPSHOT_TABLES and the tables whose config has drop_after_use False and no
+        cache_duration, otherwise False.
+        """
+        if table_name in SNAPSHOT_TABLES:
+            return True
+        config = self.config_for(table_name)
+        return bool(config) and not config.get("drop_after_use", False) and not config.get("cache_duration")
+
+    def record_load(self, table_name: str):
+        """
+        Record that rows were loaded into a table and evict other tables while the memory budget is exceeded.
+
+        Parameters:
+        table_name (str): The loaded table.
+        """
+        with self.lock:
+            now = self.clock()
+            entry = self.tables.setdefault(table_name, {'loaded_at': now})
+            entry['last_access'] = now
+            entry['rows'], entry['bytes'] = self._estimate_size(table_name)
+            self._enforce_memory_budget({table_name}, [])
+
+    @contextmanager
+    def in_use(self, *table_names: str):
+        """
+        Protect tables from eviction while they are used, e.g. the inflow tables of the seal firm being processed.
+
+        Parameters:
+        table_names (str): The tables in use.
+        """
+        with self.lock:
+            for table_name in table_names:
+                self.pinned[table_name] = self.pinned.get(table_name, 0) + 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                for table_name in table_names:
+                    self.pinned[table_name] -= 1
+                    if not self.pinned[table_name]:
+                        del self.pinned[table_name]
+
+    def touch(self, *table_names: str):
+        """
+        Record an access of tables, making them the most recently used.
+
+        Parameters:
+        table_names (str): The accessed tables.
+        """
+        with self.lock:
+            now = self.clock()
+            for table_name in table_names:
+                if table_name in self.tables:
+                    self.tables[table_name]['last_access'] = now
+
+    def forget(self, table_name: str):
+        """
+        Stop tracking a table, e.g. after it was dropped.
+
+        Parameters:
+        table_name (str): The table name.
+        """
+        with self.lock:
+            self.tables.pop(table_name, None)
+
+    def minutes_since_load(self, table_name: str):
+        """
+        Get the minutes since a table was first loaded.
+
+        Parameters:
+        table_name (str): The table name.
+
+        Returns:
+        float: The elapsed minutes, None if the table is not tracked.
+        """
+        with self.lock:
+            entry = self.tables.get(table_name)
+            return None if entry is None else (self.clock() - entry['loaded_at']) / 60
+
+    def total_bytes(self) -> int:
+        """
+        Returns:
+        int: The estimated bytes of all tracked tables.
+        """
+        with self.lock:
+            return sum(entry['bytes'] for entry in self.tables.values())
+
+    def stats(self) -> pl.DataFrame:
+        """
+        Get the tracked tables.
+
+        Returns:
+        pl.DataFrame: A Polars DataFrame with the columns table_name, rows, bytes, minutes_since_load and
+        minutes_since_access, the least recently used table first.
+        """
+        with self.lock:
+            now = self.clock()
+            entries = sorted(self.tables.items(), key=lambda item: item[1]['last_access'])
+            return pl.DataFrame({
+                'table_name': [table_name for table_name, _ in entries],
+                'rows': [entry['rows'] for _, entry in entries],
+                'bytes': [entry['bytes'] for _, entry in entries],
+                'minutes_since_load': [(now - entry['loaded_at']) / 60 for _, entry in entries],
+                'minutes_since_access': [(now - entry['last_access']) / 60 for _, entry in entries],
+            }, schema={'table_name': pl.Utf8, 'rows': pl.Int64, 'bytes': pl.Int64,
+                       'minutes_since_load': pl.Float64, 'minutes_since_access': pl.Float64})
+
+    def evict(self, table_name: str):
+        """
+        Drop a table, and its file log entries if its config asks for it (the default), so it can be loaded again.
+
+        Parameters:
+        table_name (str): The table to drop.
+        """
+        with self.lock:
+            self.forget(table_name)
+            if not self.db.table_exists(table_name):
+                return
+            if self.config_for(table_name).get("file_log_delete", True):
+                self.db.free_up_table_and_manipulate_file_logs(table_name)
+            else:
+                self.db.query(f"DROP TABLE IF EXISTS {table_name}")
+            logger.info(f"Evicted table '{table_name}' from the table cache.")
+
+    def enforce(self, protected=(), after_use: bool = False) -> list:
+        """
+        Evict the tables whose cache_duration elapsed or which exceed their row_limit, with after_use also the
+        ones to drop_after_use, then the least recently used tables while the memory budget is exceeded.
+
+        Parameters:
+        protected (iterable, optional): Further tables to keep besides the ones in use.
+        after_use (bool, optional): Whether the tables have been used, so drop_after_use applies.
+
+        Returns:
+        list: The evicted tables.
+        """
+        evicted = []
+        with self.lock:
+            protected = set(protected) | set(self.pinned)
+            for table_name in list(self.tables):
+                if table_name in protected:
+                    continue
+                reason = self._eviction_reason(table_name, after_use)
+                if reason:
+                    logger.info(f"Evicting table '{table_name}': {reason}.")
+                    self.evict(table_name)
+                    evicted.append(table_name)
+
+            self._enforce_memory_budget(protected, evicted)
+        return evicted
+
+    def _enforce_memory_budget(self, protected: set, evicted: list):
+        if self.memory_budget_bytes is None:
+            return
+        protected = protected | set(self.pinned)
+        least_recently_used = sorted((entry['last_access'], table_name) for table_name, entry in self.tables.items()
+                                     if table_name not in protected and not self.is_kept(table_name))
+        for _, table_name in least_recently_used:
+            if self.total_bytes() <= self.memory_budget_bytes:
+                break
+            logger.info(f"Evicting table '{table_name}': memory budget of {self.memory_budget_bytes} bytes exceeded.")
+            self.evict(table_name)
+            evicted.append(table_name)
+
+    def _eviction_reason(self, table_name: str, after_use: bool) -> str:
+        config = self.config_for(table_name)
+        entry = self.tables[table_name]
+
+        cache_duration = config.get("cache_duration")
+        if cache_duration and self.minutes_since_load(table_name) > cache_duration:
+            return f"cache duration of {cache_duration} minutes elapsed"
+        row_limit = config.get("row_limit")
+        if row_limit and entry['rows'] > row_limit:
+            return f"row limit of {row_limit} exceeded"
+        if after_use and config.get("drop_after_use", False):
+            return "dropped after use"
+        return None
+
+    def _estimate_size(self, table_name: str) -> tuple:
+        """The (rows, uncompressed bytes) of a table from DuckDB's catalog."""
+        tables = self.db.conn.execute(
+            "SELECT estimated_size FROM duckdb_tables() WHERE table_name = ?", (table_name,)).fetchall()
+        if not tables:
+            return 0, 0
+        rows = tables[0][0]
+        column_types = self.db.conn.execute(
+            "SELECT data_type FROM duckdb_columns() WHERE table_name = ?", (table_name,)).fetchall()
+        row_bytes = sum(COLUMN_TYPE_BYTES.get(data_type, DEFAULT_COLUMN_TYPE_BYTES) for (data_type,) in column_types)
+        return rows, rows * row_bytes
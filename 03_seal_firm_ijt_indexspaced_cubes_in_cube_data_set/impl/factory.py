@@ -1,12 +1,17 @@
 # factory.py
 
 from impl.db.datasource import DuckDBDataSource
-from impl.repository.clicks_repository import ClicksRepository
+from impl.repository.click_cube_repository import ClickCubeRepository, DEFAULT_CLICK_CUBE_TABLE
+from impl.repository.clicks_repository import ClicksRepository, DEFAULT_CLICKS_TABLE
 from impl.repository.filtered_retailer_names_repository import FilteredRetailerNamesRepository
-from impl.repository.offers_repository import OffersRepository
+from impl.repository.offer_coverage_repository import OfferCoverageRepository, DEFAULT_OFFER_COVERAGE_TABLE
+from impl.repository.offers_repository import OffersRepository, DEFAULT_OFFERS_TABLE
+from impl.repository.retailer_dictionary_repository import RetailerDictionaryRepository
 from impl.repository.seal_change_firms_repository import SealChangeFirmsDataRepository
+from impl.service.click_cube_service import ClickCubeService
 from impl.service.clicks_service import ClicksService
 from impl.service.mean_imputation_service import MeanImputationService
+from impl.service.offer_coverage_service import OfferCoverageService
 from impl.service.offers_service import OffersService
 
 
@@ -28,23 +33,45 @@ class Factory:
 
 # Services
     @staticmethod
-    def create_clicks_service() -> ClicksService:
+    def create_clicks_service(table_name: str = DEFAULT_CLICKS_TABLE) -> ClicksService:
         """
         Create and return a singleton instance of ClicksService with its dependencies injected.
+        The table name is only applied on first creation (e.g. a worker process namespaced table).
         """
         db_source = Factory.get_main_db_source()
-        repository = ClicksRepository(db_source)
+        repository = ClicksRepository(db_source, table_name)
         return ClicksService(repository)
 
     @staticmethod
-    def create_offers_service() -> OffersService:
+    def create_click_cube_service(table_name: str = DEFAULT_CLICK_CUBE_TABLE) -> ClickCubeService:
+        """
+        Create and return a singleton instance of ClickCubeService with its dependencies injected.
+        The table name is only applied on first creation.
+        """
+        db_source = Factory.get_main_db_source()
+        repository = ClickCubeRepository(db_source, table_name)
+        return ClickCubeService(repository)
+
+    @staticmethod
+    def create_offers_service(table_name: str = DEFAULT_OFFERS_TABLE) -> OffersService:
         """
         Create and return a singleton instance of OffersService with its dependencies injected.
+        The table name is only applied on first creation (e.g. a worker process namespaced table).
         """
         db_source = Factory.get_main_db_source()
-        repository = OffersRepository(db_source)
+        repository = OffersRepository(db_source, table_name)
         return OffersService(repository)
 
+    @staticmethod
+    def create_offer_coverage_service(table_name: str = DEFAULT_OFFER_COVERAGE_TABLE) -> OfferCoverageService:
+        """
+        Create and return a singleton instance of OfferCoverageService with its dependencies injected.
+        The table name is only applied on first creation.
+        """
+        db_source = Factory.get_main_db_source()
+        repository = OfferCoverageRepository(db_source, table_name)
+        return OfferCoverageService(repository)
+
     @staticmethod
     def create_mean_imputation_service() -> MeanImputationService:
         """
@@ -69,3 +96,11 @@ class Factory:
         """
         db_source = Factory.get_main_db_source()
         return SealChangeFirmsDataRepository(db_source)
+
+    @staticmethod
+    def create_retailer_dictionary_repository() -> RetailerDictionaryRepository:
+        """
+        Create and return a singleton instance of RetailerDictionaryRepository.
+        """
+        db_source = Factory.get_main_db_source()
+        return RetailerDictionaryRepository(db_source)
@@ -101,6 +101,29 @@ def get_start_of_week(date, week_start_day=0):
     return start_of_week.replace(hour=0, minute=0, second=0, microsecond=0)
 
 
+def get_continuous_offering_period(seal_date_str: str, weeks: int) -> tuple:
+    """
+    Get the (naive, local) start of the week the given number of weeks before and after the seal week.
+
+    Parameters:
+    seal_date_str (str): The seal date as a string.
+    weeks (int): The number of weeks around the seal date.
+
+    Returns:
+    tuple: (offered_period_start, offered_period_end) as datetimes.
+    """
+    seal_date = date_to_unix_time(seal_date_str)
+    seal_date_start_of_week = get_start_of_week(dt.datetime.fromtimestamp(seal_date))
+
+    return (seal_date_start_of_week - dt.timedelta(weeks=weeks),
+            seal_date_start_of_week + dt.timedelta(weeks=weeks))
+
+
+def to_wall_clock_seconds(date: dt.datetime) -> int:
+    """The seconds since 1970-01-01 of a naive (local) datetime, i.e. without any time zone or DST shift."""
+    return int((date - dt.datetime(1970, 1, 1)).total_seconds())
+
+
 @lru_cache(maxsize=None)
 def get_unix_offer_data_inflow_time_range_from_seal_date(seal_date_str: str):
     seal_date = date_to_unix_time(seal_date_str)
@@ -0,0 +1,48 @@
+import logging
+
+import pyarrow as pa
+
+from impl.db.datasource import DuckDBDataSource
+from impl.db.simple_sql_base_query_builder import SimpleSQLBaseQueryBuilder
+from impl.repository.base.abc_repository import AbstractBaseRepository
+from impl.repository.retailer_dictionary_repository import RetailerDictionaryRepository
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CLICK_CUBE_TABLE = 'click_cube'
+
+
+class ClickCubeRepository(AbstractBaseRepository):
+    """
+    Answers click questions from the weekly click counts of the click cube (see build_click_cube)
+    instead of the click events.
+    """
+
+    def __init__(self, db_source: DuckDBDataSource, table_name: str = DEFAULT_CLICK_CUBE_TABLE):
+        super().__init__(db_source, table_name)
+        self.retailer_dictionary = RetailerDictionaryRepository(db_source)
+
+    def fetch_top_products_by_clicks(self, retailer: str, lower_week: int, upper_week: int, limit: int) -> pa.Table:
+        """
+        Fetch the top products by clicks for a given retailer and week range.
+
+        Parameters:
+        retailer (str): The retailer's name (haendler_bez).
+        lower_week (int): The first week_running_var of the range.
+        upper_week (int): The last week_running_var of the range.
+        limit (int): The maximum number of products to return.
+
+        Returns:
+        pa.Table: An Arrow table containing the top products and their total clicks.
+        """
+        query = (
+            SimpleSQLBaseQueryBuilder(self.table_name)
+            .select(['produkt_id', 'SUM(clicks) AS total_clicks'])
+            .where(f"haendler_id = {self.retailer_dictionary.fetch_retailer_id(retailer)}")
+            .where(f"week_running_var BETWEEN {lower_week} AND {upper_week}")
+            .group_by('produkt_id')
+            .order_by('total_clicks DESC, produkt_id')
+            .limit(limit)
+            .build()
+        )
+        return self.db_source.queryAsArrow(query)
@@ -1,20 +1,24 @@
 import logging
 
 import polars as pl
+import pyarrow as pa
 
 from impl.db.datasource import DuckDBDataSource
 from impl.db.simple_sql_base_query_builder import SimpleSQLBaseQueryBuilder
 from impl.repository.base.abc_repository import AbstractBaseRepository
+from impl.repository.retailer_dictionary_repository import RetailerDictionaryRepository, RETAILER_DICTIONARY_TABLE
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_CLICKS_TABLE = 'clicks'
+SEAL_FIRM_WINDOWS_VIEW = 'seal_firm_windows'
 
 
 class ClicksRepository(AbstractBaseRepository):
 
     def __init__(self, db_source: DuckDBDataSource, table_name: str = DEFAULT_CLICKS_TABLE):
         super().__init__(db_source, table_name)
+        self.retailer_dictionary = RetailerDictionaryRepository(db_source)
 
     def fetch_top_products_by_clicks(
         self,
@@ -22,9 +26,9 @@ class ClicksRepository(AbstractBaseRepository):
         start_time_unix: int,
         end_time_unix: int,
         limit: int
-    ) -> pl.DataFrame:
+    ) -> pa.Table:
         """
-        Fetch the top products by clicks for a given retailer and time range.
+        Fetch the top products by clicks for a given retailer and time range. Ties are broken by produkt_id.
 
         Parameters:
         retailer (str): The retailer's name (haendler_bez).
@@ -33,16 +37,68 @@ class ClicksRepository(AbstractBaseRepository):
         limit (int): The maximum number of products to return.
 
         Returns:
-        pl.DataFrame: A Polars DataFrame containing the top products and their total clicks.
+        pa.Table: An Arrow table containing the top products and their total clicks.
         """
         query = (
             SimpleSQLBaseQueryBuilder(self.table_name)
             .select(['produkt_id', 'COUNT(*) AS total_clicks'])
-            .where(f"haendler_bez = '{retailer}'")
+            .where(f"haendler_id = {self.retailer_dictionary.fetch_retailer_id(retailer)}")
             .where(f"timestamp >= {start_time_unix} AND timestamp <= {end_time_unix}")
             .group_by('produkt_id')
-            .order_by('total_clicks', ascending=False)
+            .order_by('total_clicks DESC, produkt_id')
             .limit(limit)
             .build()
         )
-        return self.db_source.queryAsPl(query)
+        return self.db_source.queryAsArrow(query)
+
+    def fetch_top_products_by_clicks_per_seal_firm(self, seal_windows: pl.DataFrame, limit: int) -> pl.DataFrame:
+        """
+        Fetch the top products by clicks of many seal firms at once, each within its own time range,
+        ranked with ROW_NUMBER() per (haendler_bez, seal_date). Ties are broken by produkt_id.
+
+        Parameters:
+        seal_windows (pl.DataFrame): The seal firms with the columns haendler_bez, seal_date,
+        start_time_unix and end_time_unix.
+        limit (int): The maximum number of products per seal firm.
+
+        Returns:
+        pl.DataFrame: A Polars DataFrame with the columns haendler_bez, seal_date, produkt_id, total_clicks and
+        Top200rank_ij (1..limit), ordered by seal firm and rank.
+        """
+        firm_clicks_query = (
+            SimpleSQLBaseQueryBuilder(f"{SEAL_FIRM_WINDOWS_VIEW} w")
+            .select(['w.haendler_bez', 'w.seal_date', 'c.produkt_id', 'COUNT(*) AS total_clicks'])
+            .join('INNER', f"{RETAILER_DICTIONARY_TABLE} rd", "rd.haendler_bez = w.haendler_bez")
+            .join('INNER', f"{self.table_name} c", "c.haendler_id = rd.haendler_id "
+                                                   "AND c.timestamp >= w.start_time_unix "
+                                                   "AND c.timestamp <= w.end_time_unix")
+            .group_by(['w.haendler_bez', 'w.seal_date', 'c.produkt_id'])
+            .build()
+        )
+        return self._rank_per_seal_firm(firm_clicks_query, seal_windows, limit)
+
+    def _rank_per_seal_firm(self, firm_clicks_query: str, seal_windows: pl.DataFrame, limit: int) -> pl.DataFrame:
+        ranked_query = (
+            SimpleSQLBaseQueryBuilder('firm_clicks')
+            .select([
+                'haendler_bez', 'seal_date', 'produkt_id', 'total_clicks',
+                "ROW_NUMBER() OVER (PARTITION BY haendler_bez, seal_date "
+                "ORDER BY total_clicks DESC, produkt_id) AS Top200rank_ij"
+            ])
+            .build()
+        )
+        query = (
+            SimpleSQLBaseQueryBuilder('ranked')
+            .with_cte('firm_clicks', firm_clicks_query)
+            .with_cte('ranked', ranked_query)
+            .select(['haendler_bez', 'seal_date', 'produkt_id', 'total_clicks', 'Top200rank_ij'])
+            .where(f"Top200rank_ij <= {limit}")
+            .order_by('haendler_bez, seal_date, Top200rank_ij')
+            .build()
+        )
+
+        self.db_source.register(SEAL_FIRM_WINDOWS_VIEW, seal_windows)
+        try:
+            return self.db_source.queryAsPl(query)
+        finally:
+            self.db_source.unregister(SEAL_FIRM_WINDOWS_VIEW)
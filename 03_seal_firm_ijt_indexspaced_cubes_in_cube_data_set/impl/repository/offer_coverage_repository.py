@@ -0,0 +1,69 @@
+import datetime as dt
+import logging
+
+import pyarrow as pa
+
+from CONFIG import UNIX_TIME_ORIGIN, UNIX_WEEK, WEEK_RUNNING_VAR_MIN, WEEK_RUNNING_VAR_MAX
+from impl.db.datasource import DuckDBDataSource
+from impl.db.simple_sql_base_query_builder import SimpleSQLBaseQueryBuilder
+from impl.helpers import get_start_of_week, to_wall_clock_seconds
+from impl.repository.base.abc_repository import AbstractBaseRepository
+from impl.repository.retailer_dictionary_repository import RetailerDictionaryRepository
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OFFER_COVERAGE_TABLE = 'offer_coverage'
+
+# The local Monday 00:00 of the week of UNIX_TIME_ORIGIN in wall clock seconds, i.e. the start of week t = 0
+WEEK_ORIGIN_WALL = to_wall_clock_seconds(
+    get_start_of_week(dt.datetime.fromtimestamp(UNIX_TIME_ORIGIN + UNIX_WEEK // 2)))
+# The wall clock start of the first and the end of the last week of the bitmaps, bit 0 is week WEEK_RUNNING_VAR_MIN
+INDEX_START_WALL = WEEK_ORIGIN_WALL + WEEK_RUNNING_VAR_MIN * UNIX_WEEK
+INDEX_END_WALL = WEEK_ORIGIN_WALL + (WEEK_RUNNING_VAR_MAX + 1) * UNIX_WEEK - 1
+INDEX_WEEK_COUNT = WEEK_RUNNING_VAR_MAX - WEEK_RUNNING_VAR_MIN + 1
+
+
+class OfferCoverageRepository(AbstractBaseRepository):
+    """
+    Answers offer coverage questions with bit operations on the weekly bitmaps of the offer coverage index
+    (see build_offer_coverage_index) instead of stepping the offer spells.
+    """
+
+    def __init__(self, db_source: DuckDBDataSource, table_name: str = DEFAULT_OFFER_COVERAGE_TABLE):
+        super().__init__(db_source, table_name)
+        self.retailer_dictionary = RetailerDictionaryRepository(db_source)
+
+    def fetch_products_weekly_coverage(self, product_ids: list, retailer: str, period_start_wall: int,
+                                       period_end_wall: int) -> pa.Table:
+        """
+        Fetch, for many products of a retailer at once, the number of distinct weeks of a period in which an offer
+        spell step falls, as OffersRepository#fetch_products_weekly_coverage: the weeks from the start of the period
+        up to the last week count if they hold a step, the last week only if a step falls on its very start.
+
+        Parameters:
+        product_ids (list): The product IDs to compute the coverage for.
+        retailer (str): The retailer (firm) to filter by.
+        period_start_wall (int): The wall clock start of the period (start of the first week).
+        period_end_wall (int): The wall clock end of the period (start of the last week).
+
+        Returns:
+        pa.Table: An Arrow table with the columns produkt_id and offered_weeks, one row per product with bitmaps.
+        """
+        first_week = (period_start_wall - INDEX_START_WALL) // UNIX_WEEK
+        last_week = (period_end_wall - INDEX_START_WALL) // UNIX_WEEK
+
+        # Weeks outside of the bitmaps count as not offered
+        mask = ''.join('1' if first_week <= week < last_week else '0' for week in range(INDEX_WEEK_COUNT))
+        last_week_start_step = (f"get_bit(week_start_steps, {last_week})" if 0 <= last_week < INDEX_WEEK_COUNT
+                                else "0")
+
+        product_id_list = ", ".join(f"'{product_id}'" for product_id in product_ids)
+        query = (
+            SimpleSQLBaseQueryBuilder(self.table_name)
+            .select(['produkt_id',
+                     f"bit_count(offered_weeks & '{mask}'::BITSTRING) + {last_week_start_step} AS offered_weeks"])
+            .where(f"produkt_id IN ({product_id_list})")
+            .where(f"haendler_id = {self.retailer_dictionary.fetch_retailer_id(retailer)}")
+            .build()
+        )
+        return self.db_source.queryAsArrow(query)
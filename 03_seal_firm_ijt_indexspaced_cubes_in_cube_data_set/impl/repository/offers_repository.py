@@ -1,21 +1,28 @@
 import logging
 
 import polars as pl
+import pyarrow as pa
 
+from CONFIG import UNIX_TIME_ORIGIN, UNIX_WEEK
 from impl.db.datasource import DuckDBDataSource
 from impl.db.simple_sql_base_query_builder import SimpleSQLBaseQueryBuilder
 from impl.repository.base.abc_repository import AbstractBaseRepository
+from impl.repository.retailer_dictionary_repository import RetailerDictionaryRepository, RETAILER_DICTIONARY_TABLE
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_OFFERS_TABLE = 'angebot'
+INDEX_SPACE_TASKS_VIEW = 'index_space_tasks'
+COUNTERFACTUAL_SEAL_FIRMS_VIEW = 'counterfactual_seal_firms'
+COUNTERFACTUAL_ALLOWED_FIRMS_VIEW = 'counterfactual_allowed_firms'
 
 
 class OffersRepository(AbstractBaseRepository):
     def __init__(self, db_source: DuckDBDataSource, table_name: str = DEFAULT_OFFERS_TABLE):
         super().__init__(db_source, table_name)
+        self.retailer_dictionary = RetailerDictionaryRepository(db_source)
 
-    def fetch_offered_weeks(self, product_id: str, firm_id: str, time_range_start: int, time_range_end: int) -> pl.DataFrame:
+    def fetch_offered_weeks(self, product_id: str, firm_id: str, time_range_start: int, time_range_end: int) -> pa.Table:
         """
         Fetch the weeks during which a product was offered by a firm within a specific time range.
 
@@ -26,15 +33,70 @@ class OffersRepository(AbstractBaseRepository):
         time_range_end (int): The end of the time range (Unix timestamp).
 
         Returns:
-        pl.DataFrame: A Polars DataFrame containing the offered weeks.
+        pa.Table: An Arrow table with the columns produkt_id, haendler_id, dtimebegin and dtimeend of the offer spells.
         """
         query = (
             SimpleSQLBaseQueryBuilder(self.table_name)
-            .select(['produkt_id', 'haendler_bez', 'dtimebegin', 'dtimeend'])
-            .build_ijt_where_clause(product_id, firm_id, time_range_start, time_range_end)
+            .select(['produkt_id', 'haendler_id', 'dtimebegin', 'dtimeend'])
+            .build_ijt_where_clause(product_id, None, time_range_start, time_range_end,
+                                    haendler_id=self.retailer_dictionary.fetch_retailer_id(firm_id))
             .build()
         )
-        return self.db_source.queryAsPl(query)
+        return self.db_source.queryAsArrow(query)
+
+    def fetch_offered_weeks_block(self, tasks: pl.DataFrame, time_range_start: int, time_range_end: int,
+                                  lower_week: int, upper_week: int) -> pl.DataFrame:
+        """
+        Fetch the offered weeks of many (product, firm) tasks in one set-based query.
+        Offer spells are clipped to the time range and expanded into weekly steps with range/unnest,
+        mirroring the week walk of OffersService#get_offered_weeks.
+
+        Parameters:
+        tasks (pl.DataFrame): The tasks with the columns produkt_id, haendler_bez and firm_has_seal_j.
+        time_range_start (int): The start of the time range (Unix timestamp).
+        time_range_end (int): The end of the time range (Unix timestamp).
+        lower_week (int): The lowest week_running_var to keep.
+        upper_week (int): The highest week_running_var to keep.
+
+        Returns:
+        pl.DataFrame: A Polars DataFrame with one row per task and offered week, ordered by task and week.
+        """
+        spell_weeks_query = (
+            SimpleSQLBaseQueryBuilder(f"{INDEX_SPACE_TASKS_VIEW} t")
+            .select([
+                't.task_id', 't.produkt_id', 't.haendler_bez', 't.firm_has_seal_j',
+                f"unnest(range(greatest(a.dtimebegin, {time_range_start}), "
+                f"least(a.dtimeend, {time_range_end}) + 1, {UNIX_WEEK})) AS week_unix"
+            ])
+            .join('INNER', f"{RETAILER_DICTIONARY_TABLE} rd", "rd.haendler_bez = t.haendler_bez")
+            .join('INNER', f"{self.table_name} a", "a.produkt_id = t.produkt_id AND a.haendler_id = rd.haendler_id")
+            .where(f"a.dtimebegin <= {time_range_end} AND a.dtimeend >= {time_range_start}")
+            .build()
+        )
+        task_weeks_query = (
+            SimpleSQLBaseQueryBuilder('spell_weeks')
+            .select([
+                'task_id', 'produkt_id', 'haendler_bez', 'firm_has_seal_j',
+                f"CAST(trunc((week_unix - {UNIX_TIME_ORIGIN}) / {UNIX_WEEK}) AS BIGINT) AS week_running_var"
+            ])
+            .build()
+        )
+        query = (
+            SimpleSQLBaseQueryBuilder('task_weeks')
+            .with_cte('spell_weeks', spell_weeks_query)
+            .with_cte('task_weeks', task_weeks_query)
+            .select(['task_id', 'produkt_id', 'haendler_bez', 'week_running_var', 'firm_has_seal_j'])
+            .distinct()
+            .where(f"week_running_var BETWEEN {lower_week} AND {upper_week}")
+            .order_by('task_id, week_running_var')
+            .build()
+        )
+
+        self.db_source.register(INDEX_SPACE_TASKS_VIEW, tasks.with_row_index('task_id'))
+        try:
+            return self.db_source.queryAsPl(query).drop('task_id')
+        finally:
+            self.db_source.unregister(INDEX_SPACE_TASKS_VIEW)
 
     def fetch_all_counterfactual_firms_by_product_and_timestamps(
             self,
@@ -51,15 +113,74 @@ class OffersRepository(AbstractBaseRepository):
         pl.DataFrame: A Polars DataFrame containing the distinct firms.
         """
         query = (
-            SimpleSQLBaseQueryBuilder(self.table_name)
-            .select('haendler_bez')
+            SimpleSQLBaseQueryBuilder(f"{self.table_name} a")
+            .select('rd.haendler_bez')
             .distinct()
-            .where(f"produkt_id = '{product_id}'")
-            .where(f"dtimebegin <= {seal_date_unix} AND dtimeend >= {seal_date_unix}")
+            .join('INNER', f"{RETAILER_DICTIONARY_TABLE} rd", "rd.haendler_id = a.haendler_id")
+            .where(f"a.produkt_id = '{product_id}'")
+            .where(f"a.dtimebegin <= {seal_date_unix} AND a.dtimeend >= {seal_date_unix}")
             .build()
         )
         return self.db_source.queryAsPl(query)
 
+    def fetch_counterfactual_firms_sample_by_products(self, product_ids: list, seal_date_unix: int,
+                                                      seal_firms: pl.Series, allowed_firms: pl.Series,
+                                                      n: int, seed: int) -> pa.Table:
+        """
+        Fetch a deterministic sample of at most n counterfactual firms per product, for many products at once.
+        Candidates are the allowed, non seal firms offering the product at the seal date. They are ranked by
+        md5(seed|produkt_id|haendler_bez), so the sample only depends on its inputs (no RNG state).
+
+        Parameters:
+        product_ids (list): The product IDs to sample counterfactual firms for.
+        seal_date_unix (int): The Unix timestamp representing the seal date.
+        seal_firms (pl.Series): The seal firms to exclude.
+        allowed_firms (pl.Series): The firms allowed as counterfactual firms.
+        n (int): The maximum number of firms per product.
+        seed (int): The seed of the hash based ranking.
+
+        Returns:
+        pa.Table: An Arrow table with the columns produkt_id, haendler_bez and sample_rank (1..n).
+        """
+        product_id_list = ", ".join(f"'{product_id}'" for product_id in product_ids)
+        candidates_query = (
+            SimpleSQLBaseQueryBuilder(f"{self.table_name} a")
+            .select(['a.produkt_id', 'rd.haendler_bez'])
+            .distinct()
+            .join('INNER', f"{RETAILER_DICTIONARY_TABLE} rd", "rd.haendler_id = a.haendler_id")
+            .where(f"a.produkt_id IN ({product_id_list})")
+            .where(f"a.dtimebegin <= {seal_date_unix} AND a.dtimeend >= {seal_date_unix}")
+            .where(f"EXISTS (SELECT 1 FROM {COUNTERFACTUAL_ALLOWED_FIRMS_VIEW} af WHERE af.haendler_bez = rd.haendler_bez)")
+            .where(f"NOT EXISTS (SELECT 1 FROM {COUNTERFACTUAL_SEAL_FIRMS_VIEW} sf WHERE sf.haendler_bez = rd.haendler_bez)")
+            .build()
+        )
+        ranked_query = (
+            SimpleSQLBaseQueryBuilder('candidates')
+            .select([
+                'produkt_id', 'haendler_bez',
+                f"ROW_NUMBER() OVER (PARTITION BY produkt_id ORDER BY md5(concat_ws('|', '{seed}', "
+                f"CAST(produkt_id AS VARCHAR), haendler_bez)), haendler_bez) AS sample_rank"
+            ])
+            .build()
+        )
+        query = (
+            SimpleSQLBaseQueryBuilder('ranked')
+            .with_cte('candidates', candidates_query)
+            .with_cte('ranked', ranked_query)
+            .select(['produkt_id', 'haendler_bez', 'sample_rank'])
+            .where(f"sample_rank <= {n}")
+            .order_by('produkt_id, sample_rank')
+            .build()
+        )
+
+        self.db_source.register(COUNTERFACTUAL_SEAL_FIRMS_VIEW, pl.DataFrame({'haendler_bez': seal_firms}))
+        self.db_source.register(COUNTERFACTUAL_ALLOWED_FIRMS_VIEW, pl.DataFrame({'haendler_bez': allowed_firms}))
+        try:
+            return self.db_source.queryAsArrow(query)
+        finally:
+            self.db_source.unregister(COUNTERFACTUAL_SEAL_FIRMS_VIEW)
+            self.db_source.unregister(COUNTERFACTUAL_ALLOWED_FIRMS_VIEW)
+
     def fetch_product_offer_data(self, product_id: str, retailer: str, offer_start_unix: int, offer_end_unix: int) -> pl.DataFrame:
         """
         Fetch offer data for a product from a specific retailer within a time range.
@@ -77,13 +198,65 @@ class OffersRepository(AbstractBaseRepository):
             SimpleSQLBaseQueryBuilder(self.table_name)
             .select(['dtimebegin', 'dtimeend'])
             .where(f"produkt_id = '{product_id}'")
-            .where(f"haendler_bez = '{retailer}'")
+            .where(f"haendler_id = {self.retailer_dictionary.fetch_retailer_id(retailer)}")
             .where(f"dtimebegin <= {offer_end_unix} AND dtimeend >= {offer_start_unix}")
             .build()
         )
         return self.db_source.queryAsPl(query)
 
-    def fetch_random_products(self, retailer: str, observation_start_unix: int, observation_end_unix: int) -> pl.DataFrame:
+    def fetch_products_weekly_coverage(self, product_ids: list, retailer: str, offer_start_unix: int,
+                                       offer_end_unix: int, period_start_wall: int, period_end_wall: int) -> pa.Table:
+        """
+        Fetch, for many products of a retailer at once, the number of distinct weeks of a period in which an offer
+        spell (stepped in weekly increments from its begin) falls, mirroring OffersService#is_product_continuously_offered.
+        The wall clock bounds are seconds since 1970-01-01 of the naive local datetimes, the spells are converted
+        with DuckDB's TimeZone setting, which like datetime.fromtimestamp defaults to the system time zone.
+
+        Parameters:
+        product_ids (list): The product IDs to compute the coverage for.
+        retailer (str): The retailer (firm) to filter by.
+        offer_start_unix (int): The Unix timestamp representing the offer start time.
+        offer_end_unix (int): The Unix timestamp representing the offer end time.
+        period_start_wall (int): The wall clock start of the period (start of the first week).
+        period_end_wall (int): The wall clock end of the period (start of the last week).
+
+        Returns:
+        pa.Table: An Arrow table with the columns produkt_id and offered_weeks, one row per covered product.
+        """
+        product_id_list = ", ".join(f"'{product_id}'" for product_id in product_ids)
+        spells_query = (
+            SimpleSQLBaseQueryBuilder(self.table_name)
+            .select([
+                'produkt_id',
+                'CAST(epoch(CAST(to_timestamp(dtimebegin) AS TIMESTAMP)) AS BIGINT) AS begin_wall',
+                'CAST(epoch(CAST(to_timestamp(dtimeend) AS TIMESTAMP)) AS BIGINT) AS end_wall'
+            ])
+            .where(f"produkt_id IN ({product_id_list})")
+            .where(f"haendler_id = {self.retailer_dictionary.fetch_retailer_id(retailer)}")
+            .where(f"dtimebegin <= {offer_end_unix} AND dtimeend >= {offer_start_unix}")
+            .build()
+        )
+        # First weekly step of a spell within the period, then all steps up to the spell or period end.
+        steps_query = (
+            SimpleSQLBaseQueryBuilder('spells')
+            .select([
+                'produkt_id',
+                f"unnest(range(begin_wall + greatest(0, CAST(ceil(({period_start_wall} - begin_wall) / {UNIX_WEEK}) "
+                f"AS BIGINT)) * {UNIX_WEEK}, least(end_wall, {period_end_wall}) + 1, {UNIX_WEEK})) AS step_wall"
+            ])
+            .build()
+        )
+        query = (
+            SimpleSQLBaseQueryBuilder('steps')
+            .with_cte('spells', spells_query)
+            .with_cte('steps', steps_query)
+            .select(['produkt_id', f"COUNT(DISTINCT (step_wall - {period_start_wall}) // {UNIX_WEEK}) AS offered_weeks"])
+            .group_by('produkt_id')
+            .build()
+        )
+        return self.db_source.queryAsArrow(query)
+
+    def fetch_random_products(self, retailer: str, observation_start_unix: int, observation_end_unix: int) -> pa.Table:
         """
         Fetch distinct random products offered by a specific retailer within a time range.
 
@@ -93,14 +266,14 @@ class OffersRepository(AbstractBaseRepository):
         observation_end_unix (int): The Unix timestamp representing the observation end time.
 
         Returns:
-        pl.DataFrame: A Polars DataFrame containing the distinct product IDs.
+        pa.Table: An Arrow table with the column produkt_id of the distinct products.
         """
         query = (
             SimpleSQLBaseQueryBuilder(self.table_name)
             .select('produkt_id')
             .distinct()
-            .where(f"haendler_bez = '{retailer}'")
+            .where(f"haendler_id = {self.retailer_dictionary.fetch_retailer_id(retailer)}")
             .where(f"dtimebegin <= {observation_end_unix} AND dtimeend >= {observation_start_unix}")
             .build()
         )
-        return self.db_source.queryAsPl(query)
+        return self.db_source.queryAsArrow(query)
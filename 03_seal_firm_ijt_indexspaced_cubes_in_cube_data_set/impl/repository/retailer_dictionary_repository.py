@@ -0,0 +1,65 @@
+import logging
+
+import polars as pl
+
+from impl.db.datasource import DuckDBDataSource
+from impl.db.simple_sql_base_query_builder import SimpleSQLBaseQueryBuilder
+from impl.repository.base.abc_repository import AbstractBaseRepository
+
+logger = logging.getLogger(__name__)
+
+RETAILER_DICTIONARY_TABLE = 'retailer_dictionary'
+UNKNOWN_RETAILER_ID = -1  # never assigned, matches no row
+
+
+class RetailerDictionaryRepository(AbstractBaseRepository):
+    """
+    Maps retailer names (haendler_bez) to the dense integer ids (haendler_id) the inflow tables are keyed by.
+    """
+
+    def __init__(self, db_source: DuckDBDataSource, table_name: str = RETAILER_DICTIONARY_TABLE):
+        super().__init__(db_source, table_name)
+
+    def fetch_retailer_id(self, retailer: str) -> int:
+        """
+        Fetch the id of a retailer from the name to id map of the dictionary, which is read once per connection
+        and kept until the dictionary is rebuilt (see clear_retailer_ids).
+
+        Parameters:
+        retailer (str): The retailer's name (haendler_bez).
+
+        Returns:
+        int: The haendler_id of the retailer, or UNKNOWN_RETAILER_ID if it is not in the dictionary.
+        """
+        return self._retailer_ids().get(retailer, UNKNOWN_RETAILER_ID)
+
+    def clear_retailer_ids(self):
+        """
+        Forget the cached name to id map, e.g. after the dictionary has been rebuilt.
+        """
+        self._retailer_id_cache = None
+
+    def _retailer_ids(self) -> dict:
+        # Kept on the connection it was read from, a reconnected data source reads the map again
+        cache = getattr(self, '_retailer_id_cache', None)
+        if cache is None or cache[0] is not self.db_source.conn:
+            dictionary = self.fetch_all()
+            cache = (self.db_source.conn,
+                     dict(zip(dictionary['haendler_bez'].to_list(), dictionary['haendler_id'].to_list())))
+            self._retailer_id_cache = cache
+        return cache[1]
+
+    def fetch_all(self) -> pl.DataFrame:
+        """
+        Fetch the whole dictionary.
+
+        Returns:
+        pl.DataFrame: A Polars DataFrame with the columns haendler_id and haendler_bez, ordered by haendler_id.
+        """
+        query = (
+            SimpleSQLBaseQueryBuilder(self.table_name)
+            .select(['haendler_id', 'haendler_bez'])
+            .order_by('haendler_id')
+            .build()
+        )
+        return self.db_source.queryAsPl(query)
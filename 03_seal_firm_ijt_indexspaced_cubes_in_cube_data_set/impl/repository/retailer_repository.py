@@ -40,10 +40,9 @@ class RetailerRepository(AbstractBaseRepository):
         Returns:
         pl.DataFrame: A Polars DataFrame containing the retailer's details.
         """
-        query = (
+        query_builder = (
             SimpleSQLBaseQueryBuilder(self.table_name)
             .select('*')
-            .where(f"haendler_bez = '{retailer_id}'")
-            .build()
+            .where("haendler_bez = ?", retailer_id)
         )
-        return self.db_source.queryAsPl(query)
+        return self.db_source.queryAsPl(query_builder.build(), query_builder.build_params())
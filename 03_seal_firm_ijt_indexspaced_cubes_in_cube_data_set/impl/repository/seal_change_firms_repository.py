@@ -25,13 +25,12 @@ class SealChangeFirmsDataRepository(AbstractBaseRepository):
         Returns:
         pl.DataFrame: A Polars DataFrame containing the matching seal change firms.
         """
-        query = (
+        query_builder = (
             SimpleSQLBaseQueryBuilder(self.table_name)
             .select('*')
-            .where(f"matched_haendler_bez = '{retailer_name}'")
-            .build()
+            .where("matched_haendler_bez = ?", retailer_name)
         )
-        return self.db_source.queryAsPl(query)
+        return self.db_source.queryAsPl(query_builder.build(), query_builder.build_params())
 
     def fetch_all(self) -> pl.DataFrame:
         """
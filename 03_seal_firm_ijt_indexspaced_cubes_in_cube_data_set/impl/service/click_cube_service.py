@@ -0,0 +1,36 @@
+import logging
+
+import CONFIG
+from impl.helpers import calculate_running_var_t_from_u, date_to_unix_time
+from impl.service.base.abc_service import AbstractBaseService
+
+logger = logging.getLogger(__name__)
+
+
+class ClickCubeService(AbstractBaseService):
+    """
+    Top N product selection on the running variable t, answered from the weekly click counts of the click cube.
+    A drop-in replacement of ClicksService that needs no click events loaded.
+    """
+
+    def get_top_n_products_by_clicks(self, haendler_bez: str, seal_date_str: str, top_n: int = CONFIG.TOP_PRODUCTS_OF_SEAL_CHANGE_FIRM_BY_CLICKS_AMOUNT) -> list:
+        """
+        Retrieve the top N products by clicks for a given retailer in the weeks t of the seal week
+        +- CONFIG.HAS_WEEKS_BEFORE_AND_AFTER_PRODUCT_ANGEBOTEN_AMOUNT.
+
+        Parameters:
+        haendler_bez (str): The retailer name (haendler_bez) to filter by.
+        seal_date_str (str): The seal date string in the format defined by CONFIG.SEAL_CHANGE_DATE_PATTERN.
+        top_n (int, optional): The number of top products to return. Defaults to CONFIG.TOP_PRODUCTS_OF_SEAL_CHANGE_FIRM_BY_CLICKS_AMOUNT.
+
+        Returns:
+        list: A list of product IDs sorted by the number of clicks.
+        """
+        seal_week = calculate_running_var_t_from_u(date_to_unix_time(seal_date_str))
+
+        return self.repository.fetch_top_products_by_clicks(
+            haendler_bez,
+            seal_week - CONFIG.HAS_WEEKS_BEFORE_AND_AFTER_PRODUCT_ANGEBOTEN_AMOUNT,
+            seal_week + CONFIG.HAS_WEEKS_BEFORE_AND_AFTER_PRODUCT_ANGEBOTEN_AMOUNT,
+            top_n
+        ).column('produkt_id').to_pylist()
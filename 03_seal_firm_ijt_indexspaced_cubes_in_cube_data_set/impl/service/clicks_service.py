@@ -1,6 +1,8 @@
 import datetime as dt
 import logging
 
+import polars as pl
+
 import CONFIG
 from impl.service.base.abc_service import AbstractBaseService
 
@@ -20,6 +22,59 @@ class ClicksService(AbstractBaseService):
         Returns:
         list: A list of product IDs sorted by the number of clicks.
         """
+        observation_start_unix, observation_end_unix = self._get_observation_window_unix(seal_date_str)
+
+        # Fetch the top products by clicks from the repository
+        result = self.repository.fetch_top_products_by_clicks(
+            haendler_bez, observation_start_unix, observation_end_unix, top_n
+        ).column('produkt_id').to_pylist()
+
+        return result
+
+    def get_top_n_products_by_clicks_per_seal_firm(self, seal_change_firms: pl.DataFrame, top_n: int = CONFIG.TOP_PRODUCTS_OF_SEAL_CHANGE_FIRM_BY_CLICKS_AMOUNT,
+                                                   firm_column: str = 'RESULTING MATCH',
+                                                   seal_date_column: str = 'Guetesiegel First Date') -> pl.DataFrame:
+        """
+        Retrieve the top N products by clicks of all seal firms in one query, each firm within the observation
+        period around its own seal date (as in get_top_n_products_by_clicks).
+
+        Parameters:
+        seal_change_firms (pl.DataFrame): The seal change firms, e.g. SealChangeFirmsDataRepository#fetch_all.
+        top_n (int, optional): The number of top products per seal firm. Defaults to CONFIG.TOP_PRODUCTS_OF_SEAL_CHANGE_FIRM_BY_CLICKS_AMOUNT.
+        firm_column (str, optional): The column holding the seal firm. Defaults to 'RESULTING MATCH'.
+        seal_date_column (str, optional): The column holding the seal date (date or string). Defaults to 'Guetesiegel First Date'.
+
+        Returns:
+        pl.DataFrame: A Polars DataFrame with the columns haendler_bez, seal_date, produkt_id, total_clicks and
+        Top200rank_ij (the rank of product i in firm j's top N list), ordered by seal firm and rank.
+        """
+        seal_firm_keys = list(dict.fromkeys(
+            (row[firm_column], self._seal_date_str(row[seal_date_column]))
+            for row in seal_change_firms.iter_rows(named=True)
+        ))
+        observation_windows = [self._get_observation_window_unix(seal_date_str) for _, seal_date_str in seal_firm_keys]
+
+        seal_windows = pl.DataFrame({
+            'haendler_bez': [haendler_bez for haendler_bez, _ in seal_firm_keys],
+            'seal_date': [seal_date_str for _, seal_date_str in seal_firm_keys],
+            'start_time_unix': [start for start, _ in observation_windows],
+            'end_time_unix': [end for _, end in observation_windows],
+        }, schema={'haendler_bez': pl.Utf8, 'seal_date': pl.Utf8, 'start_time_unix': pl.Int64, 'end_time_unix': pl.Int64})
+
+        return self.repository.fetch_top_products_by_clicks_per_seal_firm(seal_windows, top_n)
+
+    @staticmethod
+    def _get_observation_window_unix(seal_date_str: str) -> tuple:
+        """
+        Get the observation period (seal date +- HAS_WEEKS_BEFORE_AND_AFTER_PRODUCT_ANGEBOTEN_AMOUNT weeks)
+        as Unix timestamps.
+
+        Parameters:
+        seal_date_str (str): The seal date string in the format defined by CONFIG.SEAL_CHANGE_DATE_PATTERN.
+
+        Returns:
+        tuple: (observation_start_unix, observation_end_unix)
+        """
         # Convert the seal date string into a datetime object
         seal_date = dt.datetime.strptime(seal_date_str, CONFIG.SEAL_CHANGE_DATE_PATTERN)
 
@@ -28,12 +83,8 @@ class ClicksService(AbstractBaseService):
         observation_end = seal_date + dt.timedelta(weeks=CONFIG.HAS_WEEKS_BEFORE_AND_AFTER_PRODUCT_ANGEBOTEN_AMOUNT)
 
         # Convert the observation period to Unix timestamps
-        observation_start_unix = int(observation_start.timestamp())
-        observation_end_unix = int(observation_end.timestamp())
+        return int(observation_start.timestamp()), int(observation_end.timestamp())
 
-        # Fetch the top products by clicks from the repository
-        result = self.repository.fetch_top_products_by_clicks(
-            haendler_bez, observation_start_unix, observation_end_unix, top_n
-        ).to_series(0).to_list()
-
-        return result
+    @staticmethod
+    def _seal_date_str(seal_date) -> str:
+        return seal_date if isinstance(seal_date, str) else seal_date.strftime(CONFIG.SEAL_CHANGE_DATE_PATTERN)
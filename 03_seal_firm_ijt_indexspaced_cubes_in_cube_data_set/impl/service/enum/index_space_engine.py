@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class IndexSpaceEngine(Enum):
+    PER_TASK = "per_task"  # -> one offered weeks query per (product, firm) task
+    SET_BASED = "set_based"  # -> one offered weeks query per seal firm covering all of its tasks
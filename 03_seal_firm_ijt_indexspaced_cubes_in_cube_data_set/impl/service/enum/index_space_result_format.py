@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class IndexSpaceResultFormat(Enum):
+    CSV = "csv"  # -> results.csv, parsed row wise by the later steps
+    PARQUET = "parquet"  # -> zstd compressed, typed Parquet dataset partitioned by seal firm
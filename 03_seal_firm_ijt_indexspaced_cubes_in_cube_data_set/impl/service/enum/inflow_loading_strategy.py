@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class InflowLoadingStrategy(Enum):
+    RELOAD = "reload"  # -> drop and reload the whole offer/click inflow window per seal firm
+    SLIDING_WINDOW = "sliding_window"  # -> seal firms in seal date order, only load/evict the differing files
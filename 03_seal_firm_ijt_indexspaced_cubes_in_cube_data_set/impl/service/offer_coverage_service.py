@@ -0,0 +1,49 @@
+import logging
+
+import CONFIG
+from impl.helpers import get_continuous_offering_period, to_wall_clock_seconds
+from impl.service.base.abc_service import AbstractBaseService
+
+logger = logging.getLogger(__name__)
+
+
+class OfferCoverageService(AbstractBaseService):
+    """
+    The continuous offering check, answered from the weekly bitmaps of the offer coverage index.
+    A drop-in replacement of OffersService#filter_continuously_offered_products that steps no offer spells.
+    """
+
+    def filter_continuously_offered_products(self, haendler_bez: str, top_products: list, seal_date_str: str,
+                                             week_amount: int = CONFIG.HAS_WEEKS_BEFORE_AND_AFTER_PRODUCT_ANGEBOTEN_AMOUNT) -> list:
+        """
+        Filter and return products that were continuously offered by a retailer around the seal date,
+        with the results of OffersService#filter_continuously_offered_products.
+
+        Parameters:
+        haendler_bez (str): The retailer name.
+        top_products (list): A list of top products to filter.
+        seal_date_str (str): The seal date as a string.
+        week_amount (int, optional): Number of weeks to check around the seal date. Defaults to CONFIG.HAS_WEEKS_BEFORE_AND_AFTER_PRODUCT_ANGEBOTEN_AMOUNT.
+
+        Returns:
+        list: A list of products that were continuously offered, in the order of top_products.
+        """
+        # OffersService counts longer periods on their (colliding) ISO week numbers, which the bitmaps do not keep
+        if week_amount * 2 + 1 > 52:
+            raise ValueError(f"The offer coverage index checks periods of at most 52 weeks, not {week_amount * 2 + 1}.")
+
+        if week_amount < 4 or not top_products:
+            return []
+
+        offered_period_start, offered_period_end = get_continuous_offering_period(seal_date_str, week_amount)
+        coverage = self.repository.fetch_products_weekly_coverage(
+            list(dict.fromkeys(top_products)), haendler_bez,
+            to_wall_clock_seconds(offered_period_start), to_wall_clock_seconds(offered_period_end))
+
+        min_offered_weeks = week_amount * 2 + 1 - CONFIG.MAX_WEEKS_BEFORE_AFTER_PRODUCT_ANGEBOTEN_MISSING_ALLOWED_AMOUNT
+        continuously_offered = {
+            str(produkt_id) for produkt_id, offered_weeks in zip(coverage.column('produkt_id').to_pylist(),
+                                                                 coverage.column('offered_weeks').to_pylist())
+            if offered_weeks >= min_offered_weeks
+        }
+        return [produkt_id for produkt_id in top_products if str(produkt_id) in continuously_offered]
@@ -1,6 +1,9 @@
 import random
 
+import numpy as np
 import polars as pl
+import pyarrow as pa
+import pyarrow.compute as pc
 
 from impl.helpers import *
 from impl.service.base.abc_service import AbstractBaseService
@@ -22,26 +25,61 @@ class OffersService(AbstractBaseService):
         Returns:
         set: A set of weeks in which the product was offered.
         """
-        unix_time_spells_from, unix_time_spells_to = get_unix_offer_data_inflow_time_range_from_seal_date(seal_date_str)
+        unix_time_spells_from, unix_time_spells_to, lower_bound, upper_bound = \
+            self._get_offered_weeks_bounds(seal_date_str)
 
-        angebot_data = self.repository.fetch_offered_weeks(prod_id, firm_id, unix_time_spells_from, unix_time_spells_to)
+        spells = self.repository.fetch_offered_weeks(prod_id, firm_id, unix_time_spells_from, unix_time_spells_to)
 
-        offered_weeks = set()
-        for row in angebot_data.iter_rows():
-            dtimebegin = max(int(row[2]), unix_time_spells_from)
-            dtimeend = min(int(row[3]), unix_time_spells_to)
+        # Walk all spells at once: every spell (clipped to the time range) contributes its weekly steps from the
+        # begin up to the end, which are mapped to week_running_var like calculate_running_var_t_from_u.
+        dtimebegin = np.maximum(spells.column('dtimebegin').to_numpy().astype(np.int64), unix_time_spells_from)
+        dtimeend = np.minimum(spells.column('dtimeend').to_numpy().astype(np.int64), unix_time_spells_to)
+        in_range = dtimebegin <= dtimeend
+        dtimebegin, dtimeend = dtimebegin[in_range], dtimeend[in_range]
 
-            current_date = dtimebegin
-            while current_date <= dtimeend:
-                week_number = calculate_running_var_t_from_u(current_date)
-                offered_weeks.add(week_number)
-                current_date += UNIX_WEEK
+        steps = (dtimeend - dtimebegin) // UNIX_WEEK + 1
+        step_offsets = np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps)
+        week_unix = np.repeat(dtimebegin, steps) + step_offsets * UNIX_WEEK
+        weeks = np.trunc((week_unix - UNIX_TIME_ORIGIN) / UNIX_WEEK).astype(np.int64)
+
+        return set(np.unique(weeks[(weeks >= lower_bound) & (weeks <= upper_bound)]).tolist())
+
+    def get_offered_weeks_block(self, tasks: pl.DataFrame, seal_date_str: str) -> pl.DataFrame:
+        """
+        Get the offered weeks of all (product, firm) tasks of a seal firm around the seal date in one query.
+        Yields per task exactly the weeks of get_offered_weeks.
+
+        Parameters:
+        tasks (pl.DataFrame): The tasks with the columns produkt_id, haendler_bez and firm_has_seal_j.
+        seal_date_str (str): The seal date as a string.
+
+        Returns:
+        pl.DataFrame: The (produkt_id, haendler_bez, week_running_var, firm_has_seal_j) rows of all tasks.
+        """
+        unix_time_spells_from, unix_time_spells_to, lower_bound, upper_bound = \
+            self._get_offered_weeks_bounds(seal_date_str)
+
+        return self.repository.fetch_offered_weeks_block(tasks, unix_time_spells_from, unix_time_spells_to,
+                                                         lower_bound, upper_bound)
+
+    @staticmethod
+    def _get_offered_weeks_bounds(seal_date_str: str) -> tuple:
+        """
+        Get the offer spell inflow time range and the week_running_var bounds (+-26 weeks) around the seal date.
+
+        Parameters:
+        seal_date_str (str): The seal date as a string.
+
+        Returns:
+        tuple: (unix_time_spells_from, unix_time_spells_to, lower_bound, upper_bound)
+        """
+        unix_time_spells_from, unix_time_spells_to = get_unix_offer_data_inflow_time_range_from_seal_date(seal_date_str)
 
         seal_date = date_to_unix_time(seal_date_str)
         lower_bound = calculate_running_var_t_from_u(seal_date - 26 * UNIX_WEEK)
         upper_bound = calculate_running_var_t_from_u(seal_date + 26 * UNIX_WEEK)
 
-        return {week for week in offered_weeks if lower_bound <= week <= upper_bound}
+        return unix_time_spells_from, unix_time_spells_to, lower_bound, upper_bound
 
     def get_rand_max_N_counterfactual_firms(self, product_id: str,
                                             seal_date_str: str,
@@ -59,23 +97,48 @@ class OffersService(AbstractBaseService):
         Returns:
         list: A random sample of counterfactual firms.
         """
-        seal_date = date_to_unix_time(seal_date_str)
+        return self.get_rand_max_N_counterfactual_firms_by_products(
+            [product_id], seal_date_str, seal_firms, allowed_firms)[product_id]
+
+    def get_rand_max_N_counterfactual_firms_by_products(self, product_ids: list,
+                                                        seal_date_str: str,
+                                                        seal_firms: pl.Series,
+                                                        allowed_firms: pl.Series,
+                                                        n: int = CONFIG.RANDOM_COUNTERFACTUAL_FIRMS_AMOUNT,
+                                                        seed: int = CONFIG.RANDOM_SAMPLER_DETERMINISTIC_SEED) -> dict:
+        """
+        Get a deterministic random selection of counterfactual firms for many products in one query.
+        The selection is hash based on (seed, product, firm), so it is reproducible regardless of the
+        order or the process in which seal firms and products are processed.
 
-        angebot_data = self.repository.fetch_all_counterfactual_firms_by_product_and_timestamps(
-            product_id,
-            seal_date).to_series(0)
+        Parameters:
+        product_ids (list): The product IDs to sample counterfactual firms for.
+        seal_date_str (str): The seal date as a string.
+        seal_firms (pl.Series): The seal firms to exclude.
+        allowed_firms (pl.Series): The firms allowed as counterfactual firms.
+        n (int, optional): The maximum number of firms per product. Defaults to CONFIG.RANDOM_COUNTERFACTUAL_FIRMS_AMOUNT.
+        seed (int, optional): The seed of the selection. Defaults to CONFIG.RANDOM_SAMPLER_DETERMINISTIC_SEED.
 
-        counterfactual_firms_filtered = angebot_data.filter(
-            (~angebot_data.is_in(seal_firms)) &
-            (angebot_data.is_in(allowed_firms))
-        )
+        Returns:
+        dict: The selected counterfactual firms per product ID (empty list if there are none).
+        """
+        selected_firms = {product_id: [] for product_id in product_ids}
+        if not product_ids:
+            return selected_firms
 
-        counterfactual_firms_filtered_list = counterfactual_firms_filtered.to_list()
+        seal_date = date_to_unix_time(seal_date_str)
 
-        random.seed(CONFIG.RANDOM_SAMPLER_DETERMINISTIC_SEED)
-        random.shuffle(counterfactual_firms_filtered_list)
+        sample = self.repository.fetch_counterfactual_firms_sample_by_products(
+            list(selected_firms), seal_date, seal_firms, allowed_firms, n, seed)
 
-        selected_firms = counterfactual_firms_filtered_list[:CONFIG.RANDOM_COUNTERFACTUAL_FIRMS_AMOUNT]
+        product_ids_by_str = {str(product_id): product_id for product_id in selected_firms}
+        firms_by_product = (
+            pl.from_arrow(sample)
+            .group_by(pl.col('produkt_id').cast(pl.Utf8), maintain_order=True)
+            .agg('haendler_bez')
+        )
+        for produkt_id, haendler_bez in zip(firms_by_product['produkt_id'], firms_by_product['haendler_bez']):
+            selected_firms[product_ids_by_str[produkt_id]] = haendler_bez.to_list()
 
         return selected_firms
 
@@ -104,7 +167,7 @@ class OffersService(AbstractBaseService):
         observation_end_unix = int(observation_end.timestamp())
 
         product_ids = self.repository.fetch_random_products(haendler_bez, observation_start_unix,
-                                                            observation_end_unix).to_series(0).to_list()
+                                                            observation_end_unix).column('produkt_id').to_pylist()
 
         if not product_ids:
             return []
@@ -129,11 +192,7 @@ class OffersService(AbstractBaseService):
         if weeks < 4:
             return False
 
-        seal_date = date_to_unix_time(seal_date_str)
-        seal_date_start_of_week = get_start_of_week(dt.datetime.fromtimestamp(seal_date))
-
-        offered_period_start = seal_date_start_of_week - dt.timedelta(weeks=weeks)
-        offered_period_end = seal_date_start_of_week + dt.timedelta(weeks=weeks)
+        offered_period_start, offered_period_end = get_continuous_offering_period(seal_date_str, weeks)
 
         offered_period_start_unix = int(offered_period_start.timestamp())
         offered_period_end_unix = int(offered_period_end.timestamp())
@@ -160,7 +219,7 @@ class OffersService(AbstractBaseService):
 
             if week_number not in offered_weeks:
                 weeks_with_no_offers += 1
-                if weeks_with_no_offers > 1:
+                if weeks_with_no_offers > CONFIG.MAX_WEEKS_BEFORE_AFTER_PRODUCT_ANGEBOTEN_MISSING_ALLOWED_AMOUNT:
                     return False
 
         return True
@@ -179,10 +238,27 @@ class OffersService(AbstractBaseService):
         Returns:
         list: A list of products that were continuously offered.
         """
-        continuously_offered_products = []
+        # ISO week numbers only identify the weeks of the period uniquely for periods shorter than a year
+        if week_amount * 2 + 1 > 52:
+            return [produkt_id for produkt_id in top_products
+                    if self.is_product_continuously_offered(produkt_id, haendler_bez, seal_date_str, weeks=week_amount)]
+
+        if week_amount < 4 or not top_products:
+            return []
+
+        offered_period_start, offered_period_end = get_continuous_offering_period(seal_date_str, week_amount)
+
+        coverage = self.repository.fetch_products_weekly_coverage(
+            list(dict.fromkeys(top_products)), haendler_bez,
+            int(offered_period_start.timestamp()), int(offered_period_end.timestamp()),
+            to_wall_clock_seconds(offered_period_start), to_wall_clock_seconds(offered_period_end))
 
-        for produkt_id in top_products:
-            if self.is_product_continuously_offered(produkt_id, haendler_bez, seal_date_str, weeks=week_amount):
-                continuously_offered_products.append(produkt_id)
+        period_weeks = week_amount * 2 + 1
+        min_offered_weeks = period_weeks - CONFIG.MAX_WEEKS_BEFORE_AFTER_PRODUCT_ANGEBOTEN_MISSING_ALLOWED_AMOUNT
+        continuously_offered = pc.cast(
+            coverage.filter(pc.greater_equal(coverage.column('offered_weeks'), min_offered_weeks))
+            .column('produkt_id'), pa.string())
 
-        return continuously_offered_products
+        top_product_ids = pa.array([str(produkt_id) for produkt_id in top_products], pa.string())
+        keep = pc.is_in(top_product_ids, value_set=continuously_offered.combine_chunks()).to_numpy(zero_copy_only=False)
+        return [produkt_id for produkt_id, is_kept in zip(top_products, keep) if is_kept]
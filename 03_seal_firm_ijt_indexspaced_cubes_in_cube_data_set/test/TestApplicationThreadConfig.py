@@ -0,0 +1,34 @@
+import unittest
+from unittest.mock import patch
+
+from ApplicationThreadConfig import ApplicationThreadConfig
+
+
+class TestApplicationThreadConfig(unittest.TestCase):
+
+    def test_split_memory_limit(self):
+        self.assertEqual("150000MB", ApplicationThreadConfig.split_memory_limit("1200GB", 8))
+        self.assertEqual("341MB", ApplicationThreadConfig.split_memory_limit("1.024 gb", 3))
+        self.assertEqual("1MB", ApplicationThreadConfig.split_memory_limit("512KB", 4))
+
+    def test_split_memory_limit_rejects_unknown_unit(self):
+        with self.assertRaises(ValueError):
+            ApplicationThreadConfig.split_memory_limit("80%", 2)
+
+    @patch('ApplicationThreadConfig.CONFIG.DUCKDB_MEMORY_LIMIT', '64GB')
+    @patch('ApplicationThreadConfig.ApplicationThreadConfig.calculate_thread_distribution', return_value={
+        "duckdb_thread_count": 128,
+        "duckdb_background_thread_count": 32,
+    })
+    def test_worker_thread_distribution(self, _):
+        distribution = ApplicationThreadConfig.calculate_worker_thread_distribution(8)
+
+        self.assertEqual(16, distribution["duckdb_thread_count"])
+        self.assertEqual(4, distribution["duckdb_background_thread_count"])
+        self.assertEqual("8000MB", distribution["duckdb_memory_limit"])
+
+        self.assertEqual(1, ApplicationThreadConfig.calculate_worker_thread_distribution(500)["duckdb_thread_count"])
+
+
+if __name__ == '__main__':
+    unittest.main()
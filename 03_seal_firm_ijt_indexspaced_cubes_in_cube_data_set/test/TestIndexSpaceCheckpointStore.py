@@ -0,0 +1,127 @@
+import datetime as dt
+import os
+import tempfile
+import unittest
+
+import polars as pl
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from impl.db.index_space_checkpoint_store import IndexSpaceCheckpointStore
+from impl.db.index_space_result_sink import RESULT_ARROW_SCHEMA
+from impl.service.enum.index_space_result_format import IndexSpaceResultFormat
+
+HEADER = "produkt_id,haendler_bez,week_running_var,firm_has_seal_j\n"
+
+
+def rows_of(firm, weeks, has_seal=1):
+    return pl.DataFrame({
+        'produkt_id': [1] * len(weeks),
+        'haendler_bez': [firm] * len(weeks),
+        'week_running_var': weeks,
+        'firm_has_seal_j': [has_seal] * len(weeks),
+    })
+
+
+class TestIndexSpaceCheckpointStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.checkpoint_dir = os.path.join(self.tmp_dir.name, 'checkpoints')
+        self.results_path = os.path.join(self.tmp_dir.name, 'results.csv')
+
+    def test_completed_shards_survive_restart(self):
+        store = IndexSpaceCheckpointStore(self.checkpoint_dir)
+        with store.open_shard('shop/a.at', dt.date(2015, 3, 1)) as sink:
+            sink.write(rows_of('shop/a.at', [400]))
+
+        restarted = IndexSpaceCheckpointStore(self.checkpoint_dir)
+
+        self.assertTrue(restarted.is_completed('shop/a.at', dt.date(2015, 3, 1)))
+        self.assertFalse(restarted.is_completed('shop/a.at', dt.date(2016, 3, 1)))
+        self.assertFalse(IndexSpaceCheckpointStore(self.checkpoint_dir, IndexSpaceResultFormat.PARQUET)
+                         .is_completed('shop/a.at', dt.date(2015, 3, 1)))
+
+    def test_shards_of_another_run_fingerprint_are_discarded(self):
+        store = IndexSpaceCheckpointStore(self.checkpoint_dir, run_fingerprint={'config': {'TOP_PRODUCTS': 5}})
+        with store.open_shard('A', dt.date(2015, 3, 1)) as sink:
+            sink.write(rows_of('A', [400]))
+
+        unchanged = IndexSpaceCheckpointStore(self.checkpoint_dir, run_fingerprint={'config': {'TOP_PRODUCTS': 5}})
+        self.assertEqual(0, unchanged.discard_stale_shards())
+        self.assertTrue(unchanged.is_completed('A', dt.date(2015, 3, 1)))
+
+        changed = IndexSpaceCheckpointStore(self.checkpoint_dir, run_fingerprint={'config': {'TOP_PRODUCTS': 10}})
+        self.assertFalse(changed.is_completed('A', dt.date(2015, 3, 1)))
+        self.assertEqual(1, changed.discard_stale_shards())
+        self.assertEqual(['manifest.json'], os.listdir(self.checkpoint_dir))
+        self.assertFalse(IndexSpaceCheckpointStore(self.checkpoint_dir, run_fingerprint={'config': {'TOP_PRODUCTS': 5}})
+                         .is_completed('A', dt.date(2015, 3, 1)))
+
+    def test_failed_shard_is_not_completed(self):
+        store = IndexSpaceCheckpointStore(self.checkpoint_dir)
+        with self.assertRaises(RuntimeError):
+            with store.open_shard('B', dt.date(2015, 3, 1)) as sink:
+                sink.write(rows_of('B', [400]))
+                raise RuntimeError("preempted")
+
+        self.assertFalse(store.is_completed('B', dt.date(2015, 3, 1)))
+        self.assertEqual(['manifest.json'] if os.path.exists(store.manifest_path) else [],
+                         os.listdir(self.checkpoint_dir))
+
+    def test_partial_shards_are_discarded(self):
+        store = IndexSpaceCheckpointStore(self.checkpoint_dir)
+        with open(os.path.join(self.checkpoint_dir, 'A_2015-03-01_abc.csv.partial'), 'w') as partial:
+            partial.write("1,A,400,1\n")
+
+        self.assertEqual(1, store.discard_partial_shards())
+        self.assertEqual([], os.listdir(self.checkpoint_dir))
+
+    def test_assemble_in_seal_firm_order(self):
+        store = IndexSpaceCheckpointStore(self.checkpoint_dir)
+        for firm, seal_date in [('B', dt.date(2016, 1, 1)), ('A', dt.date(2015, 1, 1))]:
+            with store.open_shard(firm, seal_date) as sink:
+                sink.write(rows_of(firm, [400]))
+                sink.write(rows_of(firm, [401], has_seal=0))
+
+        store.assemble(self.results_path, [('A', dt.date(2015, 1, 1)), ('C', dt.date(2015, 6, 1)),
+                                           ('B', dt.date(2016, 1, 1))], HEADER)
+
+        with open(self.results_path) as results:
+            self.assertEqual(HEADER + "1,A,400,1\n1,A,401,0\n1,B,400,1\n1,B,401,0\n", results.read())
+
+    def test_clear_removes_checkpoints(self):
+        store = IndexSpaceCheckpointStore(self.checkpoint_dir)
+        with store.open_shard('A', dt.date(2015, 1, 1)) as sink:
+            sink.write(rows_of('A', [400]))
+
+        store.clear()
+
+        self.assertFalse(IndexSpaceCheckpointStore(self.checkpoint_dir).is_completed('A', dt.date(2015, 1, 1)))
+
+    def test_parquet_dataset_is_typed_and_partitioned_by_seal_firm(self):
+        store = IndexSpaceCheckpointStore(self.checkpoint_dir, IndexSpaceResultFormat.PARQUET, batch_size=2)
+        with store.open_shard('shop/a.at', dt.date(2015, 1, 1)) as sink:
+            sink.write(rows_of('shop/a.at', [400, 401, 402]))
+            sink.write(rows_of('X', [-26], has_seal=0))
+        with store.open_shard('B', dt.date(2016, 1, 1)) as sink:
+            sink.write(pl.DataFrame())
+        dataset_dir = os.path.join(self.tmp_dir.name, 'results_parquet')
+
+        store.assemble_dataset(dataset_dir, [('shop/a.at', dt.date(2015, 1, 1)), ('B', dt.date(2016, 1, 1))])
+
+        dataset = ds.dataset(dataset_dir, format='parquet', partitioning='hive')
+        table = dataset.to_table(columns=RESULT_ARROW_SCHEMA.names, filter=ds.field('seal_firm') == 'shop/a.at')
+        self.assertEqual(RESULT_ARROW_SCHEMA, table.schema)
+        self.assertEqual([400, 401, 402, -26], table['week_running_var'].to_pylist())
+        self.assertEqual([True, True, True, False], table['firm_has_seal_j'].to_pylist())
+        self.assertEqual(['shop/a.at'] * 3 + ['X'], table['haendler_bez'].to_pylist())
+        self.assertEqual(0, dataset.to_table(filter=ds.field('seal_firm') == 'B').num_rows)
+        self.assertEqual(pa.int16(), pl.read_parquet(os.path.join(
+            dataset_dir, 'seal_firm=shop%2Fa.at', 'seal_date=2015-01-01', 'part-0.parquet')).to_arrow()
+            .schema.field('week_running_var').type)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,10 @@
 from unittest import TestCase
 from unittest.mock import patch
 
+import polars as pl
+
 from impl.db.datasource import DuckDBDataSource
+from impl.db.loaders.retailer_dictionary import build_retailer_dictionary
 
 
 class DuckDbBaseTest(TestCase):
@@ -17,6 +20,22 @@ class DuckDbBaseTest(TestCase):
         # Use a new instance and bypass singleton to ensure a fresh connection for each test
         self.db = DuckDBDataSource(db_path=':memory:', bypass_singleton=True)
 
+    def encode_retailers(self, *table_names):
+        """
+        Build the retailer dictionary over the given tables and replace their haendler_bez column by haendler_id,
+        as the inflow loaders do.
+        """
+        build_retailer_dictionary(self.db, pl.concat([
+            self.db.queryAsPl(f"SELECT haendler_bez FROM {table_name}").to_series(0).cast(pl.Utf8)
+            for table_name in table_names
+        ]))
+        for table_name in table_names:
+            self.db.query(f"""
+                CREATE OR REPLACE TABLE {table_name} AS
+                SELECT t.* EXCLUDE (haendler_bez), rd.haendler_id
+                FROM {table_name} t JOIN retailer_dictionary rd ON rd.haendler_bez = t.haendler_bez
+            """)
+
     def tearDown(self):
         # Close the connection after each test
         self.db.close()
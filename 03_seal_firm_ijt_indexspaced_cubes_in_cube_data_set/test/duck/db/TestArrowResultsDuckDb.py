@@ -0,0 +1,71 @@
+import random
+import unittest
+
+import pyarrow as pa
+
+from CONFIG import UNIX_WEEK
+from impl.helpers import calculate_running_var_t_from_u, date_to_unix_time
+from impl.repository.offers_repository import OffersRepository
+from impl.service.offers_service import OffersService
+from ..base.DuckDbBaseTest import DuckDbBaseTest
+
+
+class TestArrowResultsDuckDb(DuckDbBaseTest):
+
+    def setUp(self):
+        super().setUp()
+        self.db.conn.execute("CREATE TABLE numbers AS SELECT range AS n, 'x' || range AS label FROM range(10)")
+
+    def test_query_as_arrow(self):
+        result = self.db.queryAsArrow("SELECT n, label FROM numbers WHERE n >= ? ORDER BY n", [7])
+
+        self.assertIsInstance(result, pa.Table)
+        self.assertEqual([7, 8, 9], result.column('n').to_pylist())
+        self.assertEqual(['x7', 'x8', 'x9'], result.column('label').to_pylist())
+
+    def test_query_as_record_batches(self):
+        reader = self.db.queryAsRecordBatches("SELECT n FROM numbers ORDER BY n", batch_size=4)
+
+        self.assertIsInstance(reader, pa.RecordBatchReader)
+        self.assertEqual(list(range(10)), reader.read_all().column('n').to_pylist())
+
+    def test_query_as_arrow_is_profiled(self):
+        profiler = self.db.enable_profiler()
+        self.db.queryAsArrow("SELECT n FROM numbers")
+
+        summary = profiler.summary()
+        self.assertEqual(10, summary.filter(summary['method'] == 'TestArrowResultsDuckDb.test_query_as_arrow_is_profiled')
+                         ['rows'][0])
+
+    def test_vectorized_offered_weeks_match_the_week_walk(self):
+        seal_date_str = "15.8.2023"
+        seal_date = date_to_unix_time(seal_date_str)
+        generator = random.Random(7)
+        spells = []
+        for _ in range(200):
+            dtimebegin = seal_date + generator.randint(-80, 80) * UNIX_WEEK + generator.randint(0, UNIX_WEEK)
+            spells.append(('P1', 'F1', dtimebegin, dtimebegin + generator.randint(0, 12 * UNIX_WEEK)))
+
+        self.db.conn.execute("CREATE TABLE angebot (produkt_id STRING, haendler_bez STRING, dtimebegin BIGINT, dtimeend BIGINT)")
+        self.db.conn.executemany("INSERT INTO angebot VALUES (?, ?, ?, ?)", spells)
+        self.encode_retailers('angebot')
+        service = OffersService(OffersRepository(self.db))
+
+        # The row by row week walk the vectorized implementation replaces
+        spells_from, spells_to, lower_bound, upper_bound = service._get_offered_weeks_bounds(seal_date_str)
+        expected_weeks = set()
+        for _, _, dtimebegin, dtimeend in spells:
+            if dtimebegin > spells_to or dtimeend < spells_from:
+                continue
+            current_date = max(dtimebegin, spells_from)
+            while current_date <= min(dtimeend, spells_to):
+                expected_weeks.add(calculate_running_var_t_from_u(current_date))
+                current_date += UNIX_WEEK
+        expected_weeks = {week for week in expected_weeks if lower_bound <= week <= upper_bound}
+
+        self.assertEqual(expected_weeks, service.get_offered_weeks('P1', 'F1', seal_date_str))
+        self.assertEqual(set(), service.get_offered_weeks('P2', 'F1', seal_date_str))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import polars as pl
+
+from impl.repository.clicks_repository import ClicksRepository
+from ..base.DuckDbBaseTest import DuckDbBaseTest
+
+
+class TestCursorPoolDuckDb(DuckDbBaseTest):
+
+    def setUp(self):
+        super().setUp()
+        self.db.conn.execute("CREATE TABLE clicks (haendler_bez STRING, timestamp BIGINT, produkt_id STRING)")
+        self.db.conn.executemany("INSERT INTO clicks VALUES (?, ?, ?)", [
+            (f"firm{firm}", day, f"product{product}")
+            for firm in range(4) for product in range(firm + 1) for day in range(product + 1)
+        ])
+        self.encode_retailers('clicks')
+        self.db.enable_cursor_pool(max_size=2)
+
+    def test_threads_use_their_own_cursor(self):
+        cursors = {}
+
+        def checkout():
+            with self.db.cursor() as cursor:
+                with self.db.cursor() as nested_cursor:
+                    self.assertIs(cursor, nested_cursor)
+                cursors[threading.current_thread().name] = cursor
+
+        threads = [threading.Thread(target=checkout, name=f"t{i}") for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(3, len({id(cursor) for cursor in cursors.values()}))
+        self.assertNotIn(self.db.conn, cursors.values())
+
+    def test_pool_bounds_concurrent_checkouts(self):
+        active = []
+        max_active = []
+        lock = threading.Lock()
+        barrier = threading.Event()
+
+        def checkout(_):
+            with self.db.cursor():
+                with lock:
+                    active.append(1)
+                    max_active.append(len(active))
+                barrier.wait(0.2)
+                with lock:
+                    active.pop()
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(checkout, range(8)))
+
+        self.assertEqual(2, max(max_active))
+
+    def test_concurrent_repository_queries(self):
+        repository = ClicksRepository(self.db)
+
+        def top_products(firm):
+            return repository.fetch_top_products_by_clicks(f"firm{firm}", 0, 100, 10)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(top_products, [firm % 4 for firm in range(16)]))
+
+        for firm, result in zip([firm % 4 for firm in range(16)], results):
+            self.assertEqual([f"product{product}" for product in range(firm, -1, -1)], result.column('produkt_id').to_pylist())
+
+    def test_registered_views_are_thread_local(self):
+        def register_and_count(rows):
+            self.db.register('thread_rows', pl.DataFrame({'x': list(range(rows))}))
+            try:
+                return self.db.queryAsPl("SELECT COUNT(*) AS n FROM thread_rows")['n'][0]
+            finally:
+                self.db.unregister('thread_rows')
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            self.assertEqual([1, 2, 3, 4], list(executor.map(register_and_count, [1, 2, 3, 4])))
+
+
+if __name__ == '__main__':
+    unittest.main()
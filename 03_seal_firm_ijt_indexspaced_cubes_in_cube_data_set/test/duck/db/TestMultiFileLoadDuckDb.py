@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import polars as pl
+
+from impl.db.datasource import DuckDBDataSource
+from impl.db.loaders.retailer_dictionary import build_retailer_dictionary
+from ..base.DuckDbBaseTest import DuckDbBaseTest
+
+COLUMNS = ['produkt_id', 'haendler_bez', 'dtimebegin', 'dtimeend']
+
+
+class TestMultiFileLoadDuckDb(DuckDbBaseTest):
+
+    def setUp(self):
+        super().setUp()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.parquet_dir = temp_dir.name
+        build_retailer_dictionary(self.db, pl.Series(['shop-a', 'shop-b']))
+
+        self.files = []
+        for week in range(1, 4):
+            file_path = os.path.join(self.parquet_dir, f'angebot_2023w{week:02d}.parquet')
+            frame = pl.DataFrame({
+                'produkt_id': [week, 10 + week, 20 + week],
+                'haendler_bez': ['shop-a', 'unknown', 'shop-b'],
+                'dtimebegin': [week * 100, week * 100, 0],
+                'dtimeend': [week * 100 + 1, week * 100 + 1, 1],
+            })
+            # Older files carry further columns in another order
+            if week == 1:
+                frame = frame.with_columns(pl.lit(1.5).alias('preis_min')).select(
+                    'preis_min', 'dtimeend', 'dtimebegin', 'haendler_bez', 'produkt_id')
+            frame.write_parquet(file_path)
+            self.files.append(file_path)
+
+    def test_single_scan_matches_per_file_loads(self):
+        where = "dtimeend >= 100"
+        self.db.load_parquet_to_table(self.files[0], 'per_file', columns=COLUMNS, where=where, encode_retailers=True)
+        for file_path in self.files[1:]:
+            self.db.append_parquet_to_table(file_path, 'per_file', columns=COLUMNS, where=where, encode_retailers=True)
+        self.db.query("DELETE FROM file_log")
+
+        loaded = self.db.load_parquet_files_to_table(self.files, 'angebot', columns=COLUMNS, where=where,
+                                                     encode_retailers=True)
+
+        self.assertEqual(self.files, loaded)
+        self.assertEqual(self.db.conn.execute("SELECT * FROM per_file ORDER BY ALL").fetchall(),
+                         self.db.conn.execute("SELECT * FROM angebot ORDER BY ALL").fetchall())
+        self.assertEqual([(1, 0, 100, 101), (2, 0, 200, 201), (3, 0, 300, 301)],
+                         self.db.conn.execute("SELECT * FROM angebot ORDER BY ALL").fetchall())
+        self.assertTrue(all(self.db.is_file_loaded(file_path) for file_path in self.files))
+
+    def test_loaded_files_are_skipped_and_the_rest_appended(self):
+        self.db.load_parquet_files_to_table(self.files[:2], 'angebot', columns=COLUMNS, encode_retailers=True)
+
+        self.assertEqual([self.files[2]], self.db.load_parquet_files_to_table(self.files, 'angebot', columns=COLUMNS,
+                                                                              encode_retailers=True))
+        self.assertEqual([], self.db.load_parquet_files_to_table(self.files, 'angebot', columns=COLUMNS,
+                                                                 encode_retailers=True))
+        self.assertEqual((6,), self.db.conn.execute("SELECT COUNT(*) FROM angebot").fetchone())
+
+    def test_inflow_files_are_logged_without_fingerprint(self):
+        with patch('os.stat') as stat, patch.object(DuckDBDataSource, '_file_hash') as file_hash:
+            self.db.load_parquet_files_to_table(self.files, 'angebot', columns=COLUMNS, encode_retailers=True)
+
+        stat.assert_not_called()
+        file_hash.assert_not_called()
+        self.assertEqual([(None, None, None)] * 3, self.db.conn.execute(
+            "SELECT file_bytes, file_mtime, file_hash FROM file_log").fetchall())
+
+    def test_rows_of_unknown_retailers_are_dropped_and_logged(self):
+        with self.assertLogs('impl.db.datasource', level='WARNING') as logs:
+            self.db.load_parquet_files_to_table(self.files[:2], 'angebot', columns=COLUMNS, encode_retailers=True)
+            self.db.append_parquet_to_table(self.files[2], 'angebot', columns=COLUMNS, encode_retailers=True)
+
+        self.assertEqual(2, len(logs.records))
+        self.assertIn("Dropped 2 rows", logs.records[0].getMessage())
+        self.assertIn("Dropped 1 rows", logs.records[1].getMessage())
+        self.assertEqual((6, 0), self.db.conn.execute(
+            "SELECT COUNT(*), COUNT(*) FILTER (haendler_id IS NULL) FROM angebot").fetchone())
+
+
+if __name__ == '__main__':
+    unittest.main()
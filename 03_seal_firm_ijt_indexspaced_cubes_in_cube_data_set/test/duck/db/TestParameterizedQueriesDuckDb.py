@@ -0,0 +1,47 @@
+import unittest
+
+from impl.db.simple_sql_base_query_builder import SimpleSQLBaseQueryBuilder
+from impl.repository.retailer_repository import RetailerRepository
+from impl.repository.seal_change_firms_repository import SealChangeFirmsDataRepository
+from ..base.DuckDbBaseTest import DuckDbBaseTest
+
+
+class TestParameterizedQueriesDuckDb(DuckDbBaseTest):
+
+    def setUp(self):
+        super().setUp()
+        self.db.conn.execute("CREATE TABLE retailer (haendler_bez STRING, is_at INTEGER)")
+        self.db.conn.executemany("INSERT INTO retailer VALUES (?, ?)", [
+            ("Mario's Shop", 1), ("Hans' Technik'", 0), ("plain", 1)
+        ])
+        self.db.conn.execute("CREATE TABLE seal_change_firms (matched_haendler_bez STRING, seal STRING)")
+        self.db.conn.execute("INSERT INTO seal_change_firms VALUES ('Mario''s Shop', 'EHI')")
+
+    def test_retailer_names_with_quotes(self):
+        result = RetailerRepository(self.db).fetch_retailer_by_id("Hans' Technik'")
+        self.assertEqual([("Hans' Technik'", 0)], list(result.iter_rows()))
+
+        result = SealChangeFirmsDataRepository(self.db).fetch_seal_change_firms_by_retailer_name(
+            "Mario's Shop")
+        self.assertEqual([("Mario's Shop", 'EHI')], list(result.iter_rows()))
+
+    def test_params_follow_placeholder_order(self):
+        cte_builder = (
+            SimpleSQLBaseQueryBuilder('retailer')
+            .select('haendler_bez')
+            .where("is_at = ?", 1)
+        )
+        query_builder = (
+            SimpleSQLBaseQueryBuilder('at_retailers')
+            .where("haendler_bez <> ?", 'plain')
+            .with_cte('at_retailers', cte_builder.build(), cte_builder.build_params())
+            .select('haendler_bez')
+        )
+
+        self.assertEqual([1, 'plain'], query_builder.build_params())
+        result = self.db.queryAsPl(query_builder.build(), query_builder.build_params())
+        self.assertEqual(["Mario's Shop"], result['haendler_bez'].to_list())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+from impl.db.query_profiler import QueryProfiler
+from impl.repository.clicks_repository import ClicksRepository
+from ..base.DuckDbBaseTest import DuckDbBaseTest
+
+
+class TestQueryProfilerDuckDb(DuckDbBaseTest):
+
+    def setUp(self):
+        super().setUp()
+        self.db.conn.execute("CREATE TABLE clicks (haendler_bez STRING, timestamp BIGINT, produkt_id STRING)")
+        self.db.conn.executemany("INSERT INTO clicks VALUES (?, ?, ?)", [
+            ('firm1', 1, 'product1'), ('firm1', 2, 'product1'), ('firm1', 3, 'product2'), ('firm2', 3, 'product3')
+        ])
+        self.encode_retailers('clicks')
+        self.profiler = self.db.enable_profiler(slowest_n=2)
+
+    def test_fingerprint_normalizes_literals(self):
+        self.assertEqual(
+            "SELECT * FROM angebot_w1 WHERE produkt_id IN (?...) AND haendler_id = ? AND dtimebegin <= ?",
+            QueryProfiler.fingerprint("SELECT *  FROM angebot_w1\n WHERE produkt_id IN ('1', '2', 'it''s') "
+                                      "AND haendler_id = 12 AND dtimebegin <= -3.5")
+        )
+
+    def test_summary_per_repository_method(self):
+        repository = ClicksRepository(self.db)
+        for firm in ['firm1', 'firm2', 'firm3']:
+            repository.fetch_top_products_by_clicks(firm, 0, 10, 5)
+
+        summary = self.profiler.summary()
+        method = summary.filter(summary['method'] == 'ClicksRepository.fetch_top_products_by_clicks').row(0, named=True)
+
+        self.assertEqual(3, method['queries'])
+        self.assertEqual(3, method['rows'])
+        self.assertEqual(1, method['fingerprints'])
+        self.assertEqual(3, sum(method[bucket] for bucket in summary.columns if bucket.startswith(('lt_', 'ge_'))))
+
+    def test_plans_of_slowest_queries(self):
+        for firm in ['firm1', 'firm2', 'firm3']:
+            self.db.queryAsPl(f"SELECT COUNT(*) FROM clicks WHERE haendler_id = {len(firm)}")
+        self.db.query("CREATE TABLE profiled AS SELECT 1 AS x")
+
+        slowest = self.profiler.slowest_queries()
+        self.assertEqual(2, len(slowest))
+        self.assertGreaterEqual(slowest[0][0], slowest[1][0])
+        for seconds, method, query_str, plan in slowest:
+            self.assertTrue(query_str.startswith('SELECT'))
+            self.assertIn('TestQueryProfilerDuckDb.test_plans_of_slowest_queries', method)
+            self.assertIn('Total Time', plan)
+
+        self.profiler.log_summary()
+
+
+if __name__ == '__main__':
+    unittest.main()
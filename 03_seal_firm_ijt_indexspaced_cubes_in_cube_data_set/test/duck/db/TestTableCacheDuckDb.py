@@ -0,0 +1,133 @@
+import os
+import tempfile
+import unittest
+
+import polars as pl
+
+from impl.db.table_cache import TableCacheManager
+from ..base.DuckDbBaseTest import DuckDbBaseTest
+
+TABLES_CONFIG = {
+    "OFFERS": {"folder_name": "angebot", "drop_after_use": True, "row_limit": None, "cache_duration": None,
+               "file_log_delete": True},
+    "CLICKS": {"folder_name": "/clicks", "drop_after_use": False, "row_limit": 3, "cache_duration": None,
+               "file_log_delete": True},
+    "VERSAND": {"folder_name": "/versand", "drop_after_use": False, "row_limit": None, "cache_duration": 60,
+                "file_log_delete": False},
+    "LOOKUPS": {"folder_name": "/lookups", "drop_after_use": False, "row_limit": None, "cache_duration": None,
+                "file_log_delete": False},
+}
+
+
+class FakeClock:
+    def __init__(self):
+        self.seconds = 0.0
+
+    def __call__(self):
+        return self.seconds
+
+
+class TestTableCacheDuckDb(DuckDbBaseTest):
+
+    def setUp(self):
+        super().setUp()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.parquet_dir = temp_dir.name
+
+        self.clock = FakeClock()
+        # BIGINT + VARCHAR = 24 bytes per row
+        self.cache = TableCacheManager(self.db, TABLES_CONFIG, memory_budget_bytes=None, clock=self.clock)
+        self.db.table_cache = self.cache
+
+    def load(self, table_name: str, rows: int) -> str:
+        parquet_path = os.path.join(self.parquet_dir, f"{table_name}_{rows}.parquet")
+        pl.DataFrame({'produkt_id': list(range(rows)), 'haendler_bez': ['shop'] * rows}).write_parquet(parquet_path)
+        self.db.load_parquet_to_table(parquet_path, table_name)
+        return parquet_path
+
+    def test_tracks_loaded_tables(self):
+        self.load('angebot', 10)
+        self.clock.seconds += 120
+        self.load('clicks', 2)
+        self.clock.seconds += 60
+        self.cache.touch('angebot')
+
+        stats = self.cache.stats()
+        self.assertEqual(['clicks', 'angebot'], stats['table_name'].to_list())
+        self.assertEqual([2, 10], stats['rows'].to_list())
+        self.assertEqual([48, 240], stats['bytes'].to_list())
+        self.assertEqual(3.0, self.cache.minutes_since_load('angebot'))
+
+    def test_memory_budget_evicts_least_recently_used(self):
+        self.cache.memory_budget_bytes = 500
+        angebot_file = self.load('angebot', 10)
+        self.clock.seconds += 1
+        self.load('versand', 10)
+        self.clock.seconds += 1
+        self.cache.touch('angebot')
+        self.clock.seconds += 1
+        self.load('other', 5)
+
+        self.assertTrue(self.db.table_exists('angebot'))
+        self.assertFalse(self.db.table_exists('versand'))
+        self.assertTrue(self.db.table_exists('other'))
+        self.assertEqual(360, self.cache.total_bytes())
+        self.assertTrue(self.db.is_file_loaded(angebot_file))
+
+    def test_memory_budget_keeps_base_tables(self):
+        self.cache.memory_budget_bytes = 300
+        retailers_file = self.load('retailers', 10)
+        self.clock.seconds += 1
+        self.load('lookups', 10)
+        self.clock.seconds += 1
+        self.load('angebot', 10)
+        self.clock.seconds += 1
+        self.load('other', 1)
+
+        # Only angebot may be evicted, the budget stays exceeded by the kept tables
+        self.assertTrue(self.db.table_exists('retailers'))
+        self.assertTrue(self.db.table_exists('lookups'))
+        self.assertFalse(self.db.table_exists('angebot'))
+        self.assertTrue(self.db.table_exists('other'))
+        self.assertTrue(self.db.is_file_loaded(retailers_file))
+        self.assertEqual(['other'], self.cache.enforce())
+        self.assertEqual(['lookups', 'retailers'], sorted(self.cache.stats()['table_name'].to_list()))
+
+    def test_tables_in_use_are_not_evicted(self):
+        self.cache.memory_budget_bytes = 100
+        self.load('angebot', 10)
+        with self.cache.in_use('angebot'):
+            self.clock.seconds += 1
+            self.load('other', 1)
+            self.assertTrue(self.db.table_exists('angebot'))
+
+        self.assertEqual(['angebot'], self.cache.enforce())
+
+    def test_rules_of_the_tables_config(self):
+        angebot_file = self.load('angebot', 2)
+        self.load('clicks', 5)
+        versand_file = self.load('versand', 2)
+
+        # The row limit applies, drop_after_use only once the tables have been used
+        self.assertEqual(['clicks'], self.cache.enforce())
+        self.clock.seconds += 61 * 60
+        self.assertEqual(['angebot', 'versand'], sorted(self.cache.enforce(after_use=True)))
+
+        self.assertFalse(self.db.is_file_loaded(angebot_file))
+        # versand keeps its file log entries (file_log_delete False)
+        self.assertTrue(self.db.is_file_loaded(versand_file))
+        self.assertEqual(0, self.cache.total_bytes())
+
+    def test_drop_table_if_needed_honours_cache_duration(self):
+        self.load('versand', 2)
+        self.db.drop_table_if_needed('versand', TABLES_CONFIG['VERSAND'])
+        self.assertTrue(self.db.table_exists('versand'))
+
+        self.clock.seconds += 61 * 60
+        self.db.drop_table_if_needed('versand', TABLES_CONFIG['VERSAND'])
+        self.assertFalse(self.db.table_exists('versand'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+
+import polars as pl
+
+from CONFIG import CLICKS_SCHEME, UNIX_WEEK
+from impl.db.loaders.click_cube import build_click_cube, click_cube_is_built, load_click_cube
+from impl.db.loaders.retailer_dictionary import build_retailer_dictionary
+from impl.helpers import calculate_u_from_running_var_t, calculate_running_var_t_from_u, date_to_unix_time
+from impl.repository.click_cube_repository import ClickCubeRepository
+from impl.service.click_cube_service import ClickCubeService
+from ..base.DuckDbBaseTest import DuckDbBaseTest
+
+SEAL_DATE = "15.03.2023"
+
+
+class TestClickCubeDuckDb(DuckDbBaseTest):
+
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.parquet_dir = self.tmp_dir.name
+        self.cube_dir = os.path.join(self.tmp_dir.name, 'click_cube')
+        os.makedirs(os.path.join(self.parquet_dir, 'clicks'))
+
+        self.filter_file = os.path.join(self.tmp_dir.name, 'filtered_haendler_bez.csv')
+        self._write_filter(['F1', 'F2'])
+        build_retailer_dictionary(self.db, pl.Series(['F1', 'F2', 'MP-am-de']))
+
+        self.seal_week = calculate_running_var_t_from_u(date_to_unix_time(SEAL_DATE))
+        week_start = calculate_u_from_running_var_t(self.seal_week) + 3600
+
+        # February: P2 is clicked 3 times in week t-4, March: P1 2 times in week t, April: P3 once in week t+5
+        self._write_clicks(2023, 2, ['P2', 'P2', 'P2', 'P9'], ['F1', 'F1', 'F1', 'MP-am-de'],
+                           [week_start - 4 * UNIX_WEEK] * 4)
+        self._write_clicks(2023, 3, ['P1', 'P1', 'P2', 'P1'], ['F1', 'F1', 'F2', 'F2'], [week_start] * 4)
+        self._write_clicks(2023, 4, ['P3'], ['F1'], [week_start + 5 * UNIX_WEEK])
+
+    def _write_filter(self, haendler_bez):
+        pl.DataFrame({'haendler_bez': haendler_bez}).write_csv(self.filter_file, separator=';')
+        # Fingerprinted like the snapshot input it is, so a rewritten filter file is reloaded
+        self.db.load_csv_to_table(self.filter_file, 'filtered_haendler_bez', fingerprint=True)
+
+    def _write_clicks(self, year, month, produkt_ids, haendler_bez, timestamps):
+        pl.DataFrame({
+            'ip': ['127.0.0.1'] * len(produkt_ids),
+            'produkt_id': produkt_ids,
+            'haendler_bez': haendler_bez,
+            'timestamp': timestamps,
+        }).write_parquet(os.path.join(self.parquet_dir, 'clicks',
+                                      CLICKS_SCHEME.format(year=year, month='%02d' % month)))
+
+    def _build(self, **kwargs):
+        return build_click_cube(self.db, cube_dir=self.cube_dir, parquet_dir=self.parquet_dir,
+                                filter_file=self.filter_file, **kwargs)
+
+    def test_cube_aggregates_filtered_retailers_by_week(self):
+        self.assertEqual(3, self._build())
+        self.assertTrue(click_cube_is_built(self.cube_dir))
+
+        cube_file = pl.read_parquet(os.path.join(self.cube_dir, CLICKS_SCHEME.format(year=2023, month='03')))
+        self.assertEqual(['haendler_bez', 'produkt_id', 'week_running_var', 'clicks'], cube_file.columns)
+        self.assertEqual([('F1', 'P1', self.seal_week, 2), ('F2', 'P1', self.seal_week, 1),
+                          ('F2', 'P2', self.seal_week, 1)], list(cube_file.iter_rows()))
+
+    def test_rebuild_only_changed_files(self):
+        self._build()
+        self.assertEqual(0, self._build())
+
+        self._write_clicks(2023, 5, ['P3'], ['F1'], [0])
+        self.assertEqual(1, self._build())
+        self.assertEqual(4, self._build(rebuild=True))
+
+    def test_rebuild_all_files_when_the_filter_changes(self):
+        self._build()
+        # Rewriting the same retailers keeps the cube
+        self._write_filter(['F1', 'F2'])
+        self.assertEqual(0, self._build())
+
+        self._write_filter(['F1'])
+        self.assertEqual(3, self._build())
+        cube_file = pl.read_parquet(os.path.join(self.cube_dir, CLICKS_SCHEME.format(year=2023, month='03')))
+        self.assertEqual([('F1', 'P1', self.seal_week, 2)], list(cube_file.iter_rows()))
+        self.assertEqual(0, self._build())
+
+    def test_top_n_products_by_clicks_on_cube(self):
+        self._build()
+        self.assertEqual(5, load_click_cube(self.db, cube_dir=self.cube_dir))
+
+        service = ClickCubeService(ClickCubeRepository(self.db))
+
+        # P3 is clicked in week t+5, outside of the +-4 weeks around the seal week
+        self.assertEqual(['P2', 'P1'], service.get_top_n_products_by_clicks('F1', SEAL_DATE))
+        self.assertEqual(['P2'], service.get_top_n_products_by_clicks('F1', SEAL_DATE, top_n=1))
+        self.assertEqual(['P1', 'P2'], service.get_top_n_products_by_clicks('F2', SEAL_DATE))
+        self.assertEqual([], service.get_top_n_products_by_clicks('MP-am-de', SEAL_DATE))
+
+    def test_load_unbuilt_cube(self):
+        with self.assertRaises(FileNotFoundError):
+            load_click_cube(self.db, cube_dir=self.cube_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import polars as pl
+
+from impl.db.datasource import DuckDBDataSource
+from impl.db.loaders.init_db import DatabaseInitializer
+from ..base.DuckDbBaseTest import DuckDbBaseTest
+
+
+class TestDatabaseSnapshotDuckDb(DuckDbBaseTest):
+
+    def setUp(self):
+        super().setUp()
+        self.db.close()
+
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.data_dir = Path(temp_dir.name)
+        self.db_path = str(self.data_dir / 'snapshot.duckdb')
+
+        self.seal_change_firms = str(self.data_dir / 'final_matrix.csv')
+        self.filtered_haendler_bez = str(self.data_dir / 'filtered_haendler_bez.csv')
+        with open(self.seal_change_firms, 'w') as csv_file:
+            csv_file.write("seal;seal_firm_id;RESULTING MATCH;Guetesiegel First Date\nEHI;1;shop-a;12.07.2010\n")
+        with open(self.filtered_haendler_bez, 'w') as csv_file:
+            csv_file.write("id;haendler_bez\n1;shop-a\n2;shop-b\n")
+        pl.DataFrame({'produkt_id': [1, 2], 'produkt_bez': ['p1', 'p2']}).write_parquet(self.data_dir / 'produkt.parquet')
+        pl.DataFrame({'haendler_bez': ['shop-a', 'shop-b', 'shop-c']}).write_parquet(self.data_dir / 'haendler.parquet')
+
+        for name, value in (('SEAL_CHANGE_FIRMS', self.seal_change_firms),
+                            ('FILTERED_HAENDLER_BEZ', self.filtered_haendler_bez),
+                            ('PARQUET_FILES_DIR', self.data_dir)):
+            patcher = patch(f'impl.db.loaders.init_db.{name}', value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.db = self._open_snapshot()
+
+    def _open_snapshot(self) -> DuckDBDataSource:
+        return DuckDBDataSource(db_path=self.db_path, bypass_singleton=True)
+
+    def _reopen_snapshot(self):
+        self.db.close()
+        self.db = self._open_snapshot()
+
+    def test_unchanged_inputs_reuse_the_base_tables(self):
+        self.assertTrue(DatabaseInitializer(self.db).initialize_database())
+        self.db.query("CREATE TABLE angebot AS SELECT 1 AS produkt_id")
+        self.db._log_file_insertion(str(self.data_dir / 'angebot_2010w01.parquet'))
+
+        self._reopen_snapshot()
+        self.assertFalse(DatabaseInitializer(self.db).initialize_database())
+
+        self.assertEqual(3, self.db.queryAsPl("SELECT COUNT(*) AS n FROM retailer_dictionary")['n'][0])
+        self.assertEqual(2, self.db.queryAsPl("SELECT COUNT(*) AS n FROM products")['n'][0])
+        # The working tables of the earlier run are reset
+        self.assertFalse(self.db.table_exists('angebot'))
+        self.assertEqual(4, self.db.queryAsPl("SELECT COUNT(*) AS n FROM file_log")['n'][0])
+
+    def test_changed_input_reloads(self):
+        DatabaseInitializer(self.db).initialize_database()
+        with open(self.filtered_haendler_bez, 'a') as csv_file:
+            csv_file.write("3;shop-d\n")
+
+        self._reopen_snapshot()
+        self.assertTrue(DatabaseInitializer(self.db).initialize_database())
+        self.assertEqual(['shop-a', 'shop-b', 'shop-c', 'shop-d'],
+                         self.db.queryAsPl("SELECT haendler_bez FROM retailer_dictionary ORDER BY haendler_id")
+                         ['haendler_bez'].to_list())
+
+    def test_touched_input_with_same_content_is_unchanged(self):
+        DatabaseInitializer(self.db).initialize_database()
+        file_stat = os.stat(self.seal_change_firms)
+        os.utime(self.seal_change_firms, (file_stat.st_atime, file_stat.st_mtime + 60))
+
+        self.assertTrue(self.db.is_file_loaded(self.seal_change_firms))
+        self.assertFalse(self.db.is_file_loaded(str(self.data_dir / 'missing.parquet')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import polars as pl
+
+from CONFIG import ANGEBOTE_SCHEME
+from impl.db.loaders.load_temp_offers_data import load_selection_criteria_inflow_angebot_data
+from impl.db.loaders import offer_store
+from impl.db.loaders.offer_store import build_offer_store, offer_store_is_built, resolve_offer_source
+from impl.db.loaders.retailer_dictionary import build_retailer_dictionary
+from impl.helpers import date_to_unix_time
+from ..base.DuckDbBaseTest import DuckDbBaseTest
+
+SEAL_DATE = "15.03.2023"  # ISO week 11
+
+
+class TestOfferStoreDuckDb(DuckDbBaseTest):
+
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.parquet_dir = self.tmp_dir.name
+        self.store_dir = os.path.join(self.tmp_dir.name, 'offer_store')
+        os.makedirs(os.path.join(self.parquet_dir, 'angebot_11_15'))
+        os.makedirs(os.path.join(self.parquet_dir, 'angebot'))
+
+        resolved_sources = patch.dict(offer_store._resolved_sources, clear=True)
+        resolved_sources.start()
+        self.addCleanup(resolved_sources.stop)
+
+        self.db.query("CREATE TABLE filtered_haendler_bez AS SELECT * FROM (VALUES ('F1'), ('F2')) t(haendler_bez)")
+        build_retailer_dictionary(self.db, pl.Series(['F1', 'F2', 'MP-am-de']))
+
+        seal_unix = date_to_unix_time(SEAL_DATE)
+        for week in range(1, 53):
+            self._write_week(week, seal_unix)
+
+    def _write_week(self, week, seal_unix, year=2023):
+        pl.DataFrame({
+            'angebot_id': [1, 2, 3, 4],
+            'produkt_id': [week + 2, week + 1, week, week + 3],
+            'haendler_bez': ['F2', 'F1', 'MP-am-de', 'F1'],
+            'preis_min': [1.0, 2.0, 3.0, 4.0],
+            # The last spell ends 53 weeks before the seal date, i.e. before the inflow window.
+            'dtimebegin': [seal_unix, seal_unix, seal_unix, 0],
+            'dtimeend': [seal_unix + 1, seal_unix + 1, seal_unix + 1, seal_unix - 53 * 604800],
+        }).write_parquet(os.path.join(self.parquet_dir, 'angebot',
+                                      ANGEBOTE_SCHEME.format(year=year, week='%02d' % week)))
+
+    def _build(self, **kwargs):
+        return build_offer_store(self.db, store_dir=self.store_dir, parquet_dir=self.parquet_dir,
+                                 offer_folders=['angebot_11_15', 'angebot'], **kwargs)
+
+    def test_store_holds_only_filtered_retailers_sorted(self):
+        self.assertEqual(52, self._build())
+        self.assertTrue(offer_store_is_built(self.store_dir))
+
+        store_file = pl.read_parquet(os.path.join(self.store_dir, ANGEBOTE_SCHEME.format(year=2023, week='05')))
+        self.assertEqual(['produkt_id', 'haendler_bez', 'dtimebegin', 'dtimeend'], store_file.columns)
+        self.assertEqual([('F1', 6), ('F1', 8), ('F2', 7)],
+                         list(zip(store_file['haendler_bez'], store_file['produkt_id'])))
+
+    def test_rebuild_skips_unchanged_files(self):
+        self._build()
+        self.assertEqual(0, self._build())
+        self.assertEqual(52, self._build(rebuild=True))
+
+    def test_interrupted_build_is_not_complete(self):
+        built_files = []
+
+        def write_store_file(*args):
+            if len(built_files) == 3:
+                raise KeyboardInterrupt
+            built_files.append(args)
+            return write(*args)
+
+        write = offer_store._write_store_file
+        with patch('impl.db.loaders.offer_store._write_store_file', side_effect=write_store_file):
+            with self.assertRaises(KeyboardInterrupt):
+                self._build()
+        self.assertFalse(offer_store_is_built(self.store_dir))
+
+        self.assertEqual(49, self._build())
+        self.assertTrue(offer_store_is_built(self.store_dir))
+
+    def test_filter_or_column_change_rebuilds_all_files(self):
+        filter_file = os.path.join(self.tmp_dir.name, 'filtered_haendler_bez.csv')
+        pl.DataFrame({'haendler_bez': ['F1', 'F2']}).write_csv(filter_file)
+        self._build(filter_file=filter_file)
+        self.assertEqual(0, self._build(filter_file=filter_file))
+
+        pl.DataFrame({'haendler_bez': ['F1']}).write_csv(filter_file)
+        self.assertFalse(offer_store_is_built(self.store_dir, filter_file=filter_file))
+        self.assertEqual(52, self._build(filter_file=filter_file))
+        self.assertTrue(offer_store_is_built(self.store_dir, filter_file=filter_file))
+
+        columns = ['produkt_id', 'haendler_bez', 'dtimebegin']
+        self.assertFalse(offer_store_is_built(self.store_dir, filter_file=filter_file, columns=columns))
+        self.assertEqual(52, self._build(filter_file=filter_file, columns=columns))
+
+    def test_resolve_falls_back_to_raw_files(self):
+        raw_source = (self.parquet_dir, ['angebot_11_15', 'angebot'])
+        self.assertEqual(raw_source, resolve_offer_source(True, self.store_dir, *raw_source))
+        self._build()
+        self.assertEqual((self.store_dir, ['']), resolve_offer_source(True, self.store_dir, *raw_source))
+        self.assertEqual(raw_source, resolve_offer_source(False, self.store_dir, *raw_source))
+
+    def test_resolve_falls_back_to_raw_files_for_new_or_changed_weeks(self):
+        raw_source = (self.parquet_dir, ['angebot_11_15', 'angebot'])
+        self._build()
+        # A newly landed and a rewritten week
+        self._write_week(1, 0, year=2024)
+        self._write_week(2, 0)
+
+        self.assertEqual([ANGEBOTE_SCHEME.format(year=2023, week='02'), ANGEBOTE_SCHEME.format(year=2024, week='01')],
+                         offer_store.stale_offer_store_files(self.store_dir, *raw_source))
+        self.assertEqual(raw_source, resolve_offer_source(True, self.store_dir, *raw_source))
+
+        self.assertEqual(2, self._build())
+        self.assertEqual((self.store_dir, ['']), resolve_offer_source(True, self.store_dir, *raw_source))
+
+    def test_window_load_from_store_drops_filtered_retailers_and_spells(self):
+        self._build()
+        with patch('impl.db.loaders.load_temp_offers_data.resolve_offer_source',
+                                 return_value=(self.store_dir, [''])):
+            load_selection_criteria_inflow_angebot_data(self.db, SEAL_DATE, pre_seal_weeks=4, post_seal_weeks=2)
+
+        self.assertEqual((7 * 2,), self.db.conn.execute("SELECT COUNT(*) FROM angebot").fetchone())
+        retailers = self.db.conn.execute("SELECT DISTINCT rd.haendler_bez FROM angebot a "
+                                         "JOIN retailer_dictionary rd USING (haendler_id) ORDER BY 1").fetchall()
+        self.assertEqual([('F1',), ('F2',)], retailers)
+
+
+if __name__ == '__main__':
+    unittest.main()
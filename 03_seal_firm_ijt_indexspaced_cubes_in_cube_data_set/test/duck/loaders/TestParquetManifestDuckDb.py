@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+
+import polars as pl
+
+from impl.db.loaders.parquet_manifest import ParquetFileManifest, get_parquet_manifest, register_parquet_manifest
+
+
+class TestParquetManifestDuckDb(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.parquet_dir = temp_dir.name
+        for folder in ('angebot_11_15', 'angebot', 'clicks'):
+            os.makedirs(os.path.join(self.parquet_dir, folder))
+
+        self._write_offers('angebot_11_15', 'angebot_2015w10.parquet', [100, 300], [200, 400])
+        self._write_offers('angebot', 'angebot_2015w10.parquet', [0, 0], [0, 0])
+        self._write_offers('angebot', 'angebot_2016w01.parquet', [1000, 1500], [1200, 2000])
+        pl.DataFrame({'timestamp': [50, 70, 60]}).write_parquet(
+            os.path.join(self.parquet_dir, 'clicks', 'clicks_2015m03.parquet'))
+        pl.DataFrame({'x': [1]}).write_parquet(os.path.join(self.parquet_dir, 'angebot', 'other.parquet'))
+
+    def _write_offers(self, folder, file_name, dtimebegin, dtimeend):
+        pl.DataFrame({'produkt_id': list(range(len(dtimebegin))), 'haendler_bez': ['F1'] * len(dtimebegin),
+                      'dtimebegin': dtimebegin, 'dtimeend': dtimeend}).write_parquet(
+            os.path.join(self.parquet_dir, folder, file_name))
+
+    def test_resolves_from_the_first_folder_holding_the_file(self):
+        manifest = ParquetFileManifest(self.parquet_dir, ['angebot_11_15', 'angebot', 'missing'])
+
+        self.assertEqual(os.path.join(self.parquet_dir, 'angebot_11_15', 'angebot_2015w10.parquet'),
+                         manifest.resolve('angebot_2015w10.parquet'))
+        self.assertEqual(os.path.join(self.parquet_dir, 'angebot', 'angebot_2015w10.parquet'),
+                         manifest.resolve('angebot_2015w10.parquet', folders='angebot'))
+        self.assertIsNone(manifest.resolve('angebot_2015w11.parquet'))
+        # Files not following the naming scheme are not indexed
+        self.assertIsNone(manifest.resolve('other.parquet'))
+
+    def test_records_the_footer_statistics(self):
+        manifest = ParquetFileManifest(self.parquet_dir, ['angebot_11_15', 'angebot', 'clicks'])
+
+        frame = manifest.to_frame().sort('path')
+        self.assertEqual(['angebot', 'angebot', 'angebot', 'clicks'], frame['dataset'].to_list())
+        self.assertEqual([(2015, 10), (2016, 1), (2015, 10), (2015, 3)],
+                         list(zip(frame['year'], frame['period'])))
+        self.assertEqual([0, 1000, 100, 50], frame['time_start'].to_list())
+        self.assertEqual([0, 2000, 400, 70], frame['time_end'].to_list())
+        self.assertEqual([2, 2, 2, 3], frame['rows'].to_list())
+
+    def test_overlaps_the_window(self):
+        manifest = ParquetFileManifest(self.parquet_dir, ['angebot_11_15', 'angebot'])
+        file_path = manifest.resolve('angebot_2016w01.parquet')
+
+        self.assertTrue(manifest.overlaps(file_path, 1900, 3000))
+        self.assertTrue(manifest.overlaps(file_path, 0, 1000))
+        self.assertFalse(manifest.overlaps(file_path, 2001, 3000))
+        self.assertFalse(manifest.overlaps(file_path, 0, 999))
+        # Without statistics a file is always loaded
+        self.assertTrue(ParquetFileManifest(self.parquet_dir, 'angebot', read_statistics=False)
+                        .overlaps(file_path, 0, 999))
+
+    def test_manifest_is_scanned_once_per_process(self):
+        manifest = get_parquet_manifest(self.parquet_dir, ['angebot_11_15', 'angebot'])
+        self._write_offers('angebot', 'angebot_2016w02.parquet', [0], [0])
+
+        self.assertIs(manifest, get_parquet_manifest(self.parquet_dir, ['angebot_11_15', 'angebot']))
+        self.assertIsNone(manifest.resolve('angebot_2016w02.parquet'))
+
+        rescanned = ParquetFileManifest(self.parquet_dir, ['angebot_11_15', 'angebot'])
+        register_parquet_manifest(rescanned)
+        self.assertIs(rescanned, get_parquet_manifest(self.parquet_dir, ['angebot_11_15', 'angebot']))
+
+
+if __name__ == '__main__':
+    unittest.main()
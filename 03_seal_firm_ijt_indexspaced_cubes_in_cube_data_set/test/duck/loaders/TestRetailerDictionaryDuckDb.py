@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import polars as pl
+
+from impl.db.loaders.retailer_dictionary import build_retailer_dictionary
+from impl.repository.retailer_dictionary_repository import RetailerDictionaryRepository, UNKNOWN_RETAILER_ID
+from ..base.DuckDbBaseTest import DuckDbBaseTest
+
+
+class TestRetailerDictionaryDuckDb(DuckDbBaseTest):
+
+    def setUp(self):
+        super().setUp()
+        build_retailer_dictionary(self.db, pl.Series(['shop-b', 'shop-a', None, 'shop-c', 'shop-a']))
+        self.repository = RetailerDictionaryRepository(self.db)
+
+    def test_dense_ids_in_name_order(self):
+        dictionary = self.repository.fetch_all()
+
+        self.assertEqual([0, 1, 2], dictionary['haendler_id'].to_list())
+        self.assertEqual(['shop-a', 'shop-b', 'shop-c'], dictionary['haendler_bez'].to_list())
+        self.assertEqual(pl.Int32, dictionary['haendler_id'].dtype)
+
+    def test_fetch_retailer_id(self):
+        self.assertEqual(2, self.repository.fetch_retailer_id('shop-c'))
+        self.assertEqual(UNKNOWN_RETAILER_ID, self.repository.fetch_retailer_id("o'shop"))
+
+    def test_retailer_ids_are_read_once_until_rebuilt(self):
+        with patch.object(self.repository, 'fetch_all', wraps=self.repository.fetch_all) as fetch_all:
+            self.assertEqual([0, 2, 0], [self.repository.fetch_retailer_id(retailer)
+                                         for retailer in ['shop-a', 'shop-c', 'shop-a']])
+            self.assertEqual(1, fetch_all.call_count)
+
+            build_retailer_dictionary(self.db, pl.Series(['shop-0', 'shop-c']))
+            self.assertEqual([1, UNKNOWN_RETAILER_ID], [self.repository.fetch_retailer_id(retailer)
+                                                        for retailer in ['shop-c', 'shop-a']])
+            self.assertEqual(2, fetch_all.call_count)
+
+    def test_encoded_parquet_load_drops_unknown_retailers(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            parquet_path = os.path.join(tmp_dir, 'angebot_2023w01.parquet')
+            pl.DataFrame({
+                'produkt_id': [1, 2, 3],
+                'haendler_bez': ['shop-b', 'unknown', 'shop-a'],
+                'dtimebegin': [0, 0, 0],
+                'dtimeend': [1, 1, 1],
+            }).write_parquet(parquet_path)
+
+            self.db.load_parquet_to_table(parquet_path, 'angebot',
+                                          columns=['produkt_id', 'haendler_bez', 'dtimebegin', 'dtimeend'],
+                                          encode_retailers=True)
+
+        rows = self.db.conn.execute("SELECT * FROM angebot ORDER BY produkt_id").fetchall()
+        self.assertEqual([(1, 1, 0, 1), (3, 0, 0, 1)], rows)
+
+
+if __name__ == '__main__':
+    unittest.main()
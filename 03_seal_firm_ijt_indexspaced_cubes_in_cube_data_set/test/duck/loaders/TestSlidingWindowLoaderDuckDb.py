@@ -0,0 +1,112 @@
+import datetime as dt
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import polars as pl
+
+from CONFIG import ANGEBOTE_SCHEME, CLICKS_SCHEME, UNIX_DAY
+from impl.db.datasource import DuckDBDataSource
+from impl.db.loaders.retailer_dictionary import build_retailer_dictionary
+from impl.db.loaders.sliding_window_loader import SlidingWindowLoader
+from ..base.DuckDbBaseTest import DuckDbBaseTest
+
+
+class TestSlidingWindowLoaderDuckDb(DuckDbBaseTest):
+
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        os.makedirs(os.path.join(self.tmp_dir.name, 'angebot'))
+        os.makedirs(os.path.join(self.tmp_dir.name, 'clicks'))
+        build_retailer_dictionary(self.db, pl.Series(['F1']))
+
+        # One offer spell of its week per weekly file (2022w01 .. 2023w52), one click row per monthly file
+        # (2022m01 .. 2023m12)
+        for year in (2022, 2023):
+            for week in range(1, 53):
+                self._write_offers(year, week, [year * 100 + week])
+            for month in range(1, 13):
+                pl.DataFrame({
+                    'produkt_id': [year * 100 + month],
+                    'haendler_bez': ['F1'],
+                    'timestamp': [0],
+                }).write_parquet(os.path.join(self.tmp_dir.name, 'clicks',
+                                              CLICKS_SCHEME.format(year=year, month='%02d' % month)))
+
+        self.loader = SlidingWindowLoader(self.db, parquet_dir=self.tmp_dir.name, offer_folders=['angebot'],
+                                          click_folders='clicks', pre_seal_weeks=4, post_seal_weeks=2)
+
+    def _write_offers(self, year, week, produkt_ids, dtimeend=None):
+        week_start = int(dt.datetime.fromisocalendar(year, week, 1).timestamp())
+        pl.DataFrame({
+            'produkt_id': produkt_ids,
+            'haendler_bez': ['F1'] * len(produkt_ids),
+            'dtimebegin': [week_start] * len(produkt_ids),
+            'dtimeend': dtimeend or [week_start + 6 * UNIX_DAY] * len(produkt_ids),
+        }).write_parquet(os.path.join(self.tmp_dir.name, 'angebot',
+                                      ANGEBOTE_SCHEME.format(year=year, week='%02d' % week)))
+
+    def _offer_products(self):
+        return sorted(row[0] for row in self.db.conn.execute("SELECT produkt_id FROM angebot").fetchall())
+
+    def _click_products(self):
+        return sorted(row[0] for row in self.db.conn.execute("SELECT produkt_id FROM clicks").fetchall())
+
+    def test_advance_loads_full_window(self):
+        with patch.object(DuckDBDataSource, '_log_file_insertions', autospec=True,
+                          side_effect=DuckDBDataSource._log_file_insertions) as log_file_insertions:
+            evicted, loaded = self.loader.advance_to("15.03.2023")  # ISO week 11
+
+        # One scan and one file log batch per window
+        self.assertEqual([7, 13], [len(call.args[1]) for call in log_file_insertions.call_args_list])
+        self.assertEqual(0, evicted)
+        self.assertEqual(7 + 13, loaded)
+        self.assertEqual([202307, 202308, 202309, 202310, 202311, 202312, 202313], self._offer_products())
+        self.assertEqual([202209, 202210, 202211, 202212] + list(range(202301, 202310)), self._click_products())
+
+    def test_advance_only_slides_differing_files(self):
+        self.loader.advance_to("15.03.2023")
+        evicted, loaded = self.loader.advance_to("29.03.2023")  # ISO week 13, same month
+
+        self.assertEqual((2, 2), (evicted, loaded))
+        self.assertEqual([202309, 202310, 202311, 202312, 202313, 202314, 202315], self._offer_products())
+        self.assertEqual(7 + 13 + 2, self.loader.files_read)
+
+    def test_advance_matches_full_reload(self):
+        self.loader.advance_to("15.03.2023")
+        self.loader.advance_to("20.09.2023")
+        slid_offers, slid_clicks = self._offer_products(), self._click_products()
+
+        fresh_loader = SlidingWindowLoader(self.db, parquet_dir=self.tmp_dir.name, offer_folders=['angebot'],
+                                           click_folders='clicks', pre_seal_weeks=4, post_seal_weeks=2)
+        fresh_loader.reset()
+        fresh_loader.advance_to("20.09.2023")
+
+        self.assertEqual(slid_offers, self._offer_products())
+        self.assertEqual(slid_clicks, self._click_products())
+
+
+    def test_advance_only_loads_spells_ending_in_window(self):
+        # A spell of week 10 ending before the window of the seal week 11 starts (4 weeks before)
+        self._write_offers(2023, 10, [202310, 1], dtimeend=[int(dt.datetime(2023, 3, 12).timestamp()),
+                                                             int(dt.datetime(2023, 2, 1).timestamp())])
+        self.loader.advance_to("15.03.2023")
+        self.assertEqual([202307, 202308, 202309, 202310, 202311, 202312, 202313], self._offer_products())
+
+        # Moving back to an earlier window start reloads the spells filtered out before
+        self.loader.advance_to("22.02.2023")
+        fresh_loader = SlidingWindowLoader(self.db, parquet_dir=self.tmp_dir.name, offer_folders=['angebot'],
+                                           click_folders='clicks', pre_seal_weeks=4, post_seal_weeks=2)
+        slid_offers = self._offer_products()
+        fresh_loader.reset()
+        fresh_loader.advance_to("22.02.2023")
+
+        self.assertIn(1, slid_offers)
+        self.assertEqual(slid_offers, self._offer_products())
+
+
+if __name__ == '__main__':
+    unittest.main()
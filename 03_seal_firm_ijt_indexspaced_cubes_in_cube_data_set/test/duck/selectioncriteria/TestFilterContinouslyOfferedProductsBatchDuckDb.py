@@ -0,0 +1,82 @@
+import datetime as dt
+import os
+import random
+import time
+import unittest
+
+from impl.repository.offers_repository import OffersRepository
+from impl.service.offers_service import OffersService
+from ..base.DuckDbBaseTest import DuckDbBaseTest
+
+
+class TestFilterContinuouslyOfferedProductsBatchDuckDb(DuckDbBaseTest):
+
+    SEAL_DATES = ["17.1.2022", "27.3.2022", "30.10.2022", "1.1.2021", "28.12.2020"]
+
+    def setUp(self):
+        super().setUp()
+        self.db.conn.execute("""
+            CREATE TABLE angebot (
+                produkt_id STRING,
+                haendler_bez STRING,
+                dtimebegin BIGINT,
+                dtimeend BIGINT
+            )
+        """)
+
+        # Random weekly-ish offer spells of 60 products around the seal dates, incl. DST changes and year ends
+        rng = random.Random(7)
+        angebot_data = []
+        for product in range(60):
+            for seal_date in self.SEAL_DATES:
+                seal = dt.datetime.strptime(seal_date, "%d.%m.%Y")
+                begin = seal - dt.timedelta(days=rng.randint(30, 80), hours=rng.randint(0, 23))
+                while begin < seal + dt.timedelta(days=60):
+                    end = begin + dt.timedelta(days=rng.choice([0, 1, 3, 6, 7, 13]), hours=rng.randint(0, 23))
+                    angebot_data.append((f"P{product}", rng.choice(['F1', 'F1', 'F1', 'F2']),
+                                         int(begin.timestamp()), int(end.timestamp())))
+                    begin = end + dt.timedelta(days=rng.choice([0, 0, 0, 1, 2, 9]))
+
+        self.db.conn.executemany("INSERT INTO angebot VALUES (?, ?, ?, ?)", angebot_data)
+        self.encode_retailers('angebot')
+
+        self.repository = OffersRepository(self.db)
+        self.service = OffersService(self.repository)
+        self.products = [f"P{product}" for product in range(60)] + ['P3', 'P_unknown']
+
+    def _assert_batch_matches_per_product(self):
+        for seal_date in self.SEAL_DATES:
+            for weeks in (3, 4, 6, 8):
+                for firm in ('F1', 'F2'):
+                    with self.subTest(seal_date=seal_date, weeks=weeks, firm=firm):
+                        expected = [product for product in self.products
+                                    if self.service.is_product_continuously_offered(product, firm, seal_date, weeks)]
+
+                        result = self.service.filter_continuously_offered_products(firm, self.products, seal_date,
+                                                                                   week_amount=weeks)
+
+                        self.assertEqual(expected, result)
+
+    def test_batch_matches_per_product(self):
+        self._assert_batch_matches_per_product()
+
+    def test_batch_matches_per_product_across_dst(self):
+        previous_tz = os.environ.get('TZ')
+        os.environ['TZ'] = 'Europe/Vienna'
+        time.tzset()
+        self.db.conn.execute("SET TimeZone = 'Europe/Vienna'")
+        try:
+            self._assert_batch_matches_per_product()
+        finally:
+            if previous_tz is None:
+                del os.environ['TZ']
+            else:
+                os.environ['TZ'] = previous_tz
+            time.tzset()
+
+    def test_empty_product_list(self):
+        self.assertEqual([], self.service.filter_continuously_offered_products('F1', [], "17.1.2022"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -56,6 +56,7 @@ class TestFilterContinuouslyOfferedProductsDuckDb(DuckDbBaseTest):
         ]
 
         self.db.conn.executemany("INSERT INTO angebot VALUES (?, ?, ?, ?)", angebot_data)
+        self.encode_retailers('angebot')
 
         # Instantiate the repository and service
         self.repository = OffersRepository(self.db)
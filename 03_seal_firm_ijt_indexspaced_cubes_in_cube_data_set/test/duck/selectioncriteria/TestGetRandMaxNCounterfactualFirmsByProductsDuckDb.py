@@ -0,0 +1,72 @@
+import datetime as dt
+import hashlib
+import unittest
+
+import polars as pl
+
+from impl.repository.offers_repository import OffersRepository
+from impl.service.offers_service import OffersService
+from ..base.DuckDbBaseTest import DuckDbBaseTest
+
+
+class TestGetRandMaxNCounterfactualFirmsByProductsDuckDb(DuckDbBaseTest):
+
+    def setUp(self):
+        super().setUp()
+        self.db.conn.execute("""
+            CREATE TABLE angebot (
+                produkt_id STRING,
+                haendler_bez STRING,
+                dtimebegin BIGINT,
+                dtimeend BIGINT
+            )
+        """)
+
+        begin = int(dt.datetime(2022, 1, 10).timestamp())
+        end = int(dt.datetime(2022, 1, 20).timestamp())
+        angebot_data = (
+            [('product1', f"firm{i}", begin, end) for i in range(1, 29)]
+            + [('product1', 'firm3', begin, end)]  # duplicate spell
+            + [('product2', f"firm{i}", begin, end) for i in range(1, 6)]
+            + [('product2', 'firm27', int(dt.datetime(2022, 2, 1).timestamp()),
+                int(dt.datetime(2022, 2, 5).timestamp()))]  # not offered at the seal date
+        )
+        self.db.conn.executemany("INSERT INTO angebot VALUES (?, ?, ?, ?)", angebot_data)
+        self.encode_retailers('angebot')
+
+        self.seal_date = "17.1.2022"
+        self.seal_firms = pl.Series(['firm1', 'firm2', None])
+        self.allowed_firms = pl.Series([f"firm{i}" for i in range(2, 28)])
+
+        self.repository = OffersRepository(self.db)
+        self.service = OffersService(self.repository)
+
+    @staticmethod
+    def expected_sample(product_id, firms, n, seed):
+        return sorted(firms, key=lambda firm: (hashlib.md5(f"{seed}|{product_id}|{firm}".encode()).hexdigest(),
+                                               firm))[:n]
+
+    def test_sample_per_product_is_hash_based(self):
+        result = self.service.get_rand_max_N_counterfactual_firms_by_products(
+            ['product1', 'product2', 'product3'], self.seal_date, self.seal_firms, self.allowed_firms, n=10, seed=42)
+
+        self.assertEqual(self.expected_sample('product1', [f"firm{i}" for i in range(3, 28)], 10, 42),
+                         result['product1'])
+        self.assertEqual(self.expected_sample('product2', ['firm3', 'firm4', 'firm5'], 10, 42), result['product2'])
+        self.assertEqual([], result['product3'])
+
+    def test_sample_is_independent_of_product_list_and_seed_dependent(self):
+        bulk = self.service.get_rand_max_N_counterfactual_firms_by_products(
+            ['product2', 'product1'], self.seal_date, self.seal_firms, self.allowed_firms, n=10, seed=42)
+        single = self.service.get_rand_max_N_counterfactual_firms(
+            'product1', self.seal_date, self.seal_firms, self.allowed_firms)
+        other_seed = self.service.get_rand_max_N_counterfactual_firms_by_products(
+            ['product1'], self.seal_date, self.seal_firms, self.allowed_firms, n=10, seed=7)
+
+        self.assertEqual(bulk['product1'], single)
+        self.assertNotEqual(bulk['product1'], other_seed['product1'])
+        self.assertEqual(len(set(bulk['product1'])), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -71,6 +71,7 @@ class TestGetRandMaxNCounterfactualFirmsDuckDb(DuckDbBaseTest):
             ('product1', 'firm28', int(dt.datetime(2022, 1, 10).timestamp()), int(dt.datetime(2022, 1, 20).timestamp()))
         ]
         self.db.conn.executemany("INSERT INTO angebot VALUES (?, ?, ?, ?)", angebot_data)
+        self.encode_retailers('angebot')
 
         # Define product, seal firms, and allowed firms
         self.product_id = 'product1'
@@ -40,6 +40,7 @@ class TestGetRandomNProductsDeterministic(DuckDbBaseTest):
             ('product8', 'firm1', int(dt.datetime(2021, 12, 1).timestamp()), int(dt.datetime(2021, 12, 10).timestamp())),
         ]
         self.db.conn.executemany("INSERT INTO angebot VALUES (?, ?, ?, ?)", angebot_data)
+        self.encode_retailers('angebot')
 
         # Instantiate repository and service
         self.repository = OffersRepository(self.db)
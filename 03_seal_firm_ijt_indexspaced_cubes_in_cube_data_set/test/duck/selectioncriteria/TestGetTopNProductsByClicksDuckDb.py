@@ -1,6 +1,8 @@
 import datetime as dt
 import unittest
 
+import polars as pl
+
 from impl.repository.clicks_repository import ClicksRepository
 from impl.service.clicks_service import ClicksService
 from ..base.DuckDbBaseTest import DuckDbBaseTest
@@ -37,6 +39,12 @@ class TestGetTopNProductsByClicksDuckDb(DuckDbBaseTest):
             # firm3 click
             ('firm3', int(dt.datetime(2022, 12, 31).timestamp()), 'product4'),  # prod4: 1 click within 8 weeks of seal date for firm3
 
+            # firm4 clicks, prod6 and prod5 tie with 2 clicks each within 8 weeks of seal date
+            ('firm4', int(dt.datetime(2022, 5, 2).timestamp()), 'product6'),
+            ('firm4', int(dt.datetime(2022, 5, 3).timestamp()), 'product6'),
+            ('firm4', int(dt.datetime(2022, 5, 4).timestamp()), 'product5'),
+            ('firm4', int(dt.datetime(2022, 5, 5).timestamp()), 'product5'),
+
             # Additional clicks (outside observation period)
             ('firm1', int(dt.datetime(2022, 6, 10).timestamp()), 'product1'),
             ('firm1', int(dt.datetime(2023, 1, 1).timestamp()), 'product2'),
@@ -45,6 +53,7 @@ class TestGetTopNProductsByClicksDuckDb(DuckDbBaseTest):
         ]
 
         self.db.conn.executemany("INSERT INTO clicks VALUES (?, ?, ?)", clicks_data)
+        self.encode_retailers('clicks')
 
         # Instantiate repository and service
         self.repository = ClicksRepository(self.db)
@@ -95,6 +104,41 @@ class TestGetTopNProductsByClicksDuckDb(DuckDbBaseTest):
         expected_top_products = ['product4']
         self.assertListEqual(expected_top_products, actual_top_products)
 
+    def test_get_top_products_by_clicks_per_seal_firm(self):
+        seal_change_firms = pl.DataFrame({
+            'RESULTING MATCH': ['firm1', 'firm2', 'firm3', 'firm1', 'firm1'],
+            'Guetesiegel First Date': [dt.date(2022, 3, 15), dt.date(2022, 9, 15), dt.date(2022, 12, 31),
+                                       dt.date(2022, 3, 15), dt.date(2024, 6, 15)],
+        })
+
+        result = self.service.get_top_n_products_by_clicks_per_seal_firm(seal_change_firms, top_n=2)
+
+        self.assertEqual(['haendler_bez', 'seal_date', 'produkt_id', 'total_clicks', 'Top200rank_ij'], result.columns)
+        self.assertEqual([
+            ('firm1', '15.03.2022', 'product1', 3, 1),
+            ('firm1', '15.03.2022', 'product2', 2, 2),
+            ('firm2', '15.09.2022', 'product3', 1, 1),
+            ('firm3', '31.12.2022', 'product4', 1, 1),
+        ], list(result.iter_rows()))
+
+    def test_get_top_products_by_clicks_per_seal_firm_matches_per_firm(self):
+        seal_change_firms = pl.DataFrame({
+            'RESULTING MATCH': ['firm1', 'firm2', 'firm3', 'firm4'],
+            'Guetesiegel First Date': ['15.03.2022', '15.09.2022', '31.12.2022', '15.05.2022'],
+        })
+
+        for top_n in (1, 2):
+            result = self.service.get_top_n_products_by_clicks_per_seal_firm(seal_change_firms, top_n=top_n)
+
+            for haendler_bez, seal_date_str in seal_change_firms.iter_rows():
+                self.assertListEqual(
+                    self.service.get_top_n_products_by_clicks(haendler_bez, seal_date_str, top_n=top_n),
+                    result.filter(pl.col('haendler_bez') == haendler_bez)['produkt_id'].to_list()
+                )
+        # The tie of firm4 is broken by produkt_id
+        self.assertListEqual(['product5', 'product6'],
+                             self.service.get_top_n_products_by_clicks('firm4', '15.05.2022', top_n=2))
+
 
 if __name__ == '__main__':
     unittest.main()
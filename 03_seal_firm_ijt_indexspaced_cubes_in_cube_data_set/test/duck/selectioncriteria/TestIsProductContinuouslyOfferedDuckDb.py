@@ -38,6 +38,7 @@ class TestIsProductContinuouslyOfferedDuckDb(DuckDbBaseTest):
             ('product1', 'firm1', int(dt.datetime(2022, 2, 21).timestamp()), int(dt.datetime(2022, 2, 27).timestamp()))
         ]
         self.db.conn.executemany("INSERT INTO angebot VALUES (?, ?, ?, ?)", angebot_data)
+        self.encode_retailers('angebot')
 
         # Call the service method to check if the product is continuously offered
         result = self.service.is_product_continuously_offered(
@@ -63,6 +64,7 @@ class TestIsProductContinuouslyOfferedDuckDb(DuckDbBaseTest):
             ('product1', 'firm1', int(dt.datetime(2022, 2, 21).timestamp()), int(dt.datetime(2022, 2, 27).timestamp()))
         ]
         self.db.conn.executemany("INSERT INTO angebot VALUES (?, ?, ?, ?)", angebot_data)
+        self.encode_retailers('angebot')
 
         result = self.service.is_product_continuously_offered(
             produkt_id='product1',
@@ -86,6 +88,7 @@ class TestIsProductContinuouslyOfferedDuckDb(DuckDbBaseTest):
             ('product1', 'firm1', int(dt.datetime(2022, 2, 21).timestamp()), int(dt.datetime(2022, 2, 27).timestamp()))
         ]
         self.db.conn.executemany("INSERT INTO angebot VALUES (?, ?, ?, ?)", angebot_data)
+        self.encode_retailers('angebot')
 
         result = self.service.is_product_continuously_offered(
             produkt_id='product1',
@@ -105,6 +108,7 @@ class TestIsProductContinuouslyOfferedDuckDb(DuckDbBaseTest):
             ('product1', 'firm1', int(dt.datetime(2022, 1, 31).timestamp()), int(dt.datetime(2022, 2, 6).timestamp()))
         ]
         self.db.conn.executemany("INSERT INTO angebot VALUES (?, ?, ?, ?)", angebot_data)
+        self.encode_retailers('angebot')
 
         result = self.service.is_product_continuously_offered(
             produkt_id='product1',
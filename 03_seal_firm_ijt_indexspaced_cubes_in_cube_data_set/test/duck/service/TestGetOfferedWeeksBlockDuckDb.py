@@ -0,0 +1,69 @@
+import datetime as dt
+import unittest
+
+import polars as pl
+
+from impl.repository.offers_repository import OffersRepository
+from impl.service.offers_service import OffersService
+from ..base.DuckDbBaseTest import DuckDbBaseTest
+
+
+class TestGetOfferedWeeksBlockDuckDb(DuckDbBaseTest):
+
+    def setUp(self):
+        super().setUp()
+        self.db.conn.execute("DROP TABLE IF EXISTS angebot")
+        self.db.conn.execute("""
+            CREATE TABLE angebot (
+                produkt_id STRING,
+                haendler_bez STRING,
+                dtimebegin BIGINT,
+                dtimeend BIGINT
+            )
+        """)
+
+        angebot_data = [
+            ('P1', 'F1', int(dt.datetime(2022, 12, 25).timestamp()), int(dt.datetime(2023, 1, 2).timestamp())),
+            ('P1', 'F1', int(dt.datetime(2023, 8, 15).timestamp()), int(dt.datetime(2023, 8, 18).timestamp())),
+            ('P1', 'F1', int(dt.datetime(2023, 8, 16).timestamp()), int(dt.datetime(2023, 9, 20).timestamp())),
+            ('P1', 'F1', int(dt.datetime(2024, 1, 1).timestamp()), int(dt.datetime(2024, 1, 7).timestamp())),
+            ('P1', 'F2', int(dt.datetime(2023, 5, 1).timestamp()), int(dt.datetime(2023, 7, 3).timestamp())),
+            ('P2', 'F2', int(dt.datetime(2021, 8, 14).timestamp()), int(dt.datetime(2021, 8, 15).timestamp())),
+            ('P2', 'F3', int(dt.datetime(2022, 6, 1).timestamp()), int(dt.datetime(2024, 6, 1).timestamp())),
+        ]
+
+        self.db.conn.executemany("INSERT INTO angebot VALUES (?, ?, ?, ?)", angebot_data)
+        self.encode_retailers('angebot')
+
+        self.repository = OffersRepository(self.db)
+        self.service = OffersService(self.repository)
+
+    def test_block_matches_per_task_offered_weeks(self):
+        seal_date = "15.8.2023"
+        tasks = pl.DataFrame({
+            'produkt_id': ['P1', 'P1', 'P2', 'P2', 'P1'],
+            'haendler_bez': ['F1', 'F2', 'F2', 'F3', 'F1'],  # last task duplicates the first one
+            'firm_has_seal_j': [1, 0, 0, 0, 1],
+        })
+
+        block = self.service.get_offered_weeks_block(tasks, seal_date)
+
+        expected_rows = [
+            (product, firm, week, has_seal)
+            for product, firm, has_seal in tasks.iter_rows()
+            for week in sorted(self.service.get_offered_weeks(product, firm, seal_date))
+        ]
+
+        self.assertEqual(['produkt_id', 'haendler_bez', 'week_running_var', 'firm_has_seal_j'], block.columns)
+        self.assertEqual(expected_rows, list(block.iter_rows()))
+
+    def test_block_of_tasks_without_offers_is_empty(self):
+        tasks = pl.DataFrame({'produkt_id': ['P3'], 'haendler_bez': ['F1'], 'firm_has_seal_j': [1]})
+
+        block = self.service.get_offered_weeks_block(tasks, "15.8.2023")
+
+        self.assertEqual(0, block.height)
+
+
+if __name__ == '__main__':
+    unittest.main()
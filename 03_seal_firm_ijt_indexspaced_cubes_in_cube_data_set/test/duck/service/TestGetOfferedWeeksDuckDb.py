@@ -29,6 +29,7 @@ class TestGetOfferedWeeksDuckDb(DuckDbBaseTest):
         ]
 
         self.db.conn.executemany("INSERT INTO angebot VALUES (?, ?, ?, ?)", angebot_data)
+        self.encode_retailers('angebot')
 
         # Instantiate repository and service
         self.repository = OffersRepository(self.db)
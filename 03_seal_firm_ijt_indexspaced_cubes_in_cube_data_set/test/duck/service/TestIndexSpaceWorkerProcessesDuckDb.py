@@ -0,0 +1,144 @@
+import datetime as dt
+import glob
+import importlib
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import polars as pl
+
+import CONFIG
+from CONFIG import ANGEBOTE_FOLDER, CLICKS_FOLDER, CLICKS_SCHEME
+from impl.db.loaders import parquet_manifest
+from impl.db.loaders.click_cube import build_click_cube
+from impl.db.loaders.offer_store import build_offer_store
+from impl.db.loaders.retailer_dictionary import build_retailer_dictionary
+from impl.helpers import calculate_running_var_t_from_u
+from impl.service.enum.index_space_engine import IndexSpaceEngine
+from impl.service.enum.inflow_loading_strategy import InflowLoadingStrategy
+from ..base.DuckDbBaseTest import DuckDbBaseTest
+
+index_space = importlib.import_module('02_calculate_index_space')
+
+FIRMS = ['F1', 'F2', 'F3', 'F4', 'F5']
+
+
+def week_start(week: int) -> int:
+    return int(dt.datetime.fromisocalendar(2023, week, 1).timestamp()) + 3600
+
+
+class TestIndexSpaceWorkerProcessesDuckDb(DuckDbBaseTest):
+    """
+    The worker process pool of step 02 against the sequential path, on an offer store and a click cube in the
+    working directory, which the spawned workers inherit (their CONFIG is imported afresh, without patches).
+    """
+
+    def setUp(self):
+        super().setUp()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(temp_dir.name)
+
+        manifests = patch.dict(parquet_manifest._manifests, clear=True)
+        manifests.start()
+        self.addCleanup(manifests.stop)
+
+        raw_dir = os.path.join(temp_dir.name, 'raw')
+        os.makedirs(os.path.join(raw_dir, ANGEBOTE_FOLDER[0]))
+        os.makedirs(os.path.join(raw_dir, CLICKS_FOLDER))
+
+        filter_file = os.path.join(temp_dir.name, 'filtered_haendler_bez.csv')
+        pl.DataFrame({'filtered_haendler_bez_id': range(len(FIRMS)), 'haendler_bez': FIRMS}).write_csv(
+            filter_file, separator=';')
+        self.db.load_csv_to_table(filter_file, 'filtered_haendler_bez')
+        build_retailer_dictionary(self.db, pl.Series(FIRMS))
+
+        # F1 to F4 offer 101 and 102 every week, F5 only 101 up to week 12 and F2 misses 102 in weeks 14 and 15
+        for week in range(1, 25):
+            offers = [(101, firm) for firm in FIRMS if firm != 'F5' or week <= 12]
+            offers += [(102, firm) for firm in FIRMS[:4] if firm != 'F2' or week not in (14, 15)]
+            self._write_offers(os.path.join(raw_dir, ANGEBOTE_FOLDER[0]), week, offers)
+
+        self._write_clicks(os.path.join(raw_dir, CLICKS_FOLDER), 3, [101, 101, 101, 102, 102], 'F1', week_start(11))
+        self._write_clicks(os.path.join(raw_dir, CLICKS_FOLDER), 4, [102, 102, 101], 'F2', week_start(15))
+
+        build_offer_store(self.db, parquet_dir=raw_dir)
+        build_click_cube(self.db, parquet_dir=raw_dir, filter_file=filter_file)
+
+        self.seal_change_firms = pl.DataFrame({
+            'seal_cp_filename': ['a.csv', 'b.csv'],
+            'seal_firm_id': ['1', '2'],
+            'RESULTING MATCH': ['F1', 'F2'],
+            'Guetesiegel First Date': [dt.date(2023, 3, 15), dt.date(2023, 4, 12)],
+        })
+        self.allowed_firms = self.db.queryAsPl("SELECT * FROM filtered_haendler_bez")
+
+    @staticmethod
+    def _write_offers(folder, week, offers):
+        pl.DataFrame({
+            'produkt_id': [produkt_id for produkt_id, _ in offers],
+            'haendler_bez': [haendler_bez for _, haendler_bez in offers],
+            'dtimebegin': [week_start(week)] * len(offers),
+            'dtimeend': [week_start(week) + 6 * 24 * 3600] * len(offers),
+        }).write_parquet(os.path.join(folder, f'angebot_2023w{week:02d}.parquet'))
+
+    @staticmethod
+    def _write_clicks(folder, month, produkt_ids, haendler_bez, timestamp):
+        pl.DataFrame({
+            'ip': ['127.0.0.1'] * len(produkt_ids),
+            'produkt_id': produkt_ids,
+            'haendler_bez': [haendler_bez] * len(produkt_ids),
+            'timestamp': [timestamp] * len(produkt_ids),
+        }).write_parquet(os.path.join(folder, CLICKS_SCHEME.format(year=2023, month='%02d' % month)))
+
+    def _calculate(self, checkpoint_dir, parallel, manifests_scanned_before):
+        index_space.calculate_index_space(self.db, self.seal_change_firms, self.allowed_firms, self.seal_change_firms,
+                                          parallel=parallel, engine=IndexSpaceEngine.SET_BASED,
+                                          loading=InflowLoadingStrategy.SLIDING_WINDOW,
+                                          checkpoint_dir=checkpoint_dir, use_click_cube=True)
+        self.assertEqual(manifests_scanned_before, index_space.scan_inflow_folders(use_click_cube=True))
+        with open(CONFIG.INDEX_SPACE_RESULTS_FILE) as results_file:
+            return results_file.read()
+
+    def test_worker_processes_match_the_sequential_path(self):
+        manifests = index_space.scan_inflow_folders(use_click_cube=True)
+        # Only a worker scanning the offer store itself instead of using the handed over manifest would see it
+        self._write_offers(CONFIG.OFFER_STORE_DIR, 25, [(101, 'F1'), (101, 'F3')])
+
+        sequential = self._calculate('checkpoints_sequential', False, manifests)
+        parallel = self._calculate('checkpoints_parallel', True, manifests)
+
+        self.assertEqual(sequential, parallel)
+        rows = pl.read_csv(CONFIG.INDEX_SPACE_RESULTS_FILE)
+        self.assertEqual({('F1', 1), ('F2', 1), ('F3', 0), ('F4', 0), ('F5', 0)},
+                         set(rows.select('haendler_bez', 'firm_has_seal_j').unique().iter_rows()))
+        # F2 misses 102 in two weeks around its seal week, F5 only is a counterfactual firm of F1 (seal week 11)
+        self.assertEqual([101], rows.filter(pl.col('haendler_bez') == 'F2')['produkt_id'].unique().to_list())
+        self.assertEqual([calculate_running_var_t_from_u(week_start(week)) for week in range(1, 13)],
+                         rows.filter(pl.col('haendler_bez') == 'F5')['week_running_var'].sort().to_list())
+        self.assertNotIn(calculate_running_var_t_from_u(week_start(25)), rows['week_running_var'].to_list())
+
+        # Two workers, each loading its own inflow tables
+        worker_logs = sorted(glob.glob('02_calculate_index_space_worker_*.log'))
+        self.assertEqual(['02_calculate_index_space_worker_0.log', '02_calculate_index_space_worker_1.log'],
+                         worker_logs)
+        for worker_id, worker_log in enumerate(worker_logs):
+            with open(worker_log) as log_file:
+                log = log_file.read()
+            self.assertIn(f"into table angebot_w{worker_id} ", log)
+            self.assertNotIn(f"angebot_w{1 - worker_id}", log)
+
+    def test_workers_get_contiguous_chunks_in_seal_date_order(self):
+        seal_firm_keys = [(f'F{day}', f'F{day}', dt.date(2023, 3, day)) for day in (9, 2, 7, 1, 5, 3, 8)]
+
+        chunks = index_space.chunk_seal_firm_keys(seal_firm_keys, 3)
+
+        self.assertEqual([['F1', 'F2', 'F3'], ['F5', 'F7'], ['F8', 'F9']],
+                         [[haendler_bez for haendler_bez, _, _ in chunk] for chunk in chunks])
+        self.assertEqual([[seal_firm_keys[0]]], index_space.chunk_seal_firm_keys(seal_firm_keys[:1], 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import datetime as dt
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import polars as pl
+
+from CONFIG import ANGEBOTE_SCHEME, UNIX_DAY, UNIX_HOUR, UNIX_WEEK
+from impl.db.loaders import offer_store
+from impl.db.loaders.offer_coverage_index import build_offer_coverage_index, load_offer_coverage_index, \
+    offer_coverage_index_is_current
+from impl.db.loaders.offer_store import build_offer_store
+from impl.repository.offer_coverage_repository import OfferCoverageRepository
+from impl.repository.offers_repository import OffersRepository
+from impl.service.offer_coverage_service import OfferCoverageService
+from impl.service.offers_service import OffersService
+from ..base.DuckDbBaseTest import DuckDbBaseTest
+
+PRODUCTS = [f"P{product}" for product in range(1, 13)]
+SEAL_DATES = ["15.8.2022", "13.3.2022", "30.10.2022", "2.1.2022", "7.6.2022"]
+
+
+class TestOfferCoverageIndexDuckDb(DuckDbBaseTest):
+    """
+    The continuous offering check on the offer coverage index built from an offer store, against
+    OffersService stepping the same offer spells in the offer table.
+    """
+
+    def setUp(self):
+        super().setUp()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.store_dir = os.path.join(tmp_dir.name, 'offer_store')
+        self.index_dir = os.path.join(tmp_dir.name, 'offer_coverage_index')
+        os.makedirs(os.path.join(tmp_dir.name, 'angebot'))
+
+        resolved_sources = patch.dict(offer_store._resolved_sources, clear=True)
+        resolved_sources.start()
+        self.addCleanup(resolved_sources.stop)
+
+        # Spells of any length and phase (some starting at a Monday 00:00), with gaps, in 2022 (t < 832)
+        generator = random.Random(7)
+        year_start = int(dt.datetime(2022, 1, 3).timestamp())
+        spells = []
+        for product in PRODUCTS:
+            for firm in ['F1', 'F2']:
+                begin = year_start - 8 * UNIX_WEEK + generator.randrange(4) * UNIX_WEEK
+                while begin < year_start + 52 * UNIX_WEEK:
+                    if generator.random() < 0.7:
+                        begin += generator.randrange(7) * UNIX_DAY + generator.randrange(24) * UNIX_HOUR
+                    end = begin + generator.choice([0, UNIX_DAY, UNIX_WEEK - 1, UNIX_WEEK, 3 * UNIX_WEEK + 5 * UNIX_HOUR,
+                                                    10 * UNIX_WEEK])
+                    spells.append((product, firm, begin, end))
+                    begin = end + generator.choice([0, 0, UNIX_DAY, UNIX_WEEK, 2 * UNIX_WEEK])
+
+        offers = pl.DataFrame(spells, schema=['produkt_id', 'haendler_bez', 'dtimebegin', 'dtimeend'], orient='row')
+        for file_number, file_offers in enumerate(offers.iter_slices(len(offers) // 3 + 1)):
+            file_offers.write_parquet(os.path.join(tmp_dir.name, 'angebot',
+                                                   ANGEBOTE_SCHEME.format(year=2022, week='%02d' % (file_number + 1))))
+
+        self.db.query("CREATE TABLE filtered_haendler_bez AS SELECT * FROM (VALUES ('F1'), ('F2')) t(haendler_bez)")
+        build_offer_store(self.db, store_dir=self.store_dir, parquet_dir=tmp_dir.name, offer_folders=['angebot'])
+        self.bitmap_count = build_offer_coverage_index(self.db, index_dir=self.index_dir, store_dir=self.store_dir)
+
+        self.db.register('offers', offers)
+        self.db.query("CREATE TABLE angebot AS SELECT * FROM offers")
+        self.db.unregister('offers')
+        self.encode_retailers('angebot')
+        load_offer_coverage_index(self.db, pl.Series(['F1', 'F2']), index_dir=self.index_dir)
+
+        self.service = OfferCoverageService(OfferCoverageRepository(self.db))
+        self.offers_service = OffersService(OffersRepository(self.db))
+
+    def test_built_once_from_the_offer_store(self):
+        self.assertEqual(2 * len(PRODUCTS), self.bitmap_count)
+        self.assertTrue(offer_coverage_index_is_current(self.index_dir, self.store_dir))
+        self.assertEqual(0, build_offer_coverage_index(self.db, index_dir=self.index_dir, store_dir=self.store_dir))
+
+    def test_filter_continuously_offered_products_matches_offers_service(self):
+        top_products = list(reversed(PRODUCTS)) + ['P99']
+        kept = 0
+        for seal_date in SEAL_DATES:
+            for firm in ['F1', 'F2']:
+                for week_amount in [4, 6, 13, 25]:
+                    expected = self.offers_service.filter_continuously_offered_products(
+                        firm, top_products, seal_date, week_amount)
+                    self.assertEqual(expected, self.service.filter_continuously_offered_products(
+                        firm, top_products, seal_date, week_amount), (seal_date, firm, week_amount))
+                    kept += len(expected)
+        # Neither all nor no products are continuously offered
+        self.assertTrue(0 < kept < len(SEAL_DATES) * 2 * 4 * len(PRODUCTS))
+
+    def test_filter_continuously_offered_products_too_few_or_many_weeks(self):
+        self.assertEqual([], self.service.filter_continuously_offered_products('F1', PRODUCTS, SEAL_DATES[0], 3))
+        with self.assertRaises(ValueError):
+            self.service.filter_continuously_offered_products('F1', PRODUCTS, SEAL_DATES[0], 26)
+
+
+if __name__ == '__main__':
+    unittest.main()